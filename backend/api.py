@@ -1,13 +1,22 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import hmac
 import pickle
-import numpy as np
-import requests
-from datetime import datetime
 import os
 from dotenv import load_dotenv
-from health_risk_predictor import predict_health_risks
-from recommend import recommend_for_high_pollution
+from health_risk_predictor import predict_health_risks, predict_health_risks_batch
+from recommend import aqi_category, recommend_batch, recommend_for_high_pollution, recommendation
+from observation_cache import GridObservationCache
+from locations import resolve_location
+from aqi_engine import observation_aqi
+from compact_forest import CompactForest
+from model_registry import ModelRegistry, activate
+from openweather_client import get_forecast, get_weather_and_pollution
+from forecast import ForecastService
+from features import observation_features
+from response_cache import ResponseCache, etag_matches
+from update_stream import StreamFull, UpdateStream
+from metrics import init_app as init_metrics, instrument_fetch, record_cache_event, stage
 from dotenv import load_dotenv
 import os
 
@@ -18,53 +27,123 @@ load_dotenv(dotenv_path="../.env.local")
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)
+# ETag is read by the frontend for conditional /predict requests
+CORS(app, expose_headers=['ETag'])
+# Server-Timing header on every response, Prometheus metrics at /metrics
+init_metrics(app)
 
-aqi_model = pickle.load(open("aqi_model.pkl", "rb"))
-health_model = pickle.load(open("health_risk_model.pkl", "rb"))
+# Models are served from the versioned registry in models/ (or, without one,
+# from aqi_model_compact/ or aqi_model.pkl and health_risk_model.pkl here).
+# A request takes model_registry.current() once, so a hot reload never swaps
+# models under it (see model_registry.py). The first version is loaded here,
+# before gunicorn forks, so workers share it; the compact forest's arrays are
+# memory-mapped read-only, so they share the same pages either way.
+model_registry = ModelRegistry(poll_interval=float(os.getenv("MODEL_POLL_INTERVAL", "10")))
+model_registry.load()
+# Bearer token for POST /admin/models/reload; the endpoint is off without it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
-def get_weather_and_pollution():
-    API_KEY = os.getenv("OPENWEATHER_API_KEY")
-    if not API_KEY:
-        raise Exception("OPENWEATHER_API_KEY not set in environment variables")
-    lat = "28.7041"
-    lon = "77.1025"
+# Observations are cached per grid cell, so every request in a cell shares one
+# upstream fetch per TTL, and active cells are refreshed together in the background
+OBSERVATION_TTL = float(os.getenv("OBSERVATION_TTL", "600"))
+OBSERVATION_MAX_STALE = float(os.getenv("OBSERVATION_MAX_STALE", "3600"))
+observation_cache = GridObservationCache(
+    instrument_fetch(get_weather_and_pollution),
+    ttl=OBSERVATION_TTL,
+    max_stale=OBSERVATION_MAX_STALE,
+    cell_size=float(os.getenv("GRID_CELL_DEGREES", "0.1")),
+    max_cells=int(os.getenv("MAX_GRID_CELLS", "1000")),
+    refresh_interval=float(os.getenv("OBSERVATION_REFRESH_INTERVAL", str(OBSERVATION_TTL))),
+    listener=record_cache_event
+)
 
-    p_url = f"https://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
-    p_j = requests.get(p_url).json()
+# Serialized /predict responses per (cell, profile), rebuilt when the cell's
+# observation is refreshed (see response_cache.py)
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "10000")))
 
-    if "list" not in p_j:
-        raise Exception(f"API Error: {p_j.get('message', 'Unknown error')}")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
 
-    c = p_j["list"][0]["components"]
+# Weather-only forest for /forecast (python main2.py). Forecast days are
+# predicted together and cached per cell and date until the weather
+# forecast is refreshed (every FORECAST_TTL seconds).
+if os.path.isdir("aqi_weather_compact"):
+    forecast_model = CompactForest.load("aqi_weather_compact", mmap_mode="r")
+elif os.path.exists("aqi_weather_model.pkl"):
+    forecast_model = pickle.load(open("aqi_weather_model.pkl", "rb"))
+else:
+    forecast_model = None
+forecast_service = ForecastService(
+    forecast_model,
+    instrument_fetch(get_forecast),
+    ttl=float(os.getenv("FORECAST_TTL", "3600")),
+    cell_size=observation_cache.cell_size,
+    max_cells=observation_cache.max_cells
+) if forecast_model is not None else None
 
-    w_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-    w_j = requests.get(w_url).json()
-    m = w_j["main"]
-    wd = w_j["wind"]
+def aqi_features(data, now=None):
+    """1 x 13 feature row in pollutant_model_features.csv column order (reused buffer)."""
+    return observation_features(data, now)
 
+def predict_aqi(model, data):
+    return model.predict(aqi_features(data))[0]
+
+def validate_profile(age, gender_enc, parent_enc):
+    # bool is an int subclass: JSON true would pass as 1
+    if isinstance(age, bool) or not isinstance(age, (int, float)) or not age or age < 1 or age > 120:
+        return 'Invalid age. Must be between 1 and 120'
+
+    if isinstance(gender_enc, bool) or gender_enc is None or gender_enc not in [0, 1, 2]:
+        return 'Invalid gender. Must be 0 (Female), 1 (Male), or 2 (Other)'
+
+    if isinstance(parent_enc, bool) or parent_enc is None or parent_enc not in [0, 1]:
+        return 'Invalid parent status. Must be 0 (No) or 1 (Yes)'
+
+    return None
+
+def observation_payload(weather_data, lat, lon):
+    cell_lat, cell_lon = observation_cache.cell_for(lat, lon)
     return {
-        "PM25": c["pm2_5"],
-        "PM10": c["pm10"],
-        "NO2": c["no2"],
-        "SO2": c["so2"],
-        "CO": c["co"],
-        "O3": c["o3"],
-        "temp": m["temp"],
-        "humidity": m["humidity"],
-        "pressure": m["pressure"],
-        "wind_speed": wd["speed"]
+        'location': {'lat': cell_lat, 'lon': cell_lon},
+        # National AQI computed directly from the measured concentrations
+        'measured_aqi': observation_aqi(weather_data),
+        'pollutants': {
+            'PM25': round(weather_data['PM25'], 2),
+            'PM10': round(weather_data['PM10'], 2),
+            'NO2': round(weather_data['NO2'], 2),
+            'SO2': round(weather_data['SO2'], 2),
+            'CO': round(weather_data['CO'], 2),
+            'O3': round(weather_data['O3'], 2)
+        },
+        'weather': {
+            'temp': round(weather_data['temp'], 1),
+            'humidity': weather_data['humidity'],
+            'pressure': weather_data['pressure'],
+            'wind_speed': round(weather_data['wind_speed'], 1)
+        }
     }
 
-def predict_aqi(model, data):
-    now = datetime.now()
-    features = np.array([[
-        data["PM25"], data["PM10"], data["O3"], data["NO2"], data["SO2"], data["CO"],
-        data["temp"], data["humidity"], data["wind_speed"],
-        0.0,
-        now.month, now.day, 0
-    ]])
-    return model.predict(features)[0]
+def stream_update(weather_data, lat, lon):
+    """
+    Update pushed to /stream subscribers: the predicted AQI, its advice
+    category and the observation. The category comes from the unrounded
+    AQI, as in /predict, so clients compare it instead of banding `aqi`.
+    """
+    models = model_registry.current()
+    aqi = predict_aqi(models.aqi, weather_data)
+    return {'aqi': int(aqi), 'advice': {'category': aqi_category(aqi)},
+            **observation_payload(weather_data, lat, lon)}
+
+# Server-Sent Events of stream_update per grid cell, built once per observation
+# version for all subscribers (see update_stream.py). A stream holds one
+# gunicorn thread (GUNICORN_THREADS), so keep STREAM_MAX_CLIENTS below it; the
+# defaults (64 threads, 56 streams) leave 8 threads per worker for requests.
+update_stream = UpdateStream(
+    observation_cache,
+    stream_update,
+    poll_interval=float(os.getenv("STREAM_POLL_INTERVAL", "5")),
+    max_seconds=float(os.getenv("STREAM_MAX_SECONDS", "300")),
+    max_clients=int(os.getenv("STREAM_MAX_CLIENTS", "56"))
+)
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -73,46 +152,231 @@ def predict():
         gender_enc = request.json.get('gender_enc')
         parent_enc = request.json.get('parent_enc')
 
-        if not age or age < 1 or age > 120:
-            return jsonify({'error': 'Invalid age. Must be between 1 and 120'}), 400
-
-        if gender_enc is None or gender_enc not in [0, 1, 2]:
-            return jsonify({'error': 'Invalid gender. Must be 0 (Female), 1 (Male), or 2 (Other)'}), 400
-
-        if parent_enc is None or parent_enc not in [0, 1]:
-            return jsonify({'error': 'Invalid parent status. Must be 0 (No) or 1 (Yes)'}), 400
-
-        weather_data = get_weather_and_pollution()
-        predicted_aqi = predict_aqi(aqi_model, weather_data)
-        health_risks = predict_health_risks(age, predicted_aqi, gender_enc, parent_enc, health_model)
-        recommendations = recommend_for_high_pollution(age, predicted_aqi)
-
-        return jsonify({
-            'aqi': int(predicted_aqi),
-            'pollutants': {
-                'PM25': round(weather_data['PM25'], 2),
-                'PM10': round(weather_data['PM10'], 2),
-                'NO2': round(weather_data['NO2'], 2),
-                'SO2': round(weather_data['SO2'], 2),
-                'CO': round(weather_data['CO'], 2),
-                'O3': round(weather_data['O3'], 2)
-            },
-            'weather': {
-                'temp': round(weather_data['temp'], 1),
-                'humidity': weather_data['humidity'],
-                'pressure': weather_data['pressure'],
-                'wind_speed': round(weather_data['wind_speed'], 1)
-            },
-            'health_risks': health_risks,
-            'recommendations': recommendations
+        error = validate_profile(age, gender_enc, parent_enc)
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            lat, lon = resolve_location(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        models = model_registry.current()
+        with stage('observation'):
+            weather_data, version = observation_cache.get_versioned(lat, lon)
+        key = (observation_cache.cell_for(lat, lon), age, gender_enc, parent_enc, models.version)
+        with stage('response_cache'):
+            cached = response_cache.get(key, version)
+
+        if cached is None:
+            with stage('aqi_model'):
+                predicted_aqi = predict_aqi(models.aqi, weather_data)
+            with stage('health_model'):
+                health_risks = predict_health_risks(age, predicted_aqi, gender_enc, parent_enc, models.health)
+            with stage('recommend'):
+                advice = recommendation(age, predicted_aqi)
+                recommendations = recommend_for_high_pollution(age, predicted_aqi)
+
+            with stage('serialize'):
+                body = jsonify({
+                    'aqi': int(predicted_aqi),
+                    **observation_payload(weather_data, lat, lon),
+                    'health_risks': health_risks,
+                    'advice': advice,
+                    'recommendations': recommendations
+                }).get_data()
+            cached = response_cache.put(key, version, body)
+
+        body, etag = cached
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            response_cache.record_not_modified()
+            return Response(status=304, headers={'ETag': etag})
+        return Response(body, mimetype='application/json', headers={'ETag': etag})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """
+    Server-Sent Events: an "aqi" event with the AQI and observation of a
+    location (query: optional city or lat/lon) now and after every refresh.
+    """
+    try:
+        lat, lon = resolve_location({
+            'city': request.args.get('city'),
+            'lat': request.args.get('lat', type=float),
+            'lon': request.args.get('lon', type=float)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if request.method == 'HEAD':
+        # Flask serves HEAD through this route and never reads the body
+        return Response(mimetype='text/event-stream', headers=headers)
 
+    try:
+        subscription = update_stream.subscribe(lat, lon)
+    except StreamFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    response = Response(update_stream.events(subscription), mimetype='text/event-stream', headers=headers)
+    # Frees the slot even when the body is never iterated
+    response.call_on_close(lambda: update_stream.leave(subscription))
+    return response
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Health risks for a cohort in one call.
+
+    Body: {"profiles": [{"age": 30, "gender_enc": 1, "parent_enc": 0}, ...]}
+    plus an optional "city" or "lat"/"lon" shared by the whole batch.
+
+    All profiles share one observation and one AQI inference, and each
+    symptom model runs once over the whole N x 6 feature matrix.
+    """
+    try:
+        profiles = (request.json or {}).get('profiles')
+        if not isinstance(profiles, list) or not profiles:
+            return jsonify({'error': 'profiles must be a non-empty list'}), 400
+
+        if len(profiles) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many profiles. Maximum batch size is {MAX_BATCH_SIZE}'}), 400
+
+        ages, gender_encs, parent_encs = [], [], []
+        for i, profile in enumerate(profiles):
+            if not isinstance(profile, dict):
+                return jsonify({'error': f'profiles[{i}]: must be an object'}), 400
+            age = profile.get('age')
+            gender_enc = profile.get('gender_enc')
+            parent_enc = profile.get('parent_enc')
+            error = validate_profile(age, gender_enc, parent_enc)
+            if error:
+                return jsonify({'error': f'profiles[{i}]: {error}'}), 400
+            ages.append(age)
+            gender_encs.append(gender_enc)
+            parent_encs.append(parent_enc)
+
+        try:
+            lat, lon = resolve_location(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        models = model_registry.current()
+        with stage('observation'):
+            weather_data = observation_cache.get(lat, lon)
+        with stage('aqi_model'):
+            predicted_aqi = predict_aqi(models.aqi, weather_data)
+        with stage('health_model'):
+            health_risks = predict_health_risks_batch(ages, predicted_aqi, gender_encs, parent_encs, models.health)
+
+        # One decision-table lookup per distinct (AQI band, age band)
+        with stage('recommend'):
+            advice, recommendations = recommend_batch(ages, predicted_aqi)
+            results = [{'health_risks': risks, 'advice': a, 'recommendations': text}
+                       for risks, a, text in zip(health_risks, advice, recommendations)]
+
+        with stage('serialize'):
+            return jsonify({
+                'aqi': int(predicted_aqi),
+                **observation_payload(weather_data, lat, lon),
+                'count': len(results),
+                'results': results
+            })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/forecast', methods=['POST'])
+def forecast():
+    """
+    Daily AQI for the days covered by the weather forecast (up to 5-6).
+
+    Body: optional "city" or "lat"/"lon", and "days" to limit the horizon.
+    """
+    try:
+        if forecast_service is None:
+            return jsonify({'error': 'Forecast model not available. Train it with python main2.py'}), 503
+
+        payload = request.get_json(silent=True) or {}
+        try:
+            lat, lon = resolve_location(payload)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        days = payload.get('days')
+        if days is not None and (not isinstance(days, int) or isinstance(days, bool) or days < 1):
+            return jsonify({'error': 'Invalid days. Must be a positive integer'}), 400
+
+        with stage('forecast'):
+            forecast_days = forecast_service.get(lat, lon)[:days]
+
+        cell_lat, cell_lon = forecast_service.cell_for(lat, lon)
+        with stage('serialize'):
+            return jsonify({
+                'location': {'lat': cell_lat, 'lon': cell_lon},
+                'days': [
+                    {
+                        'date': day['date'].isoformat(),
+                        'aqi': int(day['aqi']),
+                        'weather': {
+                            'temp': round(day['temp'], 1),
+                            'humidity': round(day['humidity']),
+                            'wind_speed': round(day['windspeedmean'], 1),
+                            'precipitation_mm': round(day['precipitation_mm'], 1)
+                        },
+                        # 3-hour forecast slots behind the daily means (8 = full day)
+                        'samples': day['samples']
+                    }
+                    for day in forecast_days
+                ]
+            })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/models/reload', methods=['POST'])
+def reload_models():
+    """
+    Load the registry's current model version in this worker now, instead of
+    at the next manifest poll. Optional body {"version": "..."} first makes
+    that version current, so the other workers follow within
+    MODEL_POLL_INTERVAL. Needs Authorization: Bearer $ADMIN_TOKEN.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    version = (request.get_json(silent=True) or {}).get('version')
+    try:
+        if version is not None:
+            activate(version, model_registry.root)
+        previous, current = model_registry.reload(force=version is None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        # The previous version keeps serving
+        return jsonify({'error': str(e), 'models': model_registry.stats()}), 500
+
+    return jsonify({'previous': previous, 'version': current, 'models': model_registry.stats()})
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'message': 'Delhi AQI Predictor API is running'})
+    return jsonify({
+        'status': 'ok',
+        'message': 'Delhi AQI Predictor API is running',
+        'models': model_registry.stats(),
+        'observation_cache': observation_cache.stats(),
+        'response_cache': response_cache.stats(),
+        'update_stream': update_stream.stats(),
+        'forecast_cache': forecast_service.stats() if forecast_service is not None else None
+    })
 
 if __name__ == '__main__':
     print("Starting Delhi AQI Predictor API...")
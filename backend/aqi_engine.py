@@ -0,0 +1,175 @@
+"""
+Vectorized AQI engine for PM2.5, PM10, NO2, SO2, CO and O3.
+
+Sub-indices follow India's National AQI (CPCB) breakpoints and the overall
+AQI is the maximum sub-index, which reproduces the AQI column of
+pollutant_model_features.csv from Original_Dataset.csv. Works on scalars,
+arrays or DataFrames; each pollutant is one np.searchsorted over its
+breakpoints instead of a Python loop per value.
+
+    python aqi_engine.py           # regenerate pollutant_model_features.csv
+    python aqi_engine.py --check   # only compare against the existing file
+"""
+import numpy as np
+
+POLLUTANTS = ("pm25", "pm10", "no2", "so2", "co", "o3")
+
+# (C_low, C_high, I_low, I_high); CO in mg/m3, everything else in ug/m3
+BREAKPOINTS = {
+    "pm25": [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200),
+             (91, 120, 201, 300), (121, 250, 301, 400), (251, 500, 401, 500)],
+    "pm10": [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200),
+             (251, 350, 201, 300), (351, 430, 301, 400), (431, 500, 401, 500)],
+    "no2": [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200),
+            (181, 280, 201, 300), (281, 400, 301, 400), (401, 800, 401, 500)],
+    "so2": [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200),
+            (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 2100, 401, 500)],
+    "co": [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200),
+           (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 50, 401, 500)],
+    "o3": [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200),
+           (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)],
+}
+
+
+def _table(rows):
+    c_low, c_high, i_low, i_high = np.array(rows, dtype=np.float64).T
+    return c_high, (i_high - i_low) / (c_high - c_low), c_low, i_low
+
+
+_TABLES = {name: _table(rows) for name, rows in BREAKPOINTS.items()}
+
+
+def sub_index(pollutant, concentration, over_range="cap"):
+    """
+    Sub-index for one pollutant over any array of concentrations.
+
+    Values between two bands (e.g. PM2.5 30.5) use the upper band. Values
+    above the top breakpoint are capped at 500 with over_range="cap", or
+    left out (NaN) with over_range="drop", which is how the training
+    dataset was built. Missing or negative values give NaN.
+    """
+    c_high, slope, c_low, i_low = _TABLES[pollutant]
+    shape = np.shape(concentration)
+    c = np.asarray(concentration, dtype=np.float64).reshape(-1)
+
+    # NaN sorts past the last band, so it lands in `above` and is fixed below
+    band = np.searchsorted(c_high, c, side="left")
+    above = band >= len(c_high)
+    np.minimum(band, len(c_high) - 1, out=band)
+
+    index = c - c_low.take(band)
+    index *= slope.take(band)
+    index += i_low.take(band)
+
+    if above.any():
+        index[above] = 500.0 if over_range == "cap" else np.nan
+    invalid = ~(c >= 0)
+    if invalid.any():
+        index[invalid] = np.nan
+    return index.reshape(shape)
+
+
+def _column(data, pollutant):
+    # Accept both the dataset's lower-case names and the API's upper-case keys
+    for key in (pollutant, pollutant.upper()):
+        if key in data:
+            return data[key]
+    return None
+
+
+def compute_aqi(data, over_range="cap", co_unit="mg"):
+    """
+    Overall AQI and dominant pollutant.
+
+    Args:
+        data: dict, DataFrame or Series of concentrations keyed by pollutant
+              ("pm25" or "PM25", ...); scalars or equal-length arrays.
+              Missing pollutants are skipped.
+        over_range: "cap" or "drop", see sub_index
+        co_unit: "mg" (dataset) or "ug" (OpenWeather reports CO in ug/m3)
+
+    Returns:
+        (aqi, dominant, sub_indices): AQI array, array of dominant pollutant
+        names, and a dict of sub-index arrays per pollutant. Rows with no
+        usable pollutant get NaN and None.
+    """
+    sub_indices = {}
+    for pollutant in POLLUTANTS:
+        values = _column(data, pollutant)
+        if values is None:
+            continue
+        values = np.asarray(values, dtype=np.float64)
+        if pollutant == "co" and co_unit == "ug":
+            values = values / 1000.0
+        sub_indices[pollutant] = sub_index(pollutant, values, over_range)
+
+    if not sub_indices:
+        raise ValueError("No pollutant concentrations given")
+
+    # Running max keeps the first pollutant on ties, like argmax; NaN never wins
+    shape = np.broadcast_shapes(*(np.shape(v) for v in sub_indices.values()))
+    aqi = np.full(shape, -np.inf)
+    code = np.full(shape, -1, dtype=np.intp)
+    for k, values in enumerate(sub_indices.values()):
+        better = values > aqi
+        np.copyto(aqi, values, where=better)
+        np.copyto(code, k, where=better)
+
+    aqi[code < 0] = np.nan
+    names = np.array(list(sub_indices) + [None], dtype=object)
+    dominant = names.take(code)
+    return aqi, dominant, sub_indices
+
+
+def observation_aqi(observation):
+    """AQI, dominant pollutant and sub-indices for one API observation dict."""
+    row = {key: [value] for key, value in observation.items()}
+    aqi, dominant, sub_indices = compute_aqi(row, co_unit="ug")
+    if np.isnan(aqi[0]):
+        return None
+    return {
+        'aqi': int(round(float(aqi[0]))),
+        'dominant_pollutant': dominant[0].upper(),
+        'sub_indices': {
+            name.upper(): round(float(values[0]), 1)
+            for name, values in sub_indices.items() if not np.isnan(values[0])
+        }
+    }
+
+
+def build_features(original):
+    """pollutant_model_features rows (without AQHI) from Original_Dataset rows."""
+    from features import transform
+
+    features = transform(original)
+    features["AQI"], _, _ = compute_aqi(features, over_range="drop")
+    return features
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pandas as pd
+
+    original = pd.read_csv("Original_Dataset.csv")
+    features = build_features(original)
+    existing = pd.read_csv("pollutant_model_features.csv")
+
+    # AQHI cannot be derived from the daily means alone, so it is carried over
+    # for the rows already in the file; only appended rows are left empty
+    n = min(len(existing), len(features))
+    aqhi = np.full(len(features), np.nan)
+    aqhi[:n] = existing["AQHI"].to_numpy()[:n]
+    features["AQHI"] = aqhi
+    diff = np.abs(features["AQI"].to_numpy()[:n] - existing["AQI"].to_numpy()[:n])
+    print(f"AQI vs existing file: {np.count_nonzero(diff > 1e-9)} of {n} rows differ, max diff {np.nanmax(diff):.3g}")
+    if len(features) > len(existing):
+        print(f"{len(features) - len(existing)} new rows; their AQHI is left empty for review")
+    elif len(features) < len(existing):
+        print(f"{len(existing) - len(features)} rows fewer than the existing file; AQHI kept for the first {n}")
+
+    if "--check" in sys.argv:
+        sys.exit(0)
+
+    features.to_csv("pollutant_model_features.csv", index=False)
+    print(f"Wrote pollutant_model_features.csv: {features.shape}")
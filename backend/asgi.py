@@ -0,0 +1,273 @@
+"""
+ASGI serving mode: /predict and /health from api.py on an asyncio event loop.
+
+A sync gunicorn worker serves one request at a time, so a worker waiting on
+OpenWeather (every cache miss, up to OPENWEATHER_TIMEOUT) serves nobody
+else. Here observations are fetched with AsyncOpenWeatherClient and cached
+in an AsyncGridObservationCache, so one worker keeps any number of upstream
+fetches waiting at once. Model inference is CPU-bound and runs in a thread
+pool of INFERENCE_WORKERS threads, so it never blocks the event loop and
+never runs on more threads than the cores can serve.
+
+Requests, responses and the Server-Timing header are the same as api.py's.
+Models come from api.py's model_registry and are hot-reloaded the same way
+(POST /admin/models/reload is only served by api.py).
+/stream subscribers wait on the event loop instead of holding a thread.
+
+    uvicorn asgi:app --port 5000
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+python -m benchmarks.bench_async compares both modes under load.
+"""
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from api import (OBSERVATION_MAX_STALE, OBSERVATION_TTL, model_registry, observation_payload, predict_aqi,
+                 stream_update, validate_profile)
+from health_risk_predictor import predict_health_risks
+from locations import resolve_location
+from metrics import IN_FLIGHT, REQUEST_SECONDS, StageTimer, instrument_fetch, record_cache_event, render_metrics
+from observation_cache import AsyncGridObservationCache
+from openweather_client import AsyncOpenWeatherClient
+from recommend import recommend_for_high_pollution, recommendation
+from response_cache import ResponseCache, etag_matches
+from update_stream import AsyncUpdateStream, StreamFull
+
+# Threads for model inference; more than the cores only adds contention
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+inference = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+_upstream = None
+
+
+def upstream():
+    # Created on first use, inside the worker's event loop (never in a
+    # preloading gunicorn master)
+    global _upstream
+    if _upstream is None:
+        _upstream = AsyncOpenWeatherClient()
+    return _upstream
+
+
+async def fetch_observation(lat, lon):
+    return await upstream().fetch_observation(lat, lon)
+
+
+observation_cache = AsyncGridObservationCache(
+    instrument_fetch(fetch_observation),
+    ttl=OBSERVATION_TTL,
+    max_stale=OBSERVATION_MAX_STALE,
+    cell_size=float(os.getenv("GRID_CELL_DEGREES", "0.1")),
+    max_cells=int(os.getenv("MAX_GRID_CELLS", "1000")),
+    refresh_interval=float(os.getenv("OBSERVATION_REFRESH_INTERVAL", str(OBSERVATION_TTL))),
+    listener=record_cache_event
+)
+# Own cache: versions come from this module's observation cache, not api.py's
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "10000")))
+# Streams wait on the event loop, so there is no thread per client to bound
+update_stream = AsyncUpdateStream(
+    observation_cache,
+    stream_update,
+    poll_interval=float(os.getenv("STREAM_POLL_INTERVAL", "5")),
+    max_seconds=float(os.getenv("STREAM_MAX_SECONDS", "300")),
+    max_clients=int(os.getenv("STREAM_MAX_CLIENTS_ASYNC", "10000"))
+)
+
+
+def json_bytes(content):
+    # Same bytes as Flask's jsonify outside debug mode
+    return (json.dumps(content, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+def json_response(content, status_code=200):
+    return Response(json_bytes(content), status_code=status_code, media_type="application/json")
+
+
+def instrumented(endpoint):
+    """Request latency, in-flight gauge and Server-Timing, as metrics.init_app does for Flask."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            start = time.perf_counter()
+            timer = StageTimer(endpoint)
+            IN_FLIGHT.inc()
+            try:
+                response = await handler(request, timer)
+            finally:
+                IN_FLIGHT.dec()
+            total = time.perf_counter() - start
+            response.headers["Server-Timing"] = ", ".join(
+                part for part in (timer.server_timing(), f"total;dur={total * 1000:.3f}") if part)
+            REQUEST_SECONDS.labels(endpoint, response.status_code).observe(total)
+            return response
+        return wrapper
+    return decorate
+
+
+def infer(timer, models, weather_data, age, gender_enc, parent_enc):
+    """The CPU-bound part of /predict, run on the inference pool."""
+    with timer.stage('aqi_model'):
+        predicted_aqi = predict_aqi(models.aqi, weather_data)
+    with timer.stage('health_model'):
+        health_risks = predict_health_risks(age, predicted_aqi, gender_enc, parent_enc, models.health)
+    with timer.stage('recommend'):
+        advice = recommendation(age, predicted_aqi)
+        recommendations = recommend_for_high_pollution(age, predicted_aqi)
+    return predicted_aqi, health_risks, advice, recommendations
+
+
+@instrumented('predict')
+async def predict(request, timer):
+    try:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return json_response({'error': 'Request body must be a JSON object'}, 400)
+
+        age = payload.get('age')
+        gender_enc = payload.get('gender_enc')
+        parent_enc = payload.get('parent_enc')
+
+        error = validate_profile(age, gender_enc, parent_enc)
+        if error:
+            return json_response({'error': error}, 400)
+
+        try:
+            lat, lon = resolve_location(payload)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+
+        models = model_registry.current()
+        with timer.stage('observation'):
+            weather_data, version = await observation_cache.get_versioned(lat, lon)
+        key = (observation_cache.cell_for(lat, lon), age, gender_enc, parent_enc, models.version)
+        with timer.stage('response_cache'):
+            cached = response_cache.get(key, version)
+
+        if cached is None:
+            predicted_aqi, health_risks, advice, recommendations = await asyncio.get_running_loop().run_in_executor(
+                inference, infer, timer, models, weather_data, age, gender_enc, parent_enc)
+
+            with timer.stage('serialize'):
+                body = json_bytes({
+                    'aqi': int(predicted_aqi),
+                    **observation_payload(weather_data, lat, lon),
+                    'health_risks': health_risks,
+                    'advice': advice,
+                    'recommendations': recommendations
+                })
+            cached = response_cache.put(key, version, body)
+
+        body, etag = cached
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers={'ETag': etag})
+        return Response(body, media_type="application/json", headers={'ETag': etag})
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def stream(request):
+    # Not instrumented: a stream's duration is not a request latency
+    try:
+        lat, lon = resolve_location({
+            'city': request.query_params.get('city'),
+            'lat': query_float(request, 'lat'),
+            'lon': query_float(request, 'lon')
+        })
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if request.method == 'HEAD':
+        return Response(media_type='text/event-stream', headers=headers)
+
+    try:
+        subscription = await update_stream.subscribe(lat, lon)
+    except StreamFull as e:
+        return Response(json_bytes({'error': str(e)}), status_code=503, media_type="application/json",
+                        headers={'Retry-After': '30'})
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+    return EventStreamResponse(subscription, headers=headers)
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    An update stream that frees its slot however the response ends: a
+    disconnect can cancel it before events() has started, and then the
+    generator's own cleanup never runs.
+    """
+
+    def __init__(self, subscription, headers):
+        super().__init__(update_stream.events(subscription), media_type='text/event-stream', headers=headers)
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            update_stream.leave(self.subscription)
+
+
+def query_float(request, name):
+    # Same as Flask's request.args.get(name, type=float): None when missing or invalid
+    try:
+        return float(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+@instrumented('health_check')
+async def health_check(request, timer):
+    return json_response({
+        'status': 'ok',
+        'message': 'Delhi AQI Predictor API is running',
+        'models': model_registry.stats(),
+        'observation_cache': observation_cache.stats(),
+        'response_cache': response_cache.stats(),
+        'update_stream': update_stream.stats(),
+        # /forecast is only served by api.py
+        'forecast_cache': None
+    })
+
+
+async def metrics(request):
+    body, content_type = render_metrics()
+    return Response(body, headers={"Content-Type": content_type})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if _upstream is not None:
+        await _upstream.close()
+    inference.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/predict', predict, methods=['POST']),
+        Route('/stream', stream, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                            expose_headers=['ETag'])],
+    lifespan=lifespan
+)
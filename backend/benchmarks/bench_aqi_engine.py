@@ -0,0 +1,70 @@
+"""
+Vectorized AQI engine against the scalar per-value loop.
+
+The scalar baseline is calculate_aqi_from_pm25 (PM2.5 only) and a
+per-row loop over all six pollutants; both are timed on a sample and
+extrapolated to the full row count.
+
+    python -m benchmarks.bench_aqi_engine --rows 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aqi_engine import BREAKPOINTS, POLLUTANTS, compute_aqi, sub_index
+from health_risk_data_prep import calculate_aqi_from_pm25
+
+
+def scalar_sub_index(pollutant, c):
+    for c_low, c_high, i_low, i_high in BREAKPOINTS[pollutant]:
+        if c <= c_high:
+            return (i_high - i_low) / (c_high - c_low) * (c - c_low) + i_low
+    return 500.0
+
+
+def synthetic(rows, seed=42):
+    # Resample the real history so the value distribution is realistic
+    df = pd.read_csv("Original_Dataset.csv")
+    rng = np.random.default_rng(seed)
+    return df[list(POLLUTANTS)].iloc[rng.integers(0, len(df), rows)].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--sample", type=int, default=100_000, help="rows timed for the scalar loops")
+    args = parser.parse_args()
+
+    data = synthetic(args.rows)
+    sample = data.iloc[:args.sample]
+    scale = args.rows / len(sample)
+
+    start = time.perf_counter()
+    for c in sample["pm25"].tolist():
+        calculate_aqi_from_pm25(c)
+    scalar_pm25 = (time.perf_counter() - start) * scale
+
+    start = time.perf_counter()
+    for row in sample.itertuples(index=False):
+        max(scalar_sub_index(p, getattr(row, p)) for p in POLLUTANTS)
+    scalar_all = (time.perf_counter() - start) * scale
+
+    start = time.perf_counter()
+    sub_index("pm25", data["pm25"].to_numpy())
+    vector_pm25 = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_aqi(data)
+    vector_all = time.perf_counter() - start
+
+    print(f"{args.rows:,} rows (scalar times extrapolated from {len(sample):,})\n")
+    print(f"{'':<22}{'scalar s':>10}{'vector s':>10}{'speedup':>10}")
+    print(f"{'PM2.5 only':<22}{scalar_pm25:>10.2f}{vector_pm25:>10.2f}{scalar_pm25 / vector_pm25:>9.0f}x")
+    print(f"{'6 pollutants + max':<22}{scalar_all:>10.2f}{vector_all:>10.2f}{scalar_all / vector_all:>9.0f}x")
+    print(f"\nVectorized throughput: {args.rows / vector_all / 1e6:.1f} M rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Load test of POST /predict: the sync gunicorn workers (api.py) against the
+async workers (asgi.py), at increasing numbers of concurrent clients.
+
+Both servers run under gunicorn with the same number of workers against
+stub_server.py with a fixed per-response latency standing in for
+OpenWeather. Every request asks for a different grid cell, so every request
+misses the observation cache and waits on upstream: the case the async
+mode is for. Sync throughput stays near workers / upstream latency however
+many clients wait; async throughput grows with concurrency until the CPU
+or the upstream connection pool is the limit.
+
+    python -m benchmarks.bench_async --workers 2 --latency 0.2 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+SERVERS = {
+    "sync (api:app)": ["--threads", "1", "api:app"],
+    "async (asgi:app)": ["-k", "uvicorn.workers.UvicornWorker", "asgi:app"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_server(args, workers, env):
+    port = free_port()
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--workers", str(workers),
+               "--bind", f"127.0.0.1:{port}", *args]
+    proc = subprocess.Popen(command, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(f"{base_url}/health")
+    except RuntimeError:
+        proc.kill()
+        raise
+    return proc, base_url
+
+
+def request_bodies(start):
+    """Profiles at distinct 0.01 degree cells, so none shares a cached observation."""
+    i = start
+    while True:
+        yield {"age": 35, "gender_enc": 1, "parent_enc": 0,
+               "lat": round(10 + (i // 2000) * 0.01, 2), "lon": round(70 + (i % 2000) * 0.01, 2)}
+        i += 1
+
+
+async def load(base_url, concurrency, requests, bodies):
+    """`concurrency` clients sending `requests` requests in total. Returns (seconds, latencies, errors)."""
+    latencies, errors = [], 0
+    remaining = requests
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def client_loop():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/predict", json=next(bodies))
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return time.perf_counter() - start, np.array(latencies) * 1000, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers for both servers")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub latency per upstream response (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per level (at least 4 per client)")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, "stub_server.py", "--port", str(stub_port),
+                             "--latency", str(args.latency)], stdout=subprocess.DEVNULL)
+    env = dict(os.environ,
+               OPENWEATHER_MODE="replay",
+               OPENWEATHER_BASE_URL=f"http://127.0.0.1:{stub_port}",
+               OPENWEATHER_POOL_SIZE="128",
+               GRID_CELL_DEGREES="0.01",
+               MAX_GRID_CELLS="100000",
+               OBSERVATION_REFRESH_INTERVAL="0")
+
+    print(f"{args.workers} workers per server, upstream latency {args.latency * 1000:.0f} ms, "
+          f"every request a cache miss\n")
+    print(f"{'server':<20}{'clients':>8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    offset = 0
+    try:
+        for name, server_args in SERVERS.items():
+            server, base_url = start_server(server_args, args.workers, env)
+            try:
+                for concurrency in args.concurrency:
+                    n = max(args.requests, 4 * concurrency)
+                    # Fresh cells for every level and server
+                    bodies = request_bodies(offset)
+                    offset += n
+                    seconds, latencies, errors = asyncio.run(load(base_url, concurrency, n, bodies))
+                    p50, p95 = np.percentile(latencies, [50, 95])
+                    print(f"{name:<20}{concurrency:>8}{n:>10}{n / seconds:>10.1f}{p50:>10.1f}{p95:>10.1f}"
+                          f"{errors:>8}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
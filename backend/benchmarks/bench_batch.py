@@ -0,0 +1,91 @@
+"""
+Health-risk throughput: per-user predict_health_risks calls against
+predict_health_risks_batch and the /predict/batch endpoint.
+
+The upstream observation comes from the recorded fixtures, so this runs
+offline. Needs aqi_model.pkl (python main.py) for the endpoint numbers.
+
+    python -m benchmarks.bench_batch --size 10000
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+from health_risk_predictor import predict_health_risks, predict_health_risks_batch
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures", "openweather")
+
+
+def make_profiles(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return (rng.integers(1, 121, n), rng.integers(0, 3, n), rng.integers(0, 2, n))
+
+
+def fixture_observation():
+    with open(os.path.join(FIXTURE_DIR, "air_pollution.json")) as f:
+        c = json.load(f)["list"][0]["components"]
+    with open(os.path.join(FIXTURE_DIR, "weather.json")) as f:
+        w = json.load(f)
+    return {
+        "PM25": c["pm2_5"], "PM10": c["pm10"], "NO2": c["no2"], "SO2": c["so2"], "CO": c["co"], "O3": c["o3"],
+        "temp": w["main"]["temp"], "humidity": w["main"]["humidity"],
+        "pressure": w["main"]["pressure"], "wind_speed": w["wind"]["speed"]
+    }
+
+
+def report(label, n, seconds):
+    print(f"{label:<34}{n:>8}{seconds * 1000:>12.1f}{n / seconds:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--single-sample", type=int, default=500,
+                        help="per-user calls to time; the loop over all profiles is extrapolated")
+    parser.add_argument("--aqi", type=float, default=250)
+    args = parser.parse_args()
+
+    with open("health_risk_model.pkl", "rb") as f:
+        package = pickle.load(f)
+    ages, genders, parents = make_profiles(args.size)
+
+    print(f"{'':<34}{'profiles':>8}{'ms':>12}{'profiles/s':>14}")
+
+    k = min(args.single_sample, args.size)
+    start = time.perf_counter()
+    for i in range(k):
+        predict_health_risks(int(ages[i]), args.aqi, int(genders[i]), int(parents[i]), package)
+    report("predict_health_risks (per user)", k, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    predict_health_risks_batch(ages, args.aqi, genders, parents, package)
+    report("predict_health_risks_batch", args.size, time.perf_counter() - start)
+
+    if not os.path.exists("aqi_model.pkl"):
+        print("\naqi_model.pkl not found, skipping /predict/batch (run python main.py)")
+        return
+
+    import api
+    observation = fixture_observation()
+    api.observation_cache.fetch = lambda lat, lon: observation
+    client = api.app.test_client()
+    body = {"profiles": [
+        {"age": int(a), "gender_enc": int(g), "parent_enc": int(p)}
+        for a, g, p in zip(ages, genders, parents)
+    ]}
+    api.MAX_BATCH_SIZE = max(api.MAX_BATCH_SIZE, args.size)
+    client.post("/predict/batch", json=body)  # warm the observation cache
+
+    start = time.perf_counter()
+    response = client.post("/predict/batch", json=body)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.json
+    report("POST /predict/batch", args.size, elapsed)
+
+
+if __name__ == "__main__":
+    main()
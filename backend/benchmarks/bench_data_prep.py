@@ -0,0 +1,96 @@
+"""
+Survey prep at scale: time and peak memory of a full build and of an
+incremental run, against reading the whole survey at once as the old
+main() did.
+
+The survey is synthesized by resampling Cleaned_Air_Pollution.csv rows and
+written to a temporary directory. Peak memory is traced Python/NumPy
+allocations (tracemalloc), in a second run: tracing slows pandas down
+several times, so the seconds come from an untraced run.
+
+    python -m benchmarks.bench_data_prep --rows 1000000 --new-rows 10000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from health_risk_data_prep import AGE_MAP, ENCODED_COLUMNS, prepare
+
+
+def synthesize(path, rows, seed=0):
+    survey = pd.read_csv("Cleaned_Air_Pollution.csv")
+    rng = np.random.default_rng(seed)
+    survey.iloc[rng.integers(0, len(survey), rows)].to_csv(path, index=False)
+
+
+def append_rows(path, rows, seed=1):
+    survey = pd.read_csv("Cleaned_Air_Pollution.csv")
+    rng = np.random.default_rng(seed)
+    survey.iloc[rng.integers(0, len(survey), rows)].to_csv(path, mode="a", header=False, index=False)
+
+
+def load_all(path):
+    # What main() did before: the whole survey in memory, encoders refit
+    df = pd.read_csv(path)
+    df['age'] = df['Age_group'].map(AGE_MAP)
+    for name, source in ENCODED_COLUMNS.items():
+        df[name] = df[source].astype("category").cat.codes
+    return df
+
+
+def measure(fn, files=()):
+    """(result, seconds, peak MB) of fn(); `files` are restored between the two runs."""
+    saved = {path: path + ".saved" for path in files}
+    for path, copy in saved.items():
+        shutil.copyfile(path, copy)
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    for path, copy in saved.items():
+        shutil.copyfile(copy, path)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--new-rows", type=int, default=10_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {name: os.path.join(tmp, name) for name in
+                 ("survey.csv", "training.csv", "encoders.json", "state.json")}
+        synthesize(paths["survey.csv"], args.rows)
+        run = dict(survey_path=paths["survey.csv"], training_path=paths["training.csv"],
+                   encoders_path=paths["encoders.json"], state_path=paths["state.json"],
+                   chunk_rows=args.chunk_rows)
+
+        print(f"{args.rows:,} survey rows ({os.path.getsize(paths['survey.csv']) / 2**20:.0f} MB), "
+              f"chunks of {args.chunk_rows:,}\n")
+        print(f"{'':<36}{'seconds':>10}{'peak MB':>10}")
+        _, seconds, peak = measure(lambda: load_all(paths["survey.csv"]))
+        print(f"{'whole file in memory (old)':<36}{seconds:>10.2f}{peak:>10.1f}")
+        _, seconds, peak = measure(lambda: prepare(**run, rebuild=True))
+        print(f"{'chunked full build':<36}{seconds:>10.2f}{peak:>10.1f}")
+
+        append_rows(paths["survey.csv"], args.new_rows)
+        state = [paths[name] for name in ("training.csv", "encoders.json", "state.json")]
+        result, seconds, peak = measure(lambda: prepare(**run), files=state)
+        label = f"incremental, {result['new_rows']:,} new rows"
+        print(f"{label:<36}{seconds:>10.2f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
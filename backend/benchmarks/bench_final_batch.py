@@ -0,0 +1,77 @@
+"""
+Offline advisories for a user list: one final.py process per user against
+final.py --batch over the whole list.
+
+Both read the fixture observation: the per-user runs through stub_server.py
+(OPENWEATHER_MODE=replay), the batch run with --replay. The per-user rate
+is measured on --sample users and extrapolated.
+
+    python -m benchmarks.bench_final_batch --users 200000 --sample 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_async import free_port
+
+
+def write_users(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'user_id': np.arange(n),
+        'age': rng.integers(1, 100, n),
+        'gender_enc': rng.integers(0, 3, n),
+        'parent_enc': rng.integers(0, 2, n)
+    }).to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--sample", type=int, default=5, help="per-user processes actually run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, "stub_server.py", "--port", str(stub_port), "--latency", "0"],
+                            stdout=subprocess.DEVNULL)
+    env = dict(os.environ, OPENWEATHER_MODE="replay", OPENWEATHER_BASE_URL=f"http://127.0.0.1:{stub_port}",
+               PYTHONWARNINGS="ignore")
+    try:
+        time.sleep(1)
+        start = time.perf_counter()
+        for age in range(30, 30 + args.sample):
+            subprocess.run([sys.executable, "final.py"], input=f"{age}\n", text=True, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        per_user = (time.perf_counter() - start) / args.sample
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"{'mode':<28}{'users':>10}{'seconds':>12}{'users/s':>12}")
+    print(f"{'one process per user':<28}{args.users:>10}{per_user * args.users:>12.0f}{1 / per_user:>12.1f}"
+          f"   (extrapolated from {args.sample})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        users = os.path.join(tmp, "users.csv")
+        write_users(users, args.users)
+        for workers in args.workers:
+            for suffix in ("csv", "jsonl"):
+                output = os.path.join(tmp, f"advice.{suffix}")
+                start = time.perf_counter()
+                subprocess.run([sys.executable, "final.py", "--batch", users, "--output", output, "--replay",
+                                "--workers", str(workers)], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                seconds = time.perf_counter() - start
+                label = f"--batch {suffix}, {workers} workers"
+                print(f"{label:<28}{args.users:>10}{seconds:>12.1f}{args.users / seconds:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+AQI forest: pickled sklearn model against the exported CompactForest.
+
+Reports load time, memory, single-row and batch latency, and checks that
+both produce identical predictions on the training features. Needs
+aqi_model.pkl (python main.py); exports aqi_model_compact/ if missing.
+
+    python -m benchmarks.bench_forest
+"""
+import argparse
+import os
+import pickle
+import statistics
+import time
+import tracemalloc
+
+import pandas as pd
+
+from compact_forest import COMPACT_DIR, CompactForest, export_forest, verify_parity
+
+
+def timed_load(fn):
+    # Time without tracing (tracemalloc slows unpickling down several times),
+    # then load again under tracemalloc for the memory figure
+    start = time.perf_counter()
+    obj = fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, peak
+
+
+def latency_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    if not os.path.isdir(COMPACT_DIR):
+        with open("aqi_model.pkl", "rb") as f:
+            export_forest(pickle.load(f))
+
+    model, sk_load, sk_mem = timed_load(lambda: pickle.load(open("aqi_model.pkl", "rb")))
+    forest, cf_load, cf_mem = timed_load(lambda: CompactForest.load(COMPACT_DIR))
+
+    df = pd.read_csv("pollutant_model_features.csv")
+    X = df.drop(['AQI', 'AQHI'], axis=1).to_numpy()
+    row = X[:1]
+
+    mismatches, max_diff = verify_parity(model, forest, X)
+
+    rows = [
+        ("load (ms)", sk_load * 1000, cf_load * 1000),
+        ("memory at load (MB)", sk_mem / 1e6, cf_mem / 1e6),
+        ("single row (ms, p50)",
+         latency_ms(lambda: model.predict(row), max(5, args.repeats // 10)),
+         latency_ms(lambda: forest.predict(row), args.repeats)),
+        (f"batch of {len(X)} (ms, p50)",
+         latency_ms(lambda: model.predict(X), 5),
+         latency_ms(lambda: forest.predict(X), 5)),
+    ]
+
+    print(f"{forest.n_estimators} trees, {forest.meta['n_nodes']} nodes, max depth {forest.max_depth}\n")
+    print(f"{'':<28}{'sklearn':>12}{'compact':>12}")
+    for label, sk, cf in rows:
+        print(f"{label:<28}{sk:>12.2f}{cf:>12.2f}")
+    print(f"\nParity on {len(X)} rows: {mismatches} mismatches, max diff {max_diff:.3g}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    main()
@@ -0,0 +1,44 @@
+"""
+Health-risk training: serial fits against the process pool.
+
+Times the 24 fits of train_models() (4 targets x holdout + 5 CV folds) with
+one worker and with every core, on the survey data replicated to grow it.
+Speedup is bounded by the number of cores on the machine.
+
+    python -m benchmarks.bench_health_training --scales 1,4,16
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from health_risk_predictor import compute_splits, fit_all
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="1,4,16", help="comma-separated replication factors")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    base = pd.read_csv("health_risk_training.csv")
+    print(f"{os.cpu_count()} cores, {args.workers} workers")
+    print(f"{'rows':>8} {'serial s':>10} {'pool s':>10} {'speedup':>8}")
+    for scale in [int(s) for s in args.scales.split(",")]:
+        df = pd.concat([base] * scale, ignore_index=True)
+        splits = compute_splits(df)
+
+        start = time.perf_counter()
+        fit_all(df, splits, max_workers=1)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fit_all(df, splits, max_workers=args.workers)
+        pooled = time.perf_counter() - start
+
+        print(f"{len(df):>8} {serial:>10.2f} {pooled:>10.2f} {serial / pooled:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+History load time: pandas CSV parsing against the columnar store.
+
+Builds hourly histories of growing length by resampling the real feature
+rows, writes each as a CSV and as a history store, and times a full load
+of both. Also times a one-year range read from the store.
+
+    python -m benchmarks.bench_history --years 1,5,10,20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from history_store import TIMESTAMP, HistoryStore
+
+
+def hourly_history(years, seed=42):
+    base = pd.read_csv("pollutant_model_features.csv")
+    timestamps = pd.date_range("2000-01-01", periods=int(years * 365 * 24), freq="h")
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), len(timestamps))].reset_index(drop=True)
+    df.insert(0, TIMESTAMP, timestamps)
+    return df
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", default="1,5,10,20", help="comma-separated history lengths")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'years':>6}{'rows':>10}{'csv MB':>8}{'store MB':>9}{'csv ms':>9}{'store ms':>10}"
+          f"{'speedup':>9}{'1 year ms':>11}")
+    for years in [float(y) for y in args.years.split(",")]:
+        df = hourly_history(years)
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "features.csv")
+            df.to_csv(csv_path, index=False)
+            store = HistoryStore(os.path.join(tmp, "history"))
+            store.append("features", df)
+
+            csv_s = best_of(lambda: pd.read_csv(csv_path, parse_dates=[TIMESTAMP]), args.repeats)
+            store_s = best_of(lambda: store.read("features", with_timestamp=True), args.repeats)
+            year_s = best_of(lambda: store.read("features", start="2000-01-01", end="2001-01-01"), args.repeats)
+
+            csv_mb = os.path.getsize(csv_path) / 1e6
+            store_mb = sum(os.path.getsize(os.path.join(store.path, "features", f))
+                           for f in os.listdir(os.path.join(store.path, "features"))) / 1e6
+        print(f"{years:>6g}{len(df):>10,}{csv_mb:>8.1f}{store_mb:>9.1f}{csv_s * 1000:>9.1f}"
+              f"{store_s * 1000:>10.1f}{csv_s / store_s:>8.1f}x{year_s * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Upstream calls against request volume for the spatially keyed cache, and the
+wall time of a concurrent bulk refresh of every active cell.
+
+Requests are spread uniformly over the NCR; the refresh runs against
+stub_server.py with a fixed latency, so everything is offline.
+
+    python -m benchmarks.bench_locations --requests 100000 --latency 0.15
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from observation_cache import GridObservationCache
+from openweather_client import OpenWeatherClient
+from stub_server import start_stub_server
+
+# Rough NCR bounding box
+LAT_RANGE = (28.0, 29.2)
+LON_RANGE = (76.6, 77.9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--cell", type=float, default=0.1, help="grid cell size in degrees")
+    parser.add_argument("--latency", type=float, default=0.15, help="stub latency per response (s)")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+    client = OpenWeatherClient(base_url=base_url, mode="replay")
+    calls = [0]
+    calls_lock = threading.Lock()
+
+    def fetch(lat, lon):
+        with calls_lock:
+            calls[0] += 1
+        return client.fetch_observation(lat, lon)
+
+    cache = GridObservationCache(fetch, ttl=600, cell_size=args.cell, max_cells=10000)
+    rng = np.random.default_rng(42)
+    lats = rng.uniform(*LAT_RANGE, args.requests)
+    lons = rng.uniform(*LON_RANGE, args.requests)
+
+    print(f"{'requests':>10}{'cells':>8}{'upstream calls':>16}")
+    checkpoints = {int(args.requests * f) for f in (0.01, 0.1, 0.5, 1.0)}
+    for i, (lat, lon) in enumerate(zip(lats, lons), start=1):
+        cache.get(lat, lon)
+        if i in checkpoints:
+            print(f"{i:>10}{len(cache.active_cells()):>8}{calls[0]:>16}")
+
+    n_cells = len(cache.active_cells())
+    start = time.perf_counter()
+    refreshed = cache.refresh_active()
+    elapsed = time.perf_counter() - start
+    print(f"\nBulk refresh of {refreshed}/{n_cells} cells at {args.latency * 1000:.0f} ms "
+          f"per response: {elapsed:.2f} s (sequential would be ~{n_cells * 2 * args.latency:.0f} s)")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
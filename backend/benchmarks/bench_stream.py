@@ -0,0 +1,99 @@
+"""
+GET /stream fan-out: how many updates are built against how many are
+delivered, with more and more subscribers.
+
+Each server runs under gunicorn with one worker against stub_server.py,
+with observations refreshed every --refresh seconds. N clients hold a
+/stream open for --seconds; the server's /health then reports how many
+updates it built (one per refresh) and how many frames it wrote (one per
+refresh per client). For comparison, the same clients polling POST
+/predict once per refresh would send N requests per refresh.
+
+    python -m benchmarks.bench_stream --clients 1 10 100 --seconds 20 --refresh 2
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.bench_async import free_port, start_server
+
+SERVERS = {
+    "threads (api:app)": ["api:app"],
+    "async (asgi:app)": ["-k", "uvicorn.workers.UvicornWorker", "asgi:app"],
+}
+
+
+async def subscribe(base_url, clients, seconds):
+    """Events received by each of `clients` subscribers within `seconds`."""
+    received = [0] * clients
+
+    async def client(i, http):
+        async with http.stream("GET", "/stream") as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("event: aqi"):
+                    received[i] += 1
+
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as http:
+        tasks = [asyncio.ensure_future(client(i, http)) for i in range(clients)]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = sum(isinstance(r, Exception) and not isinstance(r, asyncio.CancelledError) for r in results)
+    return received, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--refresh", type=float, default=2, help="observation refresh interval (s)")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, "stub_server.py", "--port", str(stub_port)],
+                            stdout=subprocess.DEVNULL)
+    most = max(args.clients)
+    env = dict(os.environ,
+               OPENWEATHER_MODE="replay",
+               OPENWEATHER_BASE_URL=f"http://127.0.0.1:{stub_port}",
+               OBSERVATION_TTL=str(args.refresh),
+               OBSERVATION_REFRESH_INTERVAL=str(args.refresh),
+               STREAM_POLL_INTERVAL=str(min(1.0, args.refresh / 2)),
+               # Enough threads for every client plus /health
+               GUNICORN_THREADS=str(most + 2),
+               STREAM_MAX_CLIENTS=str(most))
+
+    print(f"1 worker per server, observation refreshed every {args.refresh:g}s, {args.seconds:g}s per level\n")
+    print(f"{'server':<20}{'clients':>8}{'refreshes':>11}{'builds':>8}{'frames':>8}"
+          f"{'events/client':>15}{'errors':>8}{'polling reqs':>14}")
+    try:
+        for name, server_args in SERVERS.items():
+            for clients in args.clients:
+                # A fresh server per level, so /health counts only this level
+                server, base_url = start_server(server_args, 1, env)
+                try:
+                    received, errors = asyncio.run(subscribe(base_url, clients, args.seconds))
+                    time.sleep(0.5)
+                    health = httpx.get(f"{base_url}/health").json()
+                finally:
+                    server.terminate()
+                    server.wait()
+                stream = health['update_stream']
+                refreshes = health['observation_cache']['refreshes']
+                print(f"{name:<20}{clients:>8}{refreshes:>11}{stream['builds']:>8}{stream['frames_sent']:>8}"
+                      f"{sum(received) / clients:>15.1f}{errors:>8}{clients * refreshes:>14}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Upstream wall time per refresh: the old sequential bare requests.get calls
+against the pooled, concurrent OpenWeatherClient.
+
+Runs fully offline against stub_server.py with a fixed per-response latency.
+
+    python -m benchmarks.bench_upstream --latency 0.15 --rounds 20
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from openweather_client import DEFAULT_LAT, DEFAULT_LON, OpenWeatherClient
+from stub_server import start_stub_server
+
+
+def sequential_fetch(base_url):
+    # What each get_weather_and_pollution() copy did before: no session,
+    # no timeout, one endpoint after the other
+    p_url = f"{base_url}/data/2.5/air_pollution?lat={DEFAULT_LAT}&lon={DEFAULT_LON}&appid=replay"
+    requests.get(p_url).json()
+    w_url = f"{base_url}/data/2.5/weather?lat={DEFAULT_LAT}&lon={DEFAULT_LON}&appid=replay&units=metric"
+    requests.get(w_url).json()
+
+
+def time_rounds(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.15, help="stub latency per response (s)")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+    client = OpenWeatherClient(base_url=base_url, mode="replay")
+    try:
+        client.fetch_observation()  # warm the connection pool
+        old = time_rounds(lambda: sequential_fetch(base_url), args.rounds)
+        new = time_rounds(client.fetch_observation, args.rounds)
+    finally:
+        client.close()
+        server.shutdown()
+
+    print(f"Stub latency {args.latency * 1000:.0f} ms per response, {args.rounds} rounds\n")
+    print(f"{'':<28}{'median ms':>10}{'max ms':>10}")
+    print(f"{'sequential requests.get':<28}{statistics.median(old):>10.1f}{max(old):>10.1f}")
+    print(f"{'pooled concurrent client':<28}{statistics.median(new):>10.1f}{max(new):>10.1f}")
+    print(f"\nSpeedup: {statistics.median(old) / statistics.median(new):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
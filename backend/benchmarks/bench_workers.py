@@ -0,0 +1,116 @@
+"""
+Per-worker startup time and memory for the three ways of loading models:
+
+    pickle   every worker unpickles aqi_model.pkl (the old Procfile)
+    mmap     every worker maps aqi_model_compact/ read-only
+    preload  the master maps once and forks workers (gunicorn --preload)
+
+Workers stay alive together so PSS reflects shared pages. Reads
+/proc/self/smaps_rollup, so Linux only. Needs aqi_model.pkl and
+aqi_model_compact/ (python main.py).
+
+    python -m benchmarks.bench_workers --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from compact_forest import COMPACT_DIR, CompactForest
+
+
+def load_models(mode):
+    """Load both models; returns them with the time spent on the AQI forest."""
+    start = time.perf_counter()
+    if mode == "pickle":
+        with open("aqi_model.pkl", "rb") as f:
+            aqi_model = pickle.load(f)
+    else:
+        aqi_model = CompactForest.load(COMPACT_DIR, mmap_mode="r")
+    forest_load = time.perf_counter() - start
+    with open("health_risk_model.pkl", "rb") as f:
+        health_model = pickle.load(f)
+    return aqi_model, health_model, forest_load
+
+
+def memory_mb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return fields["Rss"], fields["Pss"], private
+
+
+def warm_up(aqi_model, X):
+    # Serve some traffic so the pages a worker really uses are resident
+    aqi_model.predict(X)
+
+
+def worker(mode, started, X, preloaded, ready, done, results):
+    load = 0.0
+    if preloaded is None:
+        aqi_model, _, load = load_models(mode)
+    else:
+        aqi_model = preloaded
+    startup = time.perf_counter() - started
+    warm_up(aqi_model, X)
+    ready.wait()
+    results.put((load, startup, *memory_mb()))
+    done.wait()
+
+
+def run(mode, n_workers, X):
+    ctx = mp.get_context("fork" if mode == "preload" else "spawn")
+    preloaded = None
+    master_load = 0.0
+    if mode == "preload":
+        start = time.perf_counter()
+        preloaded, _, _ = load_models("mmap")
+        master_load = time.perf_counter() - start
+
+    ready = ctx.Barrier(n_workers + 1)
+    done = ctx.Event()
+    results = ctx.Queue()
+    started = time.perf_counter()
+    procs = [ctx.Process(target=worker, args=(mode, started, X, preloaded, ready, done, results))
+             for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    ready.wait()
+    rows = [results.get() for _ in procs]
+    done.set()
+    for p in procs:
+        p.join()
+    return master_load, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    df = pd.read_csv("pollutant_model_features.csv")
+    X = np.ascontiguousarray(df.drop(['AQI', 'AQHI'], axis=1).to_numpy())
+
+    # worker start includes interpreter start-up and imports for spawned
+    # workers; forest load is only the time spent loading the AQI forest
+    print(f"{args.workers} workers; per-worker means\n")
+    print(f"{'mode':<10}{'master load s':>14}{'forest load s':>14}{'worker start s':>16}"
+          f"{'RSS MB':>10}{'PSS MB':>10}{'private MB':>12}")
+    for mode in ("pickle", "mmap", "preload"):
+        master_load, rows = run(mode, args.workers, X)
+        load, startup, rss, pss, private = np.mean(rows, axis=0)
+        print(f"{mode:<10}{master_load:>14.2f}{load:>14.2f}{startup:>16.2f}"
+              f"{rss:>10.1f}{pss:>10.1f}{private:>12.1f}")
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+    main()
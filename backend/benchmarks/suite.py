@@ -0,0 +1,176 @@
+"""
+Microbenchmark suite for the serving hot path.
+
+Times each case repeatedly and reports p50/p95/p99 latency and throughput
+of the fastest of a few rounds.
+Runs offline: /predict is served through Flask's test client with the
+upstream fetch replaced by the recorded fixtures. Needs aqi_model.pkl or
+aqi_model_compact/ (python main.py) and health_risk_model.pkl.
+
+    python -m benchmarks.suite                    # run and compare with the baseline
+    python -m benchmarks.suite --save             # run and record a new baseline
+    python -m benchmarks.suite --cases predict    # only cases whose name contains "predict"
+
+Comparing fails (exit 1) when a case's p50 or p95 is more than --threshold
+slower than the baseline, and prints a diff of every case.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Differences below this many ms are timer noise, never a regression
+NOISE_FLOOR_MS = 0.005
+
+
+def measure(fn, min_time, min_runs, warmup=5):
+    """Call fn until both min_time seconds and min_runs calls have passed."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'runs': len(samples),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'ops_per_s': round(len(samples) / (samples.sum() / 1000), 1)
+    }
+
+
+def build_cases():
+    """name -> zero-argument callable, in report order."""
+    import warnings
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    import api
+    from benchmarks.bench_batch import fixture_observation
+    from health_risk_predictor import predict_health_risks, serving_features
+    from recommend import recommend_batch, recommend_for_high_pollution
+    from response_cache import ResponseCache
+
+    observation = fixture_observation()
+    api.observation_cache.fetch = lambda lat, lon: observation
+    client = api.app.test_client()
+    body = {"age": 35, "gender_enc": 1, "parent_enc": 0}
+    assert client.post("/predict", json=body).status_code == 200  # warm the observation cache
+
+    models = api.model_registry.current()
+    package = models.health
+    models_only = {key: value for key, value in package.items() if key != 'lookup_table'}
+    aqi = api.predict_aqi(models.aqi, observation)
+    cohort_ages = np.random.default_rng(0).integers(1, 100, 1000)
+    etag = client.post("/predict", json=body).headers["ETag"]
+
+    def predict_uncached():
+        # A cache that keeps nothing, so every request runs the models
+        cache, api.response_cache = api.response_cache, ResponseCache(max_entries=0)
+        try:
+            client.post("/predict", json=body)
+        finally:
+            api.response_cache = cache
+
+    return {
+        'aqi_features': lambda: api.aqi_features(observation),
+        'serving_features': lambda: serving_features([35], [3], [1], [0]),
+        'predict_aqi': lambda: api.predict_aqi(models.aqi, observation),
+        'predict_health_risks (table)': lambda: predict_health_risks(35, aqi, 1, 0, package),
+        'predict_health_risks (models)': lambda: predict_health_risks(35, aqi, 1, 0, models_only),
+        'predict_health_risks (no package)': lambda: predict_health_risks(35, aqi, 1, 0),
+        'recommend_for_high_pollution': lambda: recommend_for_high_pollution(35, aqi),
+        'recommend_batch (1000 ages)': lambda: recommend_batch(cohort_ages, aqi),
+        'POST /predict': lambda: client.post("/predict", json=body),
+        'POST /predict (uncached)': predict_uncached,
+        'POST /predict (304)': lambda: client.post("/predict", json=body, headers={"If-None-Match": etag}),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print a diff against the baseline; returns the names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<36}{'base p50':>10}{'p50':>10}{'change':>9}{'base p95':>10}{'p95':>10}{'change':>9}")
+    for name, result in results.items():
+        old = baseline['cases'].get(name)
+        if old is None:
+            print(f"{name:<36}{'(new case, no baseline)':>58}")
+            continue
+        row, flags = f"{name:<36}", []
+        for key in ('p50_ms', 'p95_ms'):
+            change = result[key] / old[key] - 1 if old[key] else 0.0
+            row += f"{old[key]:>10.4f}{result[key]:>10.4f}{change:>+9.1%}"
+            if change > threshold and result[key] - old[key] > NOISE_FLOOR_MS:
+                flags.append(key[:3])
+        if flags:
+            regressions.append(name)
+            row += f"  REGRESSION ({', '.join(flags)})"
+        print(row)
+    for name in baseline['cases']:
+        if name not in results:
+            print(f"{name:<36}{'(in baseline, not run)':>58}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serving hot path microbenchmarks")
+    parser.add_argument("--cases", default="", help="only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per case and round")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="rounds per case; the fastest round is kept to damp scheduler noise")
+    parser.add_argument("--min-runs", type=int, default=20)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown of p50/p95 before failing (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    cases = {name: fn for name, fn in build_cases().items() if args.cases in name}
+    results = {}
+    print(f"{'case':<36}{'runs':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+    for name, fn in cases.items():
+        rounds = [measure(fn, args.min_time, args.min_runs) for _ in range(args.rounds)]
+        result = results[name] = min(rounds, key=lambda r: r['p50_ms'])
+        print(f"{name:<36}{result['runs']:>8}{result['p50_ms']:>10.4f}{result['p95_ms']:>10.4f}"
+              f"{result['p99_ms']:>10.4f}{result['ops_per_s']:>12,.0f}")
+
+    if args.save:
+        baseline = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+            'cases': results
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; record one with --save")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions against the baseline from {baseline['timestamp']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
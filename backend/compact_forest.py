@@ -0,0 +1,195 @@
+"""
+Array-backed evaluator for the AQI RandomForestRegressor.
+
+export_forest() flattens every tree of a fitted forest into a handful of
+contiguous NumPy arrays, and CompactForest.predict() walks all trees at once
+with vectorized gathers, so serving needs neither sklearn nor a pickle.
+
+    python compact_forest.py                      # aqi_model.pkl -> aqi_model_compact/
+    python compact_forest.py model.pkl out_dir    # explicit paths, e.g.
+    python compact_forest.py aqi_weather_model.pkl aqi_weather_compact
+"""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+COMPACT_DIR = "aqi_model_compact"
+ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+# Rows evaluated together; bounds the (n_trees x rows) working set to a few MB
+CHUNK_ROWS = 512
+
+
+def replace_dir(staging, final):
+    """Swap the directory `staging` in as `final`, retiring any previous `final` whole."""
+    if os.path.isdir(final):
+        retired = f"{final}.old-{os.getpid()}"
+        os.rename(final, retired)
+        os.rename(staging, final)
+        # Unlinking keeps the files alive for workers that still map them
+        shutil.rmtree(retired)
+    else:
+        os.rename(staging, final)
+
+
+def export_forest(model, path=COMPACT_DIR):
+    """
+    Flatten a fitted RandomForestRegressor into `path`.
+
+    Nodes of all trees are concatenated. Leaves point to themselves, so every
+    tree can be stepped the same fixed number of times (the deepest tree's
+    depth) without branching.
+
+    The arrays are written to a staging directory next to `path` and swapped
+    in whole: serving workers memory-map the live files, and rewriting a
+    mapped file in place kills them with SIGBUS.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    n_nodes = sum(tree.node_count for tree in trees)
+
+    feature = np.zeros(n_nodes, dtype=np.int16)
+    threshold = np.zeros(n_nodes, dtype=np.float64)
+    children = np.empty((n_nodes, 2), dtype=np.int32)
+    value = np.empty(n_nodes, dtype=np.float64)
+    roots = np.empty(len(trees), dtype=np.int32)
+
+    offset = 0
+    for i, tree in enumerate(trees):
+        n = tree.node_count
+        nodes = np.arange(offset, offset + n, dtype=np.int32)
+        is_leaf = tree.children_left == -1
+
+        roots[i] = offset
+        feature[offset:offset + n] = np.where(is_leaf, 0, tree.feature)
+        threshold[offset:offset + n] = np.where(is_leaf, 0.0, tree.threshold)
+        children[offset:offset + n, 0] = np.where(is_leaf, nodes, tree.children_left + offset)
+        children[offset:offset + n, 1] = np.where(is_leaf, nodes, tree.children_right + offset)
+        value[offset:offset + n] = tree.value[:, 0, 0]
+        offset += n
+
+    path = os.path.normpath(path)
+    staging = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    arrays = dict(feature=feature, threshold=threshold, children=children, value=value, roots=roots)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), array)
+
+    meta = {
+        "n_estimators": len(trees),
+        "n_features": int(model.n_features_in_),
+        "n_nodes": int(n_nodes),
+        "max_depth": int(max(tree.max_depth for tree in trees))
+    }
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    replace_dir(staging, path)
+
+    return CompactForest(meta=meta, **arrays)
+
+
+class CompactForest:
+    """Drop-in replacement for RandomForestRegressor.predict on exported arrays."""
+
+    def __init__(self, feature, threshold, children, value, roots, meta):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.meta = meta
+        self.n_estimators = meta["n_estimators"]
+        self.n_features_in_ = meta["n_features"]
+        self.max_depth = meta["max_depth"]
+
+    @classmethod
+    def load(cls, path=COMPACT_DIR, mmap_mode=None):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        # With mmap_mode='r' the arrays are read-only views of the files, so
+        # every process serving the same artifact shares one set of physical
+        # pages through the page cache. np.asarray drops the np.memmap
+        # subclass, whose per-operation overhead slows down the gathers.
+        arrays = {
+            name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+            for name in ARRAYS
+        }
+        return cls(meta=meta, **arrays)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def predict(self, X):
+        # sklearn evaluates trees on float32 inputs against float64 thresholds;
+        # matching that keeps predictions bit-for-bit identical
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}")
+
+        if len(X) == 1:
+            return np.array([self._predict_row(X[0])])
+
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            out[start:start + CHUNK_ROWS] = self._predict_chunk(X[start:start + CHUNK_ROWS])
+        return out
+
+    def _predict_row(self, x):
+        # Serving hot path: one row, one cursor per tree
+        children = self.children.reshape(-1)
+        node = self.roots.copy()
+        for _ in range(self.max_depth):
+            node = children.take(node * 2 + (x.take(self.feature.take(node)) > self.threshold.take(node)))
+        return np.cumsum(self.value.take(node))[-1] / self.n_estimators
+
+    def _predict_chunk(self, X):
+        n_rows, n_features = X.shape
+        X = np.ascontiguousarray(X).ravel()
+        row_offset = np.arange(n_rows)[None, :] * n_features
+        children = self.children.reshape(-1)
+
+        # (n_trees, n_rows): one cursor per tree per row; ndarray.take is
+        # markedly cheaper than fancy indexing for these small gathers
+        node = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_right = X.take(self.feature.take(node) + row_offset) > self.threshold.take(node)
+            node = children.take(node * 2 + go_right)
+
+        # Sum tree by tree, in order, as sklearn accumulates, then average
+        return np.cumsum(self.value.take(node), axis=0)[-1] / self.n_estimators
+
+
+def verify_parity(model, forest, X):
+    """Number of rows where the compact forest differs from the sklearn model."""
+    expected = model.predict(X)
+    actual = forest.predict(X)
+    return int(np.count_nonzero(expected != actual)), float(np.max(np.abs(expected - actual)))
+
+
+if __name__ == "__main__":
+    import pickle
+
+    import pandas as pd
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "aqi_model.pkl"
+    out_path = sys.argv[2] if len(sys.argv) > 2 else COMPACT_DIR
+
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    forest = export_forest(model, out_path)
+    print(f"Exported {forest.n_estimators} trees, {forest.meta['n_nodes']} nodes, "
+          f"max depth {forest.max_depth} to {out_path}/ ({forest.nbytes / 1e6:.1f} MB)")
+
+    df = pd.read_csv("pollutant_model_features.csv")
+    columns = getattr(model, "feature_names_in_", None)
+    X = (df[list(columns)] if columns is not None else df.drop(['AQI', 'AQHI'], axis=1)).to_numpy()
+    mismatches, max_diff = verify_parity(model, forest, X)
+    print(f"Parity on {len(X)} rows: {mismatches} mismatches, max diff {max_diff:.3g}")
+    if mismatches:
+        sys.exit(1)
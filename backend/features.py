@@ -0,0 +1,138 @@
+"""
+Feature pipeline shared by training and serving.
+
+The AQI forests are trained on pollutant_model_features.csv rows and served
+on live OpenWeather observations; both go through this module, so the
+columns, units and calendar features are built the same way:
+
+    transform(original)           Original_Dataset rows -> feature frame (aqi_engine.py)
+    observation_matrix(obs, when) many observations -> N x 13 matrix
+    observation_features(obs)     one observation -> 1 x 13 row, in a reused buffer
+    weather_matrix(days)          forecast days -> N x 7 matrix (forecast.py)
+
+Calendar features (month, day, is_festive) come from a table computed once
+per year. Precipitation is not reported by the current-weather endpoint and
+is 0.0 at serving time, as it has always been.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+# pollutant_model_features.csv columns without targets, in training order
+FEATURES = ['pm25', 'pm10', 'o3', 'no2', 'so2', 'co', 'temp', 'humidity', 'windspeedmean',
+            'precipitation_mm', 'month', 'day', 'is_festive']
+CALENDAR_FEATURES = ['month', 'day', 'is_festive']
+# Features of the weather-only forests (no pollutants)
+WEATHER_FEATURES = ['temp', 'humidity', 'windspeedmean', 'precipitation_mm'] + CALENDAR_FEATURES
+
+# Observation keys (openweather_client.parse_observation) for the first 9 features
+OBSERVATION_KEYS = ['PM25', 'PM10', 'O3', 'NO2', 'SO2', 'CO', 'temp', 'humidity', 'wind_speed']
+# OpenWeather reports CO in ug/m3; the dataset uses mg/m3
+CO_INDEX = OBSERVATION_KEYS.index('CO')
+CO_SCALE = 0.001
+
+# Festival and stubble-burning season
+FESTIVE_MONTHS = (10, 11)
+
+
+@lru_cache(maxsize=None)
+def calendar(year):
+    """Days x 3 table of (month, day, is_festive) for every day of a year."""
+    start = np.datetime64(f"{year}-01-01")
+    days = np.arange(start, np.datetime64(f"{year + 1}-01-01"))
+    month = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    festive = np.isin(month, FESTIVE_MONTHS)
+    table = np.column_stack([month, day, festive]).astype(np.float64)
+    table.flags.writeable = False
+    return table
+
+
+def calendar_features(dates):
+    """N x 3 (month, day, is_festive) for an array of dates."""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    years = dates.astype("datetime64[Y]")
+    out = np.empty((len(dates), len(CALENDAR_FEATURES)), dtype=np.float64)
+    for year in np.unique(years):
+        rows = years == year
+        out[rows] = calendar(int(year.astype(np.int64)) + 1970)[(dates[rows] - year).astype(np.int64)]
+    return out
+
+
+def calendar_row(when):
+    """(month, day, is_festive) of one date or datetime."""
+    return calendar(when.year)[when.timetuple().tm_yday - 1]
+
+
+_today = (0.0, None)   # (valid until, calendar row)
+
+
+def today_calendar():
+    """calendar_row of the local date (as a list), looked up again only after midnight."""
+    global _today
+    until, row = _today
+    if time.time() >= until:
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        row = calendar_row(now).tolist()
+        _today = (midnight.timestamp(), row)
+    return row
+
+
+def transform(original):
+    """
+    pollutant_model_features columns (without targets) from Original_Dataset
+    rows: the measured columns plus the calendar features of their dates.
+    """
+    import pandas as pd
+
+    dates = pd.to_datetime(original["date"], format="%d-%m-%Y")
+    features = original[FEATURES[:10]].copy()
+    for name, values in zip(CALENDAR_FEATURES, calendar_features(dates.to_numpy()).T):
+        features[name] = values.astype(np.int64)
+    return features
+
+
+def observation_matrix(observations, when=None):
+    """N x 13 feature matrix for many observations taken at `when` (default now)."""
+    out = np.empty((len(observations), len(FEATURES)), dtype=np.float64)
+    out[:, :9] = [[observation[key] for key in OBSERVATION_KEYS] for observation in observations]
+    out[:, CO_INDEX] *= CO_SCALE
+    out[:, 9] = 0.0
+    out[:, 10:] = calendar_row(when) if when is not None else today_calendar()
+    return out
+
+
+_buffers = threading.local()
+
+
+def observation_features(observation, when=None):
+    """
+    1 x 13 feature row for one observation at `when` (default now).
+
+    Filled into a buffer owned by the calling thread, so the single-row path
+    allocates nothing. The row is overwritten by the thread's next call;
+    copy it to keep it.
+    """
+    row = getattr(_buffers, "row", None)
+    if row is None:
+        row = _buffers.row = np.empty((1, len(FEATURES)), dtype=np.float64)
+    # Gathered in a list and copied into the buffer in one assignment
+    values = [observation[key] for key in OBSERVATION_KEYS]
+    values[CO_INDEX] *= CO_SCALE
+    values.append(0.0)
+    values.extend(calendar_row(when) if when is not None else today_calendar())
+    row[0] = values
+    return row
+
+
+def weather_matrix(days):
+    """N x 7 matrix in WEATHER_FEATURES order for forecast.daily_weather days."""
+    out = np.empty((len(days), len(WEATHER_FEATURES)), dtype=np.float64)
+    for i, day in enumerate(days):
+        out[i, :4] = (day['temp'], day['humidity'], day['windspeedmean'], day['precipitation_mm'])
+    out[:, 4:] = calendar_features([day['date'] for day in days])
+    return out
@@ -1,80 +1,205 @@
-import requests
-import numpy as np
-import pickle
-from datetime import datetime
+"""
+Command-line AQI advisory.
+
+    python final.py                                        # asks for your age
+    python final.py --batch users.csv --output advice.csv  # a whole user list
+
+Batch mode reads a CSV with age, gender_enc and parent_enc columns (other
+columns are copied through) in chunks of --chunk-rows. Every user shares
+one observation: fetched once for --city or --lat/--lon, or with --replay,
+the responses saved by OPENWEATHER_MODE=record. The AQI is predicted once.
+Health risks and recommendations are computed for a whole chunk at a time
+across a pool of --workers processes. Results are written to CSV or JSONL
+in input order, with at most two chunks per worker in memory. Rows with an
+invalid profile get an error column instead of results.
+"""
+import argparse
+import json
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
-from recommend import recommend_for_high_pollution
+from recommend import recommend_batch, recommend_for_high_pollution
+from features import observation_features
+from health_risk_predictor import health_risk_probabilities, risk_levels
+from locations import resolve_location
+from model_registry import load_aqi, load_health
+from openweather_client import (DEFAULT_LAT, DEFAULT_LON, UpstreamError, get_weather_and_pollution as fetch_observation,
+                                load_recorded_observation)
 
 # Load environment variables
 load_dotenv()
 
-def get_weather_and_pollution():
-    API_KEY = os.getenv("OPENWEATHER_API_KEY")
-    if not API_KEY:
-        print("\nERROR: OPENWEATHER_API_KEY not set in environment variables")
-        print("Please set the API key in .env.local or as an environment variable")
-        exit(1)
-    lat = "28.7041"
-    lon = "77.1025"
-
-    pollution_url = f"https://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
-    pol_json = requests.get(pollution_url).json()
-
-    # Check if API call was successful
-    if "list" not in pol_json:
-        print("\nAPI Error Response:", pol_json)
+PROFILE_COLUMNS = ['age', 'gender_enc', 'parent_enc']
+# Same messages as api.validate_profile
+PROFILE_ERRORS = [
+    'Invalid age. Must be between 1 and 120',
+    'Invalid gender. Must be 0 (Female), 1 (Male), or 2 (Other)',
+    'Invalid parent status. Must be 0 (No) or 1 (Yes)'
+]
+CHUNK_ROWS = 50_000
+
+def get_weather_and_pollution(lat=DEFAULT_LAT, lon=DEFAULT_LON):
+    try:
+        return fetch_observation(lat, lon)
+    except UpstreamError as e:
+        print("\nAPI Error:", e)
         print("\nThe API key may be invalid or the request failed.")
         print("Please check your OpenWeatherMap API key and internet connection.")
         exit(1)
 
-    comp = pol_json["list"][0]["components"]
-
-    PM25 = comp["pm2_5"]
-    PM10 = comp["pm10"]
-    NO2  = comp["no2"]
-    SO2  = comp["so2"]
-    CO   = comp["co"]
-    O3   = comp["o3"]
-
-    weather_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-    weather_json = requests.get(weather_url).json()
-
-    main = weather_json["main"]
-    wind = weather_json["wind"]
-
-    temp = main["temp"]
-    humidity = main["humidity"]
-    pressure = main["pressure"]
-    wind_speed = wind["speed"]
-
-    return {
-        "PM25": PM25,
-        "PM10": PM10,
-        "NO2": NO2,
-        "SO2": SO2,
-        "CO": CO,
-        "O3": O3,
-        "temp": temp,
-        "humidity": humidity,
-        "pressure": pressure,
-        "wind_speed": wind_speed
-    }
+def predict_observation(model, observation):
+    X = observation_features(observation)
+    if hasattr(model, 'feature_names_in_'):
+        # sklearn forest (no aqi_model_compact/): pass the columns it was fitted with
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    return model.predict(X)[0]
 
 def predict_aqi_from_api(model):
     data = get_weather_and_pollution()
-    now = datetime.now()
-    features = np.array([[
-        data["PM25"], data["PM10"], data["O3"], data["NO2"], data["SO2"], data["CO"],
-        data["temp"], data["humidity"], data["wind_speed"],
-        0.0,  # precipitation (API doesn't provide)
-        now.month, now.day, 0  # is_festive (simple version, always 0)
-    ]])
-    predicted_aqi = model.predict(features)[0]
+    predicted_aqi = predict_observation(model, data)
     return predicted_aqi, data
 
-if __name__ == "__main__":
-    model = pickle.load(open("aqi_model.pkl", "rb"))
+_health_model = None
+
+def _init_worker():
+    # Loaded once per process, not once per chunk, with the lookup table built
+    # if the package predates it, so rows never fall back to the XGBoost models
+    global _health_model
+    _health_model = load_health(".")
+
+def advise_chunk(chunk, predicted_aqi, output_format, header):
+    """Serialized results for one chunk of user rows. Returns (text, rows, invalid rows)."""
+    age = pd.to_numeric(chunk['age'], errors='coerce').to_numpy()
+    gender_enc = pd.to_numeric(chunk['gender_enc'], errors='coerce').to_numpy()
+    parent_enc = pd.to_numeric(chunk['parent_enc'], errors='coerce').to_numpy()
+    errors = np.select([~((age >= 1) & (age <= 120)), ~np.isin(gender_enc, (0, 1, 2)), ~np.isin(parent_enc, (0, 1))],
+                       PROFILE_ERRORS, default='')
+    rows = np.flatnonzero(errors == '')
+
+    symptoms, probabilities = health_risk_probabilities(age[rows], predicted_aqi, gender_enc[rows],
+                                                        parent_enc[rows], _health_model)
+    levels = risk_levels(probabilities)
+    advice, recommendations = recommend_batch(age[rows], predicted_aqi)
+    aqi = int(predicted_aqi)
+
+    if output_format == 'jsonl':
+        records = chunk.to_dict('records')
+        for record, error in zip(records, errors.tolist()):
+            if error:
+                record['error'] = error
+        for j, i in enumerate(rows.tolist()):
+            records[i].update(
+                aqi=aqi,
+                health_risks={symptom: {'probability': float(probabilities[k, j]), 'risk_level': levels[k, j]}
+                              for k, symptom in enumerate(symptoms)},
+                advice=advice[j],
+                recommendations=recommendations[j])
+        text = "".join(json.dumps(record) + "\n" for record in records)
+    else:
+        def column(values):
+            full = np.full(len(chunk), '', dtype=object)
+            full[rows] = values
+            return full
+
+        out = chunk.copy()
+        out['aqi'] = column(aqi)
+        out['category'] = column([a['category'] for a in advice])
+        out['age_group'] = column([a['age_group'] for a in advice])
+        for k, symptom in enumerate(symptoms):
+            out[f'{symptom}_probability'] = column(probabilities[k].astype(np.float64).round(4))
+            out[f'{symptom}_risk'] = column(levels[k])
+        out['recommendations'] = column(recommendations)
+        out['error'] = errors
+        text = out.to_csv(index=False, header=header, lineterminator="\n")
+
+    return text, len(chunk), len(chunk) - len(rows)
+
+def advise_chunks(chunks, predicted_aqi, output_format, workers):
+    """advise_chunk results in input order; workers=0 runs in this process."""
+    if workers == 0:
+        _init_worker()
+        for i, chunk in enumerate(chunks):
+            yield advise_chunk(chunk, predicted_aqi, output_format, i == 0)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for i, chunk in enumerate(chunks):
+            pending.append(pool.submit(advise_chunk, chunk, predicted_aqi, output_format, i == 0))
+            # Bounded read-ahead: never more than two chunks per worker in memory
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def run_batch(args):
+    start = time.perf_counter()
+    output_format = args.format or ('jsonl' if args.output.endswith('.jsonl') else 'csv')
+
+    if args.replay is not None:
+        observation = load_recorded_observation(args.replay or None)
+    else:
+        try:
+            lat, lon = resolve_location({'city': args.city, 'lat': args.lat, 'lon': args.lon})
+        except ValueError as e:
+            sys.exit(str(e))
+        observation = get_weather_and_pollution(lat, lon)
+
+    # The compact forest when exported (python compact_forest.py), as served by api.py
+    model = load_aqi(".")
+    predicted_aqi = predict_observation(model, observation)
+    print(f"Predicted AQI: {int(predicted_aqi)}")
+
+    chunks = pd.read_csv(args.batch, dtype=str, keep_default_na=False, chunksize=args.chunk_rows)
+    first = next(chunks, None)
+    if first is None:
+        sys.exit(f"{args.batch} has no rows")
+    missing = [column for column in PROFILE_COLUMNS if column not in first.columns]
+    if missing:
+        sys.exit(f"{args.batch} is missing columns: {', '.join(missing)}")
+
+    def all_chunks():
+        yield first
+        yield from chunks
+
+    rows = invalid = 0
+    with open(args.output, "w", newline="") as out:
+        for text, n, n_invalid in advise_chunks(all_chunks(), predicted_aqi, output_format, args.workers):
+            out.write(text)
+            rows += n
+            invalid += n_invalid
+
+    seconds = time.perf_counter() - start
+    print(f"{rows} users ({invalid} invalid) in {seconds:.1f}s ({rows / seconds:,.0f} users/s) -> {args.output}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AQI prediction and health advice")
+    parser.add_argument("--batch", metavar="CSV", help="user profiles (age, gender_enc, parent_enc)")
+    parser.add_argument("--output", help="results file (.csv or .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the --output extension")
+    parser.add_argument("--city")
+    parser.add_argument("--lat", type=float)
+    parser.add_argument("--lon", type=float)
+    parser.add_argument("--replay", nargs="?", const="", metavar="DIR",
+                        help="use recorded OpenWeather responses (default OPENWEATHER_RECORD_DIR or fixtures)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="health/recommendation processes (0: in this process)")
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        if not args.output:
+            parser.error("--batch needs --output")
+        run_batch(args)
+        return
+
+    model = load_aqi(".")
     age = int(input("Enter your age: "))
 
     predicted_aqi, weather_data = predict_aqi_from_api(model)
@@ -94,3 +219,6 @@ if __name__ == "__main__":
 
     reco = recommend_for_high_pollution(age, predicted_aqi)
     print(reco)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Multi-day AQI forecast from the weather forecast.
+
+The weather-only forest (variant aqi_weather in train_aqi.py, saved by
+main2.py) predicts AQI from temperature, humidity, wind, rain and the
+calendar. The 3-hourly OpenWeather forecast is reduced to daily means, the
+same shape as the training rows, and every day of the horizon is predicted
+in one model call.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from features import WEATHER_FEATURES, weather_matrix
+from observation_cache import GridObservationCache
+
+
+def daily_weather(forecast):
+    """
+    Daily means (precipitation: totals) of a 3-hourly forecast, by local date.
+
+    Returns a list of dicts with date, temp, humidity, windspeedmean,
+    precipitation_mm and samples (3-hour slots covered), in date order.
+    """
+    entries = forecast['entries']
+    if not entries:
+        return []
+    dt = np.array([e['dt'] for e in entries], dtype=np.int64) + forecast.get('timezone', 0)
+    days, slot_day = np.unique(dt // 86400, return_inverse=True)
+    samples = np.bincount(slot_day)
+
+    def daily_mean(key):
+        return np.bincount(slot_day, weights=[e[key] for e in entries]) / samples
+
+    temp = daily_mean('temp')
+    humidity = daily_mean('humidity')
+    wind = daily_mean('wind_speed')
+    rain = np.bincount(slot_day, weights=[e['rain_mm'] for e in entries])
+
+    return [
+        {
+            'date': date.fromordinal(date(1970, 1, 1).toordinal() + int(day)),
+            'temp': float(temp[i]),
+            'humidity': float(humidity[i]),
+            'windspeedmean': float(wind[i]),
+            'precipitation_mm': float(rain[i]),
+            'samples': int(samples[i])
+        }
+        for i, day in enumerate(days)
+    ]
+
+
+class ForecastService:
+    """
+    Daily AQI forecasts per location, cached until the weather forecast changes.
+
+    Weather forecasts are fetched through a GridObservationCache (one per grid
+    cell, single-flight, served stale while refreshing). Predictions are kept
+    per (cell, date) alongside the forecast they came from, and recomputed in
+    one vectorized call only when that cell's forecast has been refreshed.
+    """
+
+    def __init__(self, model, fetch, ttl=3600, max_stale=6 * 3600, cell_size=0.1, max_cells=1000,
+                 listener=None):
+        if model.n_features_in_ != len(WEATHER_FEATURES):
+            raise ValueError(f"Forecast model expects {model.n_features_in_} features, "
+                             f"not the {len(WEATHER_FEATURES)} weather features")
+        self.model = model
+        self.forecasts = GridObservationCache(fetch, ttl=ttl, max_stale=max_stale, cell_size=cell_size,
+                                              max_cells=max_cells, listener=listener)
+        self.max_cells = max_cells
+
+        self._lock = threading.Lock()
+        self._predictions = OrderedDict()   # cell -> (forecast, {date: day})
+        self.predictions = 0
+
+    def cell_for(self, lat, lon):
+        return self.forecasts.cell_for(lat, lon)
+
+    def get(self, lat, lon):
+        """List of forecast days for a location, each with its predicted 'aqi'."""
+        cell = self.cell_for(lat, lon)
+        forecast = self.forecasts.get(lat, lon)
+
+        with self._lock:
+            entry = self._predictions.get(cell)
+            if entry is not None and entry[0] is forecast:
+                self._predictions.move_to_end(cell)
+                return list(entry[1].values())
+
+        days = daily_weather(forecast)
+        if days:
+            aqi = self.model.predict(weather_matrix(days))
+            for day, value in zip(days, aqi):
+                day['aqi'] = float(value)
+
+        with self._lock:
+            self.predictions += 1
+            self._predictions[cell] = (forecast, {day['date']: day for day in days})
+            self._predictions.move_to_end(cell)
+            if len(self._predictions) > self.max_cells:
+                self._predictions.popitem(last=False)
+        return days
+
+    def stats(self):
+        stats = self.forecasts.stats()
+        with self._lock:
+            stats['predictions'] = self.predictions
+        return stats
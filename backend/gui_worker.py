@@ -0,0 +1,108 @@
+"""
+Background worker for the Tk desktop apps (gui.py, gui_enhanced.py).
+
+Tk widgets may only be used from the main thread, and a button handler that
+waits on OpenWeather or a model freezes the window until it returns. Here a
+click only queues a job. One worker thread takes the latest job, reads the
+observation from an ObservationCache, predicts the AQI (once per
+observation) and renders the result; the Tk loop polls the result queue
+with after() and shows it.
+
+The observation is fetched when the window opens and refreshed every
+`refresh_interval` seconds in the background, so clicks are answered from
+memory. When a refresh brings a new observation, the last job runs again
+and the window updates without a click.
+"""
+import os
+import queue
+import threading
+import time
+
+from features import observation_features
+from observation_cache import ObservationCache
+from openweather_client import get_weather_and_pollution
+
+OBSERVATION_TTL = float(os.getenv("OBSERVATION_TTL", "600"))
+OBSERVATION_MAX_STALE = float(os.getenv("OBSERVATION_MAX_STALE", "3600"))
+REFRESH_INTERVAL = float(os.getenv("OBSERVATION_REFRESH_INTERVAL", str(OBSERVATION_TTL)))
+
+
+class PredictionWorker:
+    """
+    Runs `render(observation, predicted_aqi, *args)` off the main thread for
+    every submit(*args) and calls `show(text)` on the main thread with its
+    result. Errors are shown as text too.
+    """
+
+    def __init__(self, root, model, render, show, refresh_interval=REFRESH_INTERVAL, poll_ms=50):
+        self.root = root
+        self.model = model
+        self.render = render
+        self.show = show
+        self.refresh_interval = refresh_interval
+        self.poll_ms = poll_ms
+
+        self.cache = ObservationCache(get_weather_and_pollution, ttl=OBSERVATION_TTL,
+                                      max_stale=OBSERVATION_MAX_STALE)
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._last_job = None
+        self._prediction = (None, None)   # (observation version, predicted AQI)
+
+    def start(self):
+        threading.Thread(target=self._work, name="gui-worker", daemon=True).start()
+        threading.Thread(target=self._refresh_loop, name="gui-refresh", daemon=True).start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, *args):
+        """Queue a prediction; returns at once."""
+        self._last_job = args
+        self._jobs.put(args)
+
+    def predict_aqi(self, observation, version):
+        # The AQI depends only on the observation
+        cached_version, p = self._prediction
+        if cached_version != version:
+            p = self.model.predict(observation_features(observation))[0]
+            self._prediction = (version, p)
+        return p
+
+    def _work(self):
+        while True:
+            args = self._jobs.get()
+            # Clicks queued while busy: only the latest one matters
+            while True:
+                try:
+                    args = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                observation, version = self.cache.get_versioned()
+                text = self.render(observation, self.predict_aqi(observation, version), *args)
+            except Exception as e:
+                text = f"Could not get a prediction: {e}"
+            self._results.put(text)
+
+    def _refresh_loop(self):
+        while True:
+            version = self.cache.version
+            try:
+                self.cache.refresh()
+            except Exception:
+                # Served stale until the next attempt; get_versioned reports it once too old
+                pass
+            else:
+                if self.cache.version != version and self._last_job is not None:
+                    self._jobs.put(self._last_job)
+            if self.refresh_interval <= 0:
+                return
+            time.sleep(self.refresh_interval)
+
+    def _poll(self):
+        while True:
+            try:
+                text = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self.show(text)
+        self.root.after(self.poll_ms, self._poll)
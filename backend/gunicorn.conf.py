@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Threads per worker (gthread). A /stream client holds a thread for up to
+# STREAM_MAX_SECONDS, not a whole worker, but the thread only sleeps until the
+# next update. api.py admits at most STREAM_MAX_CLIENTS (default 56) streams
+# per worker, so 8 threads stay free for requests: 4 x 56 = 224 streams in all.
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+
+# Import api.py, and with it the models, once in the master before forking.
+# Workers then start without loading anything, and share the master's pages:
+# the memory-mapped forest through the page cache, the rest copy-on-write.
+# Set GUNICORN_PRELOAD=0 to load per worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Workers write their Prometheus metrics to files in this directory and
+# /metrics aggregates them (see metrics.py). It must be set before api.py
+# imports prometheus_client, and values from a previous run are cleared.
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), f"aqi-metrics-{os.getpid()}"))
+os.makedirs(metrics_dir, exist_ok=True)
+for name in os.listdir(metrics_dir):
+    if name.endswith(".db"):
+        os.remove(os.path.join(metrics_dir, name))
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges (in-flight requests)
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
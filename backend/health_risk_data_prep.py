@@ -1,6 +1,33 @@
+"""
+Survey data prep for the health-risk models.
+
+Reads Cleaned_Air_Pollution.csv in chunks and appends encoded rows to
+health_risk_training.csv. The survey file is append-only, so each run only
+processes the rows added since the last one: the byte offset reached, the
+size of the training file and the random state for aqi_category are kept in
+health_prep_state.json. Memory stays constant however large the survey
+grows. A run that stops halfway is rolled back on the next run by
+truncating the training file to its recorded size.
+
+Gender, income and parent status are encoded with persisted encoders
+(health_encoders.json). Codes never change once assigned: a full build
+numbers each column's values in sorted order, as sklearn's LabelEncoder
+did. A value first seen in later rows gets the next free code, and the
+encoders' version is bumped. train_models() stores the encoders with the
+models, so the codes used at serve time are explicit.
+
+    python health_risk_data_prep.py              # process new survey rows
+    python health_risk_data_prep.py --rebuild    # rebuild from the first row
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
 
 def calculate_aqi_from_pm25(pm25):
     breakpoints = [
@@ -19,55 +46,226 @@ def calculate_aqi_from_pm25(pm25):
             return int(round(aqi))
     return 500
 
-def main():
-    print("=== DATA PREPARATION ===\n")
 
-    # Load survey data
-    survey_df = pd.read_csv("Cleaned_Air_Pollution.csv")
-    print(f"Loaded {len(survey_df)} survey samples")
+SURVEY_PATH = "Cleaned_Air_Pollution.csv"
+TRAINING_PATH = "health_risk_training.csv"
+ENCODERS_PATH = "health_encoders.json"
+STATE_PATH = "health_prep_state.json"
+CHUNK_ROWS = 100_000
+
+# Convert age groups to numeric
+AGE_MAP = {
+    '0 to 4': 2, '5 to 9': 7, '10 to 14': 12, '15 to 19': 17,
+    '20 to 24': 22, '25 to 34': 29, '35 to 44': 39, '45 to 54': 49, '55+': 62
+}
+# Encoded feature -> survey column
+ENCODED_COLUMNS = {'gender_enc': 'Gender', 'income_enc': 'Monthly_income', 'parent_enc': 'Parent'}
+# Survey columns of the binary targets (note the trailing space)
+TARGET_SOURCES = ['Respiratory_difficulties', 'Cough', 'Headache', 'Missed_school_or_work ']
+TRAINING_COLUMNS = ['age', 'aqi_category', 'gender_enc', 'income_enc', 'parent_enc', 'concern_level',
+                    'Respiratory_difficulties_binary', 'Cough_binary', 'Headache_binary',
+                    'Missed_school_or_work_binary']
+
+# Assign AQI categories based on historical distribution
+# Survey context: "High Air Pollution" means AQI > 150
+# Categories: 2 (150-200), 3 (200-300), 4 (300+)
+AQI_CATEGORIES = [2, 3, 4]
+AQI_CATEGORY_PROBABILITIES = [0.45, 0.40, 0.15]
+
+
+class _FileRange(io.RawIOBase):
+    """Read-only view of `length` bytes of an open binary file from its current position."""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.f.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def complete_rows_end(f, size):
+    """Offset just past the last newline; a row still being written waits for the next run."""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - 65536)
+        f.seek(start)
+        newline = f.read(pos - start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        pos = start
+    return 0
+
+
+def read_chunks(f, header, offset, end, chunk_rows=CHUNK_ROWS, usecols=None):
+    """DataFrames of at most chunk_rows survey rows between two byte offsets, as strings."""
+    f.seek(offset)
+    stream = io.TextIOWrapper(io.BufferedReader(_FileRange(f, end - offset)), encoding="utf-8", newline="")
+    return pd.read_csv(stream, header=None, names=header, dtype=str, chunksize=chunk_rows,
+                       usecols=usecols)
+
+
+def load_encoders(path=ENCODERS_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(data, path):
+    staging = f"{path}.tmp-{os.getpid()}"
+    with open(staging, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(staging, path)
 
-    # Convert age groups to numeric
-    age_map = {
-        '0 to 4': 2, '5 to 9': 7, '10 to 14': 12, '15 to 19': 17,
-        '20 to 24': 22, '25 to 34': 29, '35 to 44': 39, '45 to 54': 49, '55+': 62
+
+def new_encoders(classes):
+    """Encoders numbering each column's values in sorted order (LabelEncoder codes)."""
+    return {
+        'version': 1,
+        'updated': datetime.now().isoformat(timespec='seconds'),
+        'columns': {name: {'source': ENCODED_COLUMNS[name], 'classes': sorted(classes[name])}
+                    for name in ENCODED_COLUMNS}
+    }
+
+
+def encode(encoders, name, values):
+    """Codes for a column's values; unseen values get the next codes and bump the version."""
+    classes = encoders['columns'][name]['classes']
+    new = sorted(set(values.dropna().unique()) - set(classes))
+    if new:
+        classes.extend(new)
+        encoders['version'] += 1
+        encoders['updated'] = datetime.now().isoformat(timespec='seconds')
+    return values.map({value: code for code, value in enumerate(classes)})
+
+
+def training_rows(chunk, encoders, rng):
+    """health_risk_training rows for one chunk of survey rows, in TRAINING_COLUMNS order."""
+    rows = pd.DataFrame(index=chunk.index)
+    rows['age'] = chunk['Age_group'].map(AGE_MAP).astype(float)
+    # Drawn for every survey row, in order, so chunked runs match one full pass
+    rows['aqi_category'] = rng.choice(AQI_CATEGORIES, size=len(chunk), p=AQI_CATEGORY_PROBABILITIES)
+    for name, source in ENCODED_COLUMNS.items():
+        rows[name] = encode(encoders, name, chunk[source])
+    rows['concern_level'] = pd.to_numeric(chunk['High_air_pollution_concern'])
+    for source in TARGET_SOURCES:
+        rows[source.strip() + '_binary'] = (chunk[source] == 'Yes').astype(int)
+
+    # Rows without a gender, income or parent answer cannot be encoded
+    complete = rows[list(ENCODED_COLUMNS)].notna().all(axis=1)
+    rows = rows[complete]
+    for name in ENCODED_COLUMNS:
+        rows[name] = rows[name].astype(int)
+    return rows, int((~complete).sum())
+
+
+def prepare(survey_path=SURVEY_PATH, training_path=TRAINING_PATH, encoders_path=ENCODERS_PATH,
+            state_path=STATE_PATH, chunk_rows=CHUNK_ROWS, rebuild=False):
+    """Append the survey rows added since the last run. Returns a summary dict."""
+    state = None
+    if not rebuild and os.path.exists(state_path) and os.path.exists(training_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    with open(survey_path, "rb") as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode("utf-8")]))
+        end = complete_rows_end(f, os.fstat(f.fileno()).st_size)
+
+        if state is None:
+            # Full build: one pass to collect every value, so codes follow sorted order
+            offset = len(header_line)
+            classes = {name: set() for name in ENCODED_COLUMNS}
+            for chunk in read_chunks(f, header, offset, end, chunk_rows, usecols=list(ENCODED_COLUMNS.values())):
+                for name, source in ENCODED_COLUMNS.items():
+                    classes[name].update(chunk[source].dropna().unique())
+            encoders = new_encoders(classes)
+            rng = np.random.RandomState(42)
+            with open(training_path, "w", newline="") as out:
+                out.write(",".join(TRAINING_COLUMNS) + "\n")
+            appended_from = 0
+        else:
+            if state['header'] != header:
+                raise ValueError(f"{survey_path} columns changed since the last run; use --rebuild")
+            offset = state['offset']
+            if offset > end:
+                raise ValueError(f"{survey_path} is shorter than at the last run; use --rebuild")
+            encoders = load_encoders(encoders_path)
+            rng = np.random.RandomState()
+            rng.set_state(('MT19937', np.array(state['rng']['key'], dtype=np.uint32), state['rng']['pos'],
+                           state['rng']['has_gauss'], state['rng']['cached_gaussian']))
+            # Drop anything a run that did not finish appended
+            with open(training_path, "r+b") as out:
+                out.truncate(state['training_size'])
+            appended_from = state['rows']
+
+        version = encoders['version']
+        rows, skipped = appended_from, 0
+        positives = dict.fromkeys(TRAINING_COLUMNS[6:], 0)
+        with open(training_path, "a", newline="") as out:
+            for chunk in read_chunks(f, header, offset, end, chunk_rows):
+                new_rows, chunk_skipped = training_rows(chunk, encoders, rng)
+                new_rows.to_csv(out, header=False, index=False)
+                rows += len(new_rows)
+                skipped += chunk_skipped
+                for col in positives:
+                    positives[col] += int(new_rows[col].sum())
+
+    save_json(encoders, encoders_path)
+    _, key, pos, has_gauss, cached_gaussian = rng.get_state()
+    save_json({
+        'survey': survey_path,
+        'header': header,
+        'offset': end,
+        'rows': rows,
+        'training_size': os.path.getsize(training_path),
+        'rng': {'key': key.tolist(), 'pos': pos, 'has_gauss': has_gauss, 'cached_gaussian': cached_gaussian},
+        'encoders_version': encoders['version'],
+        'updated': datetime.now().isoformat(timespec='seconds')
+    }, state_path)
+
+    return {
+        'full_build': state is None,
+        'new_rows': rows - appended_from,
+        'skipped_rows': skipped,
+        'positives': positives,
+        'total_rows': rows,
+        'encoders_version': encoders['version'],
+        'new_classes': encoders['version'] - version if state is not None else 0
     }
-    survey_df['age'] = survey_df['Age_group'].map(age_map)
-
-    # Assign AQI categories based on historical distribution
-    # Survey context: "High Air Pollution" means AQI > 150
-    # Categories: 2 (150-200), 3 (200-300), 4 (300+)
-    np.random.seed(42)
-    distribution = [2, 3, 4]
-    probabilities = [0.45, 0.40, 0.15]
-    survey_df['aqi_category'] = np.random.choice(distribution, size=len(survey_df), p=probabilities)
-
-    # Encode categorical features
-    survey_df['gender_enc'] = LabelEncoder().fit_transform(survey_df['Gender'])
-    survey_df['income_enc'] = LabelEncoder().fit_transform(survey_df['Monthly_income'])
-    survey_df['parent_enc'] = LabelEncoder().fit_transform(survey_df['Parent'])
-
-    # Create binary targets
-    target_cols = ['Respiratory_difficulties', 'Cough', 'Headache', 'Missed_school_or_work ']
-    for col in target_cols:
-        clean_name = col.strip() + '_binary'
-        survey_df[clean_name] = (survey_df[col] == 'Yes').astype(int)
-
-    # Select final features
-    feature_cols = ['age', 'aqi_category', 'gender_enc', 'income_enc', 'parent_enc', 'High_air_pollution_concern']
-    target_cols_binary = ['Respiratory_difficulties_binary', 'Cough_binary', 'Headache_binary', 'Missed_school_or_work_binary']
-
-    training_df = survey_df[feature_cols + target_cols_binary].copy()
-    training_df.rename(columns={'High_air_pollution_concern': 'concern_level'}, inplace=True)
-
-    # Save
-    training_df.to_csv("health_risk_training.csv", index=False)
-    print(f"Saved training data: {training_df.shape}")
-    print(f"\nTarget distributions:")
-    for col in target_cols_binary:
-        pos_count = training_df[col].sum()
-        print(f"  {col}: {pos_count} ({pos_count/len(training_df):.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new survey rows to the health-risk training set")
+    parser.add_argument("--rebuild", action="store_true", help="start over from the first survey row")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    print("=== DATA PREPARATION ===\n")
+    result = prepare(chunk_rows=args.chunk_rows, rebuild=args.rebuild)
+
+    if result['full_build']:
+        print(f"Built {TRAINING_PATH} from {result['total_rows']} survey samples")
+    else:
+        print(f"Appended {result['new_rows']} new survey samples ({result['total_rows']} in total)")
+    if result['skipped_rows']:
+        print(f"Skipped {result['skipped_rows']} rows without gender, income or parent status")
+    print(f"Encoders: version {result['encoders_version']} in {ENCODERS_PATH}")
+
+    if result['new_rows']:
+        print("\nTarget distributions of the new rows:")
+        for col, pos_count in result['positives'].items():
+            print(f"  {col}: {pos_count} ({pos_count/result['new_rows']:.1%})")
 
     print("\n[SUCCESS] Data preparation complete!\n")
+    return result
 
 if __name__ == "__main__":
     main()
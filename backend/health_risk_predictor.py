@@ -1,8 +1,11 @@
+import os
+import time
 import pandas as pd
 import numpy as np
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 from xgboost import XGBClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import roc_auc_score
 
 def get_aqi_category(aqi):
@@ -15,6 +18,11 @@ def get_aqi_category(aqi):
     else:
         return 4
 
+# Serving inputs are all discrete: age 1-120, aqi_category 1-4, gender_enc 0-2,
+# parent_enc 0-1, with income_enc and concern_level fixed at 2 and 5. The full
+# grid is 2,880 rows per symptom, so it is precomputed at train time.
+TABLE_SHAPE = (120, 4, 3, 2)
+
 def get_risk_level(probability):
     if probability < 0.33:
         return "LOW"
@@ -23,49 +31,183 @@ def get_risk_level(probability):
     else:
         return "HIGH"
 
-def train_models():
-    print("=== MODEL TRAINING ===\n")
+def serving_features(ages, aqi_categories, gender_encs, parent_encs):
+    """N x 6 feature matrix with the serving defaults for income and concern."""
+    features = np.empty((len(ages), 6), dtype=np.float64)
+    features[:, 0] = ages
+    features[:, 1] = aqi_categories
+    features[:, 2] = gender_encs
+    features[:, 3] = 2    # income_enc: 2=Middle income (default, mode from training)
+    features[:, 4] = parent_encs
+    features[:, 5] = 5    # concern_level: 5=Moderate (default, mean from training)
+    return features
 
-    df = pd.read_csv("health_risk_training.csv")
-    print(f"Training on {len(df)} samples")
+def build_lookup_table(models):
+    """
+    Evaluate every model over the whole discrete serving grid.
 
-    feature_cols = ['age', 'aqi_category', 'gender_enc', 'income_enc', 'parent_enc', 'concern_level']
-    target_cols = ['Respiratory_difficulties_binary', 'Cough_binary', 'Headache_binary', 'Missed_school_or_work_binary']
+    Returns {'symptoms': [...], 'probabilities': float32 array of shape
+    (n_symptoms, 120, 4, 3, 2)} indexed by [symptom, age-1, aqi_category-1,
+    gender_enc, parent_enc].
+    """
+    grid = np.indices(TABLE_SHAPE).reshape(len(TABLE_SHAPE), -1)
+    features = serving_features(grid[0] + 1, grid[1] + 1, grid[2], grid[3])
 
-    X = df[feature_cols]
-    models = {}
+    symptoms = list(models)
+    probabilities = np.empty((len(symptoms),) + TABLE_SHAPE, dtype=np.float32)
+    for i, symptom_name in enumerate(symptoms):
+        probabilities[i] = models[symptom_name].predict_proba(features)[:, 1].reshape(TABLE_SHAPE)
+
+    return {'symptoms': symptoms, 'probabilities': probabilities}
+
+def check_lookup_parity(model_package, n_samples=None, seed=42):
+    """
+    Compare the lookup table against the live models.
+
+    Checks every cell by default, or a random sample of n_samples cells.
+    Returns the maximum absolute difference (0.0 when they agree exactly).
+    """
+    table = model_package['lookup_table']
+    grid = np.indices(TABLE_SHAPE).reshape(len(TABLE_SHAPE), -1)
+    if n_samples is not None:
+        rng = np.random.default_rng(seed)
+        grid = grid[:, rng.choice(grid.shape[1], size=n_samples, replace=False)]
+    features = serving_features(grid[0] + 1, grid[1] + 1, grid[2], grid[3])
+
+    max_diff = 0.0
+    for i, symptom_name in enumerate(table['symptoms']):
+        live = model_package['models'][symptom_name].predict_proba(features)[:, 1]
+        cached = table['probabilities'][i][tuple(grid)]
+        max_diff = max(max_diff, float(np.max(np.abs(live - cached))))
+    return max_diff
+
+def table_index(age, aqi_category, gender_enc, parent_enc):
+    """Lookup-table index for one user, or None if the inputs fall outside it."""
+    if age != int(age) or not 1 <= age <= TABLE_SHAPE[0]:
+        return None
+    if gender_enc not in (0, 1, 2) or parent_enc not in (0, 1):
+        return None
+    return (int(age) - 1, aqi_category - 1, int(gender_enc), int(parent_enc))
+
+FEATURE_COLS = ['age', 'aqi_category', 'gender_enc', 'income_enc', 'parent_enc', 'concern_level']
+TARGET_COLS = ['Respiratory_difficulties_binary', 'Cough_binary', 'Headache_binary', 'Missed_school_or_work_binary']
+
+HEALTH_PARAMS = dict(
+    max_depth=4,
+    learning_rate=0.1,
+    n_estimators=100,
+    min_child_weight=3,
+    subsample=0.8,
+    colsample_bytree=0.8
+)
+
+def make_classifier(**params):
+    # tree_method='hist' is XGBoost's default since 2.0; it is pinned so the
+    # models stay reproducible across versions. One thread per fit: the
+    # parallelism comes from running fits side by side. `params` override
+    # HEALTH_PARAMS (see tune.py).
+    return XGBClassifier(**{**HEALTH_PARAMS, 'random_state': 42, 'tree_method': 'hist', 'n_jobs': 1, **params})
 
+def compute_splits(df, target_cols=TARGET_COLS):
+    """
+    Row indices for every fit, computed once per target and shared by all fits.
+
+    'holdout' is the 80/20 stratified split used for the saved model, 'folds'
+    the 5 StratifiedKFold folds that cross_val_score(cv=5) would generate.
+    """
+    splits = {}
+    rows = np.arange(len(df))
     for target in target_cols:
-        symptom_name = target.replace('_binary', '')
-        y = df[target]
+        y = df[target].to_numpy()
+        train_idx, test_idx = train_test_split(rows, test_size=0.2, random_state=42, stratify=y)
+        splits[target] = {
+            'holdout': (train_idx, test_idx),
+            'folds': list(StratifiedKFold(n_splits=5).split(rows, y))
+        }
+    return splits
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+_worker_df = None
 
-        model = XGBClassifier(
-            max_depth=4,
-            learning_rate=0.1,
-            n_estimators=100,
-            min_child_weight=3,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42
-        )
+def _init_worker(df):
+    # Each worker receives the data once instead of once per task
+    global _worker_df
+    _worker_df = df
 
-        model.fit(X_train, y_train)
+def _fit_task(task):
+    """Fit one model on train_idx and score ROC-AUC on test_idx."""
+    target, kind, train_idx, test_idx = task
+    X = _worker_df[FEATURE_COLS]
+    y = _worker_df[target]
 
-        y_pred_proba = model.predict_proba(X_test)[:, 1]
-        roc_auc = roc_auc_score(y_test, y_pred_proba)
-        cv_scores = cross_val_score(model, X, y, cv=5, scoring='roc_auc')
+    model = make_classifier()
+    model.fit(X.iloc[train_idx], y.iloc[train_idx])
+    y_pred_proba = model.predict_proba(X.iloc[test_idx])[:, 1]
+    score = roc_auc_score(y.iloc[test_idx], y_pred_proba)
+    return target, kind, score, model if kind == 'holdout' else None
+
+def fit_all(df, splits, max_workers=None):
+    """
+    Run every holdout and CV fit (4 targets x 6 fits) across a process pool.
+
+    Returns {target: (holdout_model, holdout_auc, [cv_aucs])}. max_workers=1
+    runs everything in this process.
+    """
+    tasks = []
+    for target, target_splits in splits.items():
+        tasks.append((target, 'holdout') + target_splits['holdout'])
+        tasks.extend((target, 'cv') + fold for fold in target_splits['folds'])
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        _init_worker(df)
+        outcomes = [_fit_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(df,)) as pool:
+            outcomes = list(pool.map(_fit_task, tasks))
+
+    results = {target: [None, None, []] for target in splits}
+    for target, kind, score, model in outcomes:
+        if kind == 'holdout':
+            results[target][0] = model
+            results[target][1] = score
+        else:
+            results[target][2].append(score)
+    return {target: tuple(result) for target, result in results.items()}
+
+def train_models(max_workers=None):
+    print("=== MODEL TRAINING ===\n")
+
+    df = pd.read_csv("health_risk_training.csv")
+    print(f"Training on {len(df)} samples")
 
-        print(f"{symptom_name}: ROC-AUC={roc_auc:.3f}, CV={cv_scores.mean():.3f}")
+    start = time.perf_counter()
+    splits = compute_splits(df)
+    results = fit_all(df, splits, max_workers)
 
+    models = {}
+    for target in TARGET_COLS:
+        symptom_name = target.replace('_binary', '')
+        model, roc_auc, cv_scores = results[target]
+        print(f"{symptom_name}: ROC-AUC={roc_auc:.3f}, CV={np.mean(cv_scores):.3f}")
         models[symptom_name] = model
 
+    print(f"\n{len(TARGET_COLS) * 6} fits in {time.perf_counter() - start:.2f}s "
+          f"({max_workers or os.cpu_count()} workers)")
+
+    from health_risk_data_prep import load_encoders
+
     model_package = {
         'models': models,
-        'feature_names': feature_cols
+        'feature_names': FEATURE_COLS,
+        'lookup_table': build_lookup_table(models),
+        # Category codes the models were trained with (health_encoders.json)
+        'encoders': load_encoders()
     }
 
+    max_diff = check_lookup_parity(model_package)
+    print(f"\nLookup table: {np.prod(TABLE_SHAPE)} combinations per symptom, "
+          f"max diff vs models={max_diff:.2g}")
+
     with open('health_risk_model.pkl', 'wb') as f:
         pickle.dump(model_package, f)
 
@@ -92,6 +234,22 @@ def predict_health_risks(age, predicted_aqi, gender_enc, parent_enc, model_packa
 
     aqi_category = get_aqi_category(predicted_aqi)
 
+    # Precomputed table: one array index instead of four model calls. Only a
+    # table built for these models' symptoms, as in predict_health_risks_batch
+    table = model_package.get('lookup_table')
+    if table and table['symptoms'] != list(model_package['models']):
+        table = None
+    index = table_index(age, aqi_category, gender_enc, parent_enc) if table else None
+    if index is not None:
+        probabilities = table['probabilities'][(slice(None),) + index]
+        return {
+            symptom_name: {
+                'probability': float(probability),
+                'risk_level': get_risk_level(probability)
+            }
+            for symptom_name, probability in zip(table['symptoms'], probabilities)
+        }
+
     # Model trained on 6 features: age, aqi_category, gender_enc, income_enc, parent_enc, concern_level
     # User provides: age, gender_enc, parent_enc
     # Use default values for income_enc and concern_level
@@ -116,6 +274,80 @@ def predict_health_risks(age, predicted_aqi, gender_enc, parent_enc, model_packa
 
     return results
 
+def health_risk_probabilities(ages, predicted_aqi, gender_encs, parent_encs, model_package):
+    """
+    Probabilities for N users sharing one predicted AQI, without building dicts.
+
+    Returns (symptom names, float32 array of shape (n_symptoms, N)).
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    gender_encs = np.asarray(gender_encs)
+    parent_encs = np.asarray(parent_encs)
+    n = len(ages)
+    aqi_category = get_aqi_category(predicted_aqi)
+
+    models = model_package['models']
+    probabilities = np.empty((len(models), n), dtype=np.float32)
+
+    # Rows inside the precomputed table are gathered from it; the rest go to the models
+    table = model_package.get('lookup_table')
+    if table is not None and table['symptoms'] == list(models):
+        in_table = ((ages == np.floor(ages)) & (ages >= 1) & (ages <= TABLE_SHAPE[0])
+                    & np.isin(gender_encs, (0, 1, 2)) & np.isin(parent_encs, (0, 1)))
+        rows = np.flatnonzero(in_table)
+        probabilities[:, rows] = table['probabilities'][
+            :, ages[rows].astype(np.intp) - 1, aqi_category - 1,
+            gender_encs[rows].astype(np.intp), parent_encs[rows].astype(np.intp)]
+        rest = np.flatnonzero(~in_table)
+    else:
+        rest = np.arange(n)
+
+    if len(rest):
+        features = serving_features(ages[rest], aqi_category, gender_encs[rest], parent_encs[rest])
+        for i, model in enumerate(models.values()):
+            probabilities[i, rest] = model.predict_proba(features)[:, 1]
+
+    return list(models), probabilities
+
+RISK_LEVELS = np.array(["LOW", "MODERATE", "HIGH"])
+
+def risk_levels(probabilities):
+    """Vectorized get_risk_level."""
+    return RISK_LEVELS[np.searchsorted([0.33, 0.67], probabilities, side='right')]
+
+def predict_health_risks_batch(ages, predicted_aqi, gender_encs, parent_encs, model_package=None):
+    """
+    Vectorized predict_health_risks for N users sharing one predicted AQI.
+
+    Args:
+        ages: Sequence of N ages (1-120)
+        predicted_aqi: Predicted AQI value shared by every user
+        gender_encs: Sequence of N gender encodings
+        parent_encs: Sequence of N parent statuses
+        model_package: Pre-loaded model package (optional)
+
+    Returns:
+        List of N dictionaries in the same format as predict_health_risks
+    """
+    if model_package is None:
+        with open('health_risk_model.pkl', 'rb') as f:
+            model_package = pickle.load(f)
+
+    symptoms, probabilities = health_risk_probabilities(ages, predicted_aqi, gender_encs, parent_encs,
+                                                        model_package)
+    n = probabilities.shape[1]
+    columns = {}
+    for symptom_name, symptom_probabilities in zip(symptoms, probabilities):
+        columns[symptom_name] = (symptom_probabilities.tolist(), risk_levels(symptom_probabilities).tolist())
+
+    return [
+        {
+            symptom_name: {'probability': probs[i], 'risk_level': risks[i]}
+            for symptom_name, (probs, risks) in columns.items()
+        }
+        for i in range(n)
+    ]
+
 if __name__ == "__main__":
     model_package = train_models()
 
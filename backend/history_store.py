@@ -0,0 +1,282 @@
+"""
+Columnar store for the historical datasets, partitioned by month.
+
+Each table is a directory with a schema and one binary file per month. A
+month file holds every column back to back, each a contiguous array in
+the schema's dtype, so a month is read with a single np.fromfile and split
+into columns without copying:
+
+    history/
+      features/schema.json          column names and dtypes
+      features/2018-01.col          timestamp | pm25 | pm10 | ... | AQHI
+      daily/...
+      live/...
+
+Appending rewrites only the months it touches, replacing each file
+atomically. Reading needs no text parsing, which matters once the history
+grows to years of hourly rows (python -m benchmarks.bench_history).
+
+Tables:
+    daily     - Original_Dataset.csv (timestamp replaces the date column)
+    features  - pollutant_model_features.csv, stamped with the same dates
+    live      - one raw OpenWeather observation per day
+
+    python history_store.py convert   # one-shot import of the CSVs
+    python history_store.py append    # fetch today's observation (run daily)
+    python history_store.py info
+"""
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+HISTORY_DIR = "history"
+TIMESTAMP = "timestamp"
+PARTITION_SUFFIX = ".col"
+# Fixed width for text columns (e.g. Rain_Intensity)
+TEXT_WIDTH = 16
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DIR):
+        self.path = path
+        self._schemas = {}
+
+    def _table_dir(self, table):
+        return os.path.join(self.path, table)
+
+    def tables(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(t for t in os.listdir(self.path) if os.path.exists(os.path.join(self.path, t, "schema.json")))
+
+    def schema(self, table):
+        """[(column, dtype)] in storage order, timestamp first."""
+        if table not in self._schemas:
+            with open(os.path.join(self._table_dir(table), "schema.json")) as f:
+                self._schemas[table] = [(name, np.dtype(dtype)) for name, dtype in json.load(f)["columns"]]
+        return self._schemas[table]
+
+    def columns(self, table):
+        return [name for name, _ in self.schema(table)]
+
+    def partitions(self, table):
+        table_dir = self._table_dir(table)
+        if not os.path.isdir(table_dir):
+            return []
+        return sorted(f[:-len(PARTITION_SUFFIX)] for f in os.listdir(table_dir) if f.endswith(PARTITION_SUFFIX))
+
+    def _partition_path(self, table, partition):
+        return os.path.join(self._table_dir(table), partition + PARTITION_SUFFIX)
+
+    def _read_partition(self, table, partition):
+        schema = self.schema(table)
+        raw = np.fromfile(self._partition_path(table, partition), dtype=np.uint8)
+        n_rows = len(raw) // sum(dtype.itemsize for _, dtype in schema)
+        columns, offset = {}, 0
+        for name, dtype in schema:
+            size = n_rows * dtype.itemsize
+            columns[name] = raw[offset:offset + size].view(dtype)
+            offset += size
+        return columns
+
+    def _write_partition(self, table, partition, columns):
+        # Written beside the partition and renamed over it, so readers see
+        # either the old month or the new one
+        path = self._partition_path(table, partition)
+        staging = f"{path}.tmp-{os.getpid()}"
+        with open(staging, "wb") as f:
+            for name, dtype in self.schema(table):
+                np.ascontiguousarray(columns[name], dtype=dtype).tofile(f)
+        os.replace(staging, path)
+
+    def _create(self, table, df):
+        self._schemas.pop(table, None)
+        columns = [TIMESTAMP] + [c for c in df.columns if c != TIMESTAMP]
+        schema = []
+        for name in columns:
+            if name == TIMESTAMP:
+                dtype = np.dtype("datetime64[s]")
+            else:
+                dtype = df[name].to_numpy().dtype
+                if dtype.kind in "OTU":
+                    dtype = np.dtype(f"U{TEXT_WIDTH}")
+            schema.append([name, dtype.str])
+        os.makedirs(self._table_dir(table), exist_ok=True)
+        with open(os.path.join(self._table_dir(table), "schema.json"), "w") as f:
+            json.dump({"columns": schema}, f, indent=2)
+
+    def append(self, table, df):
+        """
+        Append rows to a table, creating it on first use.
+
+        `df` must have a datetime `timestamp` column and, for an existing
+        table, the same columns as the table. Rows are routed to their month
+        partition; only the months touched are rewritten. Returns the number
+        of rows written.
+        """
+        if TIMESTAMP not in df.columns:
+            raise ValueError(f"Rows appended to {table} need a '{TIMESTAMP}' column")
+        if table not in self.tables():
+            self._create(table, df)
+
+        schema = self.schema(table)
+        if set(self.columns(table)) != set(df.columns):
+            raise ValueError(f"Columns do not match table {table}: expected {self.columns(table)}, "
+                             f"got {list(df.columns)}")
+
+        new = {}
+        for name, dtype in schema:
+            values = df[name].to_numpy()
+            if name == TIMESTAMP:
+                values = pd.to_datetime(df[name]).to_numpy()
+            elif dtype.kind == "U":
+                values = values.astype(str)
+                if len(values) and max(len(v) for v in values) > TEXT_WIDTH:
+                    raise ValueError(f"{table}.{name}: text longer than {TEXT_WIDTH} characters")
+            new[name] = values.astype(dtype)
+
+        months = np.datetime_as_string(new[TIMESTAMP].astype("datetime64[M]"))
+        existing = set(self.partitions(table))
+        for month in np.unique(months):
+            rows = months == month
+            columns = {name: values[rows] for name, values in new.items()}
+            if month in existing:
+                old = self._read_partition(table, month)
+                columns = {name: np.concatenate([old[name], columns[name]]) for name in columns}
+            # Keep each month in time order for range reads
+            order = np.argsort(columns[TIMESTAMP], kind="stable")
+            self._write_partition(table, month, {name: values[order] for name, values in columns.items()})
+        return len(df)
+
+    def read(self, table, columns=None, start=None, end=None, with_timestamp=False):
+        """
+        Table as a DataFrame, optionally limited to columns and [start, end).
+
+        Without with_timestamp the timestamp column is left out, so the
+        features table comes back with exactly the CSV's columns.
+        """
+        columns = list(columns or [c for c in self.columns(table) if c != TIMESTAMP])
+        if with_timestamp and TIMESTAMP not in columns:
+            columns = [TIMESTAMP] + columns
+
+        first = str(np.datetime64(start, "M")) if start is not None else None
+        last = str(np.datetime64(end, "M")) if end is not None else None
+        parts = [self._read_partition(table, p) for p in self.partitions(table)
+                 if (first is None or p >= first) and (last is None or p <= last)]
+        if not parts:
+            return pd.DataFrame({c: np.empty(0, dict(self.schema(table))[c]) for c in columns})
+
+        keep = None
+        if start is not None or end is not None:
+            ts = np.concatenate([p[TIMESTAMP] for p in parts])
+            keep = np.ones(len(ts), dtype=bool)
+            if start is not None:
+                keep &= ts >= np.datetime64(start, "s")
+            if end is not None:
+                keep &= ts < np.datetime64(end, "s")
+
+        data = {}
+        for c in columns:
+            values = np.concatenate([p[c] for p in parts])
+            data[c] = values[keep] if keep is not None else values
+        return pd.DataFrame(data)
+
+    def last_timestamp(self, table):
+        partitions = self.partitions(table)
+        if not partitions:
+            return None
+        return self._read_partition(table, partitions[-1])[TIMESTAMP].max()
+
+
+def convert(store, original_path="Original_Dataset.csv", features_path="pollutant_model_features.csv"):
+    """Import the CSVs, replacing any tables already converted."""
+    for table in ("daily", "features"):
+        if os.path.isdir(store._table_dir(table)):
+            shutil.rmtree(store._table_dir(table))
+
+    original = pd.read_csv(original_path)
+    dates = pd.to_datetime(original["date"], format="%d-%m-%Y")
+    daily = original.drop(columns=["date"])
+    daily.insert(0, TIMESTAMP, dates)
+    store.append("daily", daily)
+
+    # pollutant_model_features.csv is built row for row from Original_Dataset.csv
+    # (aqi_engine.build_features), so it takes the same dates
+    features = pd.read_csv(features_path)
+    if len(features) != len(original):
+        raise ValueError(f"{features_path} has {len(features)} rows, {original_path} has {len(original)}")
+    features.insert(0, TIMESTAMP, dates)
+    store.append("features", features)
+    return len(daily), len(features)
+
+
+def feature_row(observation, when):
+    """pollutant_model_features row for one live observation, built as at serving time."""
+    from features import CALENDAR_FEATURES, FEATURES, observation_matrix
+
+    row = dict(zip(FEATURES, observation_matrix([observation], when)[0].tolist()))
+    for name in CALENDAR_FEATURES:
+        row[name] = int(row[name])
+    return row
+
+
+def append_daily(store, observation, when=None):
+    """
+    Record one live observation for today: the raw values in `live` and a
+    training row in `features`. AQI comes from the CPCB engine; AQHI cannot
+    be derived and is left NaN. Does nothing if today is already stored.
+    Returns True if rows were written.
+    """
+    from aqi_engine import compute_aqi
+
+    when = when or datetime.now()
+    day = np.datetime64(when.date(), "s")
+    last = store.last_timestamp("live") if "live" in store.tables() else None
+    if last is not None and last >= day:
+        return False
+
+    row = feature_row(observation, when)
+    aqi, _, _ = compute_aqi({k: [v] for k, v in row.items()}, over_range="drop")
+    features = pd.DataFrame([dict(row, AQI=float(aqi[0]), AQHI=np.nan)])
+    features.insert(0, TIMESTAMP, [day])
+    if "features" in store.tables():
+        features = features[store.columns("features")]
+    live = pd.DataFrame([dict(observation)])
+    live.insert(0, TIMESTAMP, [np.datetime64(when, "s")])
+
+    store.append("features", features)
+    store.append("live", live)
+    return True
+
+
+if __name__ == "__main__":
+    store = HistoryStore(os.getenv("HISTORY_DIR", HISTORY_DIR))
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+
+    if command == "convert":
+        n_daily, n_features = convert(store)
+        print(f"Converted {n_daily} daily rows and {n_features} feature rows into {store.path}/")
+    elif command == "append":
+        from dotenv import load_dotenv
+
+        from openweather_client import get_weather_and_pollution
+
+        load_dotenv()
+        if append_daily(store, get_weather_and_pollution()):
+            print(f"Appended today's observation to {store.path}/")
+        else:
+            print("Today's observation is already stored")
+    elif command == "info":
+        for table in store.tables():
+            partitions = store.partitions(table)
+            rows = len(store.read(table, columns=[TIMESTAMP]))
+            print(f"{table}: {rows} rows in {len(partitions)} partitions "
+                  f"({partitions[0]} .. {partitions[-1]}), last {store.last_timestamp(table)}")
+    else:
+        print(f"Unknown command {command}; use convert, append or info")
+        sys.exit(1)
@@ -0,0 +1,43 @@
+from openweather_client import DEFAULT_LAT, DEFAULT_LON
+
+# City ids accepted by /predict, for callers that do not send coordinates
+CITIES = {
+    "delhi": (28.7041, 77.1025),
+    "new_delhi": (28.6139, 77.2090),
+    "noida": (28.5355, 77.3910),
+    "greater_noida": (28.4744, 77.5040),
+    "gurugram": (28.4595, 77.0266),
+    "ghaziabad": (28.6692, 77.4538),
+    "faridabad": (28.4089, 77.3178),
+    "sonipat": (28.9931, 77.0151),
+    "meerut": (28.9845, 77.7064)
+}
+
+DEFAULT_LOCATION = (float(DEFAULT_LAT), float(DEFAULT_LON))
+
+
+def resolve_location(payload):
+    """
+    (lat, lon) for a request body with either "city" or "lat"/"lon".
+
+    Falls back to central Delhi when neither is given. Raises ValueError with
+    a client-facing message for unknown cities or invalid coordinates.
+    """
+    city = payload.get("city")
+    lat = payload.get("lat")
+    lon = payload.get("lon")
+
+    if city is not None:
+        key = str(city).strip().lower().replace(" ", "_")
+        if key not in CITIES:
+            raise ValueError(f"Unknown city '{city}'. Known cities: {', '.join(sorted(CITIES))}")
+        return CITIES[key]
+
+    if lat is None and lon is None:
+        return DEFAULT_LOCATION
+
+    if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+        raise ValueError("Invalid location. Provide both lat and lon as numbers")
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("Invalid location. lat must be -90 to 90 and lon -180 to 180")
+    return (float(lat), float(lon))
@@ -0,0 +1,158 @@
+"""
+Request instrumentation: per-stage timers and Prometheus metrics.
+
+Each request gets a StageTimer; `with stage("aqi_model"):` times one stage,
+records it in a Prometheus histogram and adds it to the request's
+Server-Timing header.
+
+Under gunicorn every worker is its own process, so metrics use
+prometheus_client's multiprocess mode: gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at a shared directory before anything imports
+prometheus_client, each worker writes its values there, and /metrics sums
+them over all workers. Without that variable (flask run, tests) the
+process's own registry is served.
+"""
+import inspect
+import os
+import time
+
+from flask import g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Stages are sub-millisecond to a few seconds (upstream timeouts)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+    "aqi_request_duration_seconds", "Request latency by endpoint and status",
+    ["endpoint", "status"], buckets=STAGE_BUCKETS)
+STAGE_SECONDS = Histogram(
+    "aqi_stage_duration_seconds", "Time spent in each stage of a request",
+    ["endpoint", "stage"], buckets=STAGE_BUCKETS)
+IN_FLIGHT = Gauge(
+    "aqi_requests_in_flight", "Requests currently being handled", multiprocess_mode="livesum")
+UPSTREAM_SECONDS = Histogram(
+    "aqi_upstream_fetch_duration_seconds", "OpenWeather observation fetches (both endpoints)",
+    buckets=STAGE_BUCKETS)
+UPSTREAM_ERRORS = Counter(
+    "aqi_upstream_errors_total", "Failed OpenWeather observation fetches", ["error"])
+CACHE_EVENTS = Counter(
+    "aqi_observation_cache_events_total", "Observation cache lookups and refreshes", ["event"])
+
+
+class StageTimer:
+    """Durations of the stages of one request, in the order they ran."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.stages = []
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages)
+
+
+class _Stage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.timer.stages.append((self.name, seconds))
+        STAGE_SECONDS.labels(self.timer.endpoint, self.name).observe(seconds)
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def stage(name):
+    """Time a stage of the current request (no-op outside instrumented requests)."""
+    timer = g.get("stage_timer")
+    return timer.stage(name) if timer is not None else _NullStage()
+
+
+def instrument_fetch(fetch):
+    """Wrap an upstream fetch (plain or coroutine function) to record its duration and failures."""
+    if inspect.iscoroutinefunction(fetch):
+        async def instrumented_async(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fetch(*args, **kwargs)
+            except Exception as e:
+                UPSTREAM_ERRORS.labels(type(e).__name__).inc()
+                raise
+            finally:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start)
+        return instrumented_async
+
+    def instrumented(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fetch(*args, **kwargs)
+        except Exception as e:
+            UPSTREAM_ERRORS.labels(type(e).__name__).inc()
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start)
+    return instrumented
+
+
+def record_cache_event(event):
+    CACHE_EVENTS.labels(event).inc()
+
+
+def render_metrics():
+    """(body, content type) of the metrics of this process, or of every worker under gunicorn."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """Time every request, add Server-Timing, and serve GET /metrics."""
+
+    @app.before_request
+    def start_request():
+        if request.endpoint == "metrics":
+            return
+        g.request_start = time.perf_counter()
+        g.stage_timer = StageTimer(request.endpoint or "unknown")
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def finish_request(response):
+        timer = g.get("stage_timer")
+        if timer is None:
+            return response
+        total = time.perf_counter() - g.request_start
+        response.headers["Server-Timing"] = ", ".join(
+            part for part in (timer.server_timing(), f"total;dur={total * 1000:.3f}") if part)
+        REQUEST_SECONDS.labels(timer.endpoint, response.status_code).observe(total)
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        if g.pop("stage_timer", None) is not None:
+            IN_FLIGHT.dec()
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        body, content_type = render_metrics()
+        return body, 200, {"Content-Type": content_type}
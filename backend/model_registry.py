@@ -0,0 +1,307 @@
+"""
+Versioned model artifacts with hot reload for the API workers.
+
+Layout:
+
+    models/
+      manifest.json                 {"current": "<version>", "versions": {...}}
+      <version>/
+        aqi_model_compact/          (or aqi_model.pkl)
+        health_risk_model.pkl
+
+Each version records its files' sizes and SHA-256 in the manifest and is
+never modified after publishing. Activating a version only rewrites
+manifest.json (atomically), so rolling back is activating an older one.
+
+A worker's ModelRegistry serves one immutable ModelSet. A request takes
+current() once and uses that set throughout, so a swap never changes the
+models under an in-flight request. reload() loads the manifest's current
+version next to the live one, verifies its checksums and runs warm-up
+inference, and only then replaces the reference. A version that fails to
+load is reported in stats() and the live set keeps serving.
+
+Reloads happen when manifest.json changes (a watcher thread, started with
+the first request so it runs in every worker, polls every `poll_interval`
+seconds) or on POST /admin/models/reload. Without models/manifest.json
+the artifacts are read from the working directory as before (version
+"local-<modification time>"), and the watcher reloads them when
+update_models.py rewrites them.
+
+    python model_registry.py publish              # working-directory models -> new version, activated
+    python model_registry.py list
+    python model_registry.py activate <version>
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from compact_forest import COMPACT_DIR, CompactForest
+from features import observation_features
+from health_risk_predictor import build_lookup_table, predict_health_risks, predict_health_risks_batch
+
+REGISTRY_DIR = "models"
+MANIFEST = "manifest.json"
+AQI_PICKLE = "aqi_model.pkl"
+HEALTH_PICKLE = "health_risk_model.pkl"
+# Version reported for working-directory models: "local-" + their newest mtime
+LOCAL_PREFIX = "local-"
+
+# Warm-up input: a typical Delhi winter observation
+WARMUP_OBSERVATION = {'PM25': 150.0, 'PM10': 200.0, 'NO2': 40.0, 'SO2': 15.0, 'CO': 1600.0, 'O3': 40.0,
+                      'temp': 25.0, 'humidity': 60, 'pressure': 1012, 'wind_speed': 2.0}
+
+
+class ModelSet:
+    """One version of the AQI and health models, loaded and warmed up."""
+
+    def __init__(self, version, aqi, health):
+        self.version = version
+        self.aqi = aqi
+        self.health = health
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+
+    def warm_up(self):
+        """Run every serving path once so the first request does not pay for it."""
+        aqi = self.aqi.predict(observation_features(WARMUP_OBSERVATION))[0]
+        predict_health_risks(35, aqi, 1, 0, self.health)
+        predict_health_risks_batch([8, 35, 70], aqi, [0, 1, 2], [0, 1, 0], self.health)
+
+
+def load_aqi(directory):
+    compact = os.path.join(directory, COMPACT_DIR)
+    if os.path.isdir(compact):
+        # Memory-mapped read-only: workers share the pages (see compact_forest.py)
+        return CompactForest.load(compact, mmap_mode="r")
+    with open(os.path.join(directory, AQI_PICKLE), "rb") as f:
+        return pickle.load(f)
+
+
+def load_health(directory):
+    with open(os.path.join(directory, HEALTH_PICKLE), "rb") as f:
+        package = pickle.load(f)
+    if 'lookup_table' not in package:
+        # Packages saved before the lookup table existed: build it once at load
+        package['lookup_table'] = build_lookup_table(package['models'])
+    return package
+
+
+def file_digests(directory):
+    """{relative path: {'bytes', 'sha256'}} for every file under a version directory."""
+    digests = {}
+    for parent, _, names in os.walk(directory):
+        for name in sorted(names):
+            path = os.path.join(parent, name)
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            digests[os.path.relpath(path, directory)] = {'bytes': os.path.getsize(path), 'sha256': sha.hexdigest()}
+    return digests
+
+
+def read_manifest(root=REGISTRY_DIR):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, root=REGISTRY_DIR):
+    staging = os.path.join(root, f"{MANIFEST}.tmp-{os.getpid()}")
+    with open(staging, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, os.path.join(root, MANIFEST))
+
+
+def publish(root=REGISTRY_DIR, source=".", version=None, activate=True, note=None):
+    """Copy the models in `source` into a new version. Returns the version."""
+    version = version or datetime.now().strftime("%Y%m%d-%H%M%S")
+    manifest = read_manifest(root) or {'current': None, 'versions': {}}
+    if version in manifest['versions'] or os.path.exists(os.path.join(root, version)):
+        raise ValueError(f"Version {version} already exists")
+
+    staging = os.path.join(root, f".staging-{version}-{os.getpid()}")
+    os.makedirs(staging)
+    try:
+        if os.path.isdir(os.path.join(source, COMPACT_DIR)):
+            shutil.copytree(os.path.join(source, COMPACT_DIR), os.path.join(staging, COMPACT_DIR))
+        else:
+            shutil.copy2(os.path.join(source, AQI_PICKLE), staging)
+        shutil.copy2(os.path.join(source, HEALTH_PICKLE), staging)
+        # Refuse to publish models that cannot be served
+        ModelSet(version, load_aqi(staging), load_health(staging)).warm_up()
+        files = file_digests(staging)
+        os.rename(staging, os.path.join(root, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest['versions'][version] = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'note': note,
+        'files': files
+    }
+    if activate:
+        manifest['current'] = version
+    write_manifest(manifest, root)
+    return version
+
+
+def activate(version, root=REGISTRY_DIR):
+    manifest = read_manifest(root)
+    if manifest is None or version not in manifest['versions']:
+        raise ValueError(f"Unknown model version {version}")
+    manifest['current'] = version
+    write_manifest(manifest, root)
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR, poll_interval=10):
+        self.root = root
+        self.poll_interval = poll_interval
+
+        self._models = None
+        self._reload_lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._watcher = None
+        self._stamp = None
+
+        self.reloads = 0
+        self.last_error = None
+
+    def current(self):
+        """The live ModelSet; take it once per request."""
+        models = self._models
+        if models is None:
+            models = self.load()
+        if self._watcher is None and self.poll_interval:
+            with self._watcher_lock:
+                # Started by the first request, so every worker watches (never a
+                # preloading gunicorn master)
+                if self._watcher is None:
+                    self._watcher = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+                    self._watcher.start()
+        return models
+
+    def load(self):
+        """Load the current version if nothing is loaded yet. Returns the live set."""
+        with self._reload_lock:
+            if self._models is None:
+                self._stamp = self._source_stamp()
+                self._models = self._load_version(self._wanted_version())
+            return self._models
+
+    def _wanted_version(self):
+        manifest = read_manifest(self.root)
+        if manifest is not None:
+            return manifest['current']
+        modified = max(stamp for stamp in self._source_stamp() if stamp is not None)
+        return LOCAL_PREFIX + datetime.fromtimestamp(modified).strftime("%Y%m%d-%H%M%S")
+
+    def _load_version(self, version):
+        if version.startswith(LOCAL_PREFIX):
+            models = ModelSet(version, load_aqi("."), load_health("."))
+        else:
+            directory = os.path.join(self.root, version)
+            expected = read_manifest(self.root)['versions'][version]['files']
+            if file_digests(directory) != expected:
+                raise RuntimeError(f"Model version {version} does not match its manifest checksums")
+            models = ModelSet(version, load_aqi(directory), load_health(directory))
+        models.warm_up()
+        return models
+
+    def reload(self, force=False):
+        """
+        Swap in the manifest's current version if it is not the live one (or
+        `force`). Returns (previous version, live version); raises if the new
+        version cannot be loaded, leaving the live one in place.
+        """
+        with self._reload_lock:
+            previous = self._models.version if self._models is not None else None
+            self._stamp = self._source_stamp()
+            version = self._wanted_version()
+            if version == previous and not force:
+                return previous, previous
+            try:
+                models = self._load_version(version)
+            except Exception as e:
+                self.last_error = f"{version}: {e}"
+                raise
+            # One reference assignment: requests hold whichever set they took
+            self._models = models
+            self.reloads += 1
+            self.last_error = None
+            return previous, version
+
+    def _source_stamp(self):
+        """Modification times that change when a new version is published or activated."""
+        manifest = os.path.join(self.root, MANIFEST)
+        if os.path.exists(manifest):
+            paths = [manifest]
+        else:
+            paths = [os.path.join(COMPACT_DIR, "meta.json"), AQI_PICKLE, HEALTH_PICKLE]
+        return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in paths)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if self._source_stamp() == self._stamp:
+                continue
+            try:
+                self.reload()
+            except Exception:
+                # Recorded in last_error; the live set keeps serving, the next change retries
+                pass
+
+    def stats(self):
+        models = self._models
+        return {
+            'version': models.version if models is not None else None,
+            'loaded_at': models.loaded_at if models is not None else None,
+            'source': self.root if os.path.exists(os.path.join(self.root, MANIFEST)) else 'working directory',
+            'pid': os.getpid(),
+            'reloads': self.reloads,
+            'last_error': self.last_error
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    parser.add_argument("--root", default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish_parser = commands.add_parser("publish", help="copy the working-directory models into a new version")
+    publish_parser.add_argument("--version")
+    publish_parser.add_argument("--note")
+    publish_parser.add_argument("--no-activate", action="store_true")
+    commands.add_parser("list")
+    activate_parser = commands.add_parser("activate")
+    activate_parser.add_argument("version")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        os.makedirs(args.root, exist_ok=True)
+        version = publish(args.root, version=args.version, activate=not args.no_activate, note=args.note)
+        print(f"Published {version}" + ("" if args.no_activate else " (active)"))
+    elif args.command == "activate":
+        activate(args.version, args.root)
+        print(f"Activated {args.version}; workers switch within their poll interval")
+    else:
+        manifest = read_manifest(args.root)
+        if manifest is None:
+            print(f"No registry at {args.root}/ - serving the working-directory models")
+            return
+        for version, info in sorted(manifest['versions'].items()):
+            size = sum(f['bytes'] for f in info['files'].values()) / 2**20
+            marker = "*" if version == manifest['current'] else " "
+            print(f"{marker} {version}  {info['created']}  {size:6.1f} MB  {info.get('note') or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Observation versions, shared by every cache in the process. A grid cell that
+# is evicted and created again never reuses a version another cell (or its own
+# earlier instance) handed out, so caches keyed by version cannot match stale
+# entries.
+_versions = itertools.count(1)
+
+
+class _Flight:
+    """One in-flight upstream fetch that concurrent callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.version = None
+        self.error = None
+
+
+class ObservationCache:
+    """
+    Caches the latest upstream observation for `ttl` seconds.
+
+    - Concurrent misses share a single in-flight fetch (single-flight).
+    - Once warm, an expired entry is served stale while one background thread
+      refreshes it, so requests never wait on OpenWeather.
+    - Entries older than `max_stale` are not served; the caller waits for a
+      fresh fetch instead.
+
+    `listener`, if given, is called with "hit", "stale_hit", "miss",
+    "refresh" or "error" for every event counted in stats().
+
+    `version` increases with every successful fetch and is unique across all
+    caches of the process, so anything derived from an observation can be
+    cached under the version it came from (get_versioned).
+    """
+
+    def __init__(self, fetch, ttl=600, max_stale=3600, listener=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.listener = listener
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = 0.0
+        self._flight = None
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def get(self):
+        return self.get_versioned()[0]
+
+    def get_versioned(self):
+        """(observation, version) - the version of exactly the observation returned."""
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            version = self.version
+            if self._value is not None and age < self.ttl:
+                self.hits += 1
+                value = self._value
+            elif self._value is not None and age < self.max_stale:
+                self.stale_hits += 1
+                if self._flight is None:
+                    self._flight = _Flight()
+                    threading.Thread(target=self._run, args=(self._flight,), daemon=True).start()
+                value = self._value
+            else:
+                self.misses += 1
+                value = None
+
+        if value is not None:
+            self._notify("hit" if age < self.ttl else "stale_hit")
+            return value, version
+        self._notify("miss")
+        flight = self._join()
+        return flight.value, flight.version
+
+    def _notify(self, event):
+        if self.listener is not None:
+            self.listener(event)
+
+    def refresh(self):
+        """Fetch now, or join the fetch already in flight. Returns the new value."""
+        return self._join().value
+
+    def _join(self):
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+
+        if leader:
+            self._run(flight)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight
+
+    def _run(self, flight):
+        try:
+            value = self.fetch()
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                self._flight = None
+            flight.error = e
+            flight.done.set()
+            self._notify("error")
+            return
+
+        with self._lock:
+            self._value = value
+            self._fetched_at = time.monotonic()
+            self.version = next(_versions)
+            flight.version = self.version
+            self.refreshes += 1
+            self._flight = None
+        flight.value = value
+        flight.done.set()
+        self._notify("refresh")
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._fetched_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            age = time.monotonic() - self._fetched_at if self._value is not None else None
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+                'age_seconds': round(age, 1) if age is not None else None,
+                'ttl_seconds': self.ttl
+            }
+
+
+class GridObservationCache:
+    """
+    One ObservationCache per grid cell, so nearby users share upstream fetches.
+
+    Coordinates are snapped to the centre of a `cell_size` degree cell and the
+    cell centre is what gets fetched, so every request in a cell maps to the
+    same observation. Upstream calls scale with the number of active cells,
+    not with request volume. At most `max_cells` cells are kept (LRU).
+
+    When `refresh_interval` is set, a background thread refreshes every cell
+    used within the last `active_window` seconds, concurrently, so active
+    cells are already fresh when requests arrive.
+
+    `listener` is passed to every cell's ObservationCache.
+    """
+
+    def __init__(self, fetch, ttl=600, max_stale=3600, cell_size=0.1, max_cells=1000,
+                 refresh_interval=0, active_window=3600, refresh_workers=16, listener=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self.refresh_interval = refresh_interval
+        self.active_window = active_window
+        self.refresh_workers = refresh_workers
+        self.listener = listener
+
+        self._lock = threading.Lock()
+        self._cells = OrderedDict()   # cell -> [ObservationCache, last_used]
+        self._refresher = None
+
+    def cell_for(self, lat, lon):
+        """Centre of the grid cell containing (lat, lon)."""
+        size = self.cell_size
+        return (round(round(lat / size) * size, 4), round(round(lon / size) * size, 4))
+
+    def _cache_for(self, cell):
+        with self._lock:
+            entry = self._cells.get(cell)
+            if entry is None:
+                entry = self._cells[cell] = [self._new_cache(*cell), 0.0]
+                if len(self._cells) > self.max_cells:
+                    self._cells.popitem(last=False)
+            else:
+                self._cells.move_to_end(cell)
+            entry[1] = time.monotonic()
+
+            # Started lazily so it runs in the serving process, not in a
+            # gunicorn master that forks workers afterwards
+            if self.refresh_interval and self._refresher is None:
+                self._refresher = self._start_refresher()
+            return entry[0]
+
+    def _new_cache(self, lat, lon):
+        return ObservationCache(lambda: self.fetch(f"{lat:.4f}", f"{lon:.4f}"),
+                                ttl=self.ttl, max_stale=self.max_stale, listener=self.listener)
+
+    def _start_refresher(self):
+        refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        refresher.start()
+        return refresher
+
+    def get(self, lat, lon):
+        return self._cache_for(self.cell_for(lat, lon)).get()
+
+    def get_versioned(self, lat, lon):
+        """(observation, version) for the cell of (lat, lon); versions are unique per process."""
+        return self._cache_for(self.cell_for(lat, lon)).get_versioned()
+
+    def active_cells(self):
+        cutoff = time.monotonic() - self.active_window
+        with self._lock:
+            return [cell for cell, (_, last_used) in self._cells.items() if last_used >= cutoff]
+
+    def _active_caches(self):
+        with self._lock:
+            cutoff = time.monotonic() - self.active_window
+            return [cache for cache, last_used in self._cells.values() if last_used >= cutoff]
+
+    def refresh_active(self):
+        """Refresh every active cell concurrently. Returns the number refreshed."""
+        caches = self._active_caches()
+        if not caches:
+            return 0
+
+        def refresh(cache):
+            try:
+                cache.refresh()
+                return True
+            except Exception:
+                return False
+
+        with ThreadPoolExecutor(max_workers=min(self.refresh_workers, len(caches))) as pool:
+            return sum(pool.map(refresh, caches))
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh_active()
+
+    def stats(self):
+        with self._lock:
+            caches = [cache for cache, _ in self._cells.values()]
+        totals = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'refreshes': 0, 'errors': 0}
+        for cache in caches:
+            cache_stats = cache.stats()
+            for key in totals:
+                totals[key] += cache_stats[key]
+        totals.update({
+            'cells': len(caches),
+            'active_cells': len(self.active_cells()),
+            'cell_size_degrees': self.cell_size,
+            'ttl_seconds': self.ttl
+        })
+        return totals
+
+
+class AsyncObservationCache(ObservationCache):
+    """
+    ObservationCache for an asyncio event loop (asgi.py).
+
+    `fetch` is a coroutine function. The in-flight fetch is an asyncio Task
+    that concurrent misses await together, and a stale hit schedules the
+    refresh on the loop instead of starting a thread. get() and refresh()
+    must be awaited from one event loop.
+    """
+
+    def __init__(self, fetch, ttl=600, max_stale=3600, listener=None):
+        super().__init__(fetch, ttl=ttl, max_stale=max_stale, listener=listener)
+        self._task = None
+
+    async def get(self):
+        return (await self.get_versioned())[0]
+
+    async def get_versioned(self):
+        age = time.monotonic() - self._fetched_at
+        if self._value is not None and age < self.ttl:
+            self.hits += 1
+            self._notify("hit")
+            return self._value, self.version
+        if self._value is not None and age < self.max_stale:
+            self.stale_hits += 1
+            self._start()
+            self._notify("stale_hit")
+            return self._value, self.version
+        self.misses += 1
+        self._notify("miss")
+        # Shielded: a caller that disconnects must not cancel the shared fetch
+        return await asyncio.shield(self._start())
+
+    async def refresh(self):
+        """Fetch now, or join the fetch already in flight. Returns the new value."""
+        return (await asyncio.shield(self._start()))[0]
+
+    def _start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+            # A background refresh nobody awaits still reports its error via stats
+            self._task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._task
+
+    async def _run(self):
+        try:
+            value = await self.fetch()
+        except Exception:
+            self.errors += 1
+            self._notify("error")
+            raise
+        finally:
+            # Also on cancellation (e.g. loop shutdown), so the next miss
+            # starts a new fetch instead of awaiting the cancelled task
+            self._task = None
+
+        self._value = value
+        self._fetched_at = time.monotonic()
+        self.version = next(_versions)
+        self.refreshes += 1
+        self._notify("refresh")
+        return value, self.version
+
+
+class AsyncGridObservationCache(GridObservationCache):
+    """
+    GridObservationCache of AsyncObservationCache cells: `fetch(lat, lon)` is
+    a coroutine function and get() is awaited. The background refresh of
+    active cells is a task on the serving event loop, started on first use.
+    """
+
+    def _new_cache(self, lat, lon):
+        return AsyncObservationCache(lambda: self.fetch(f"{lat:.4f}", f"{lon:.4f}"),
+                                     ttl=self.ttl, max_stale=self.max_stale, listener=self.listener)
+
+    def _start_refresher(self):
+        return asyncio.ensure_future(self._refresh_loop())
+
+    async def get(self, lat, lon):
+        return await self._cache_for(self.cell_for(lat, lon)).get()
+
+    async def get_versioned(self, lat, lon):
+        return await self._cache_for(self.cell_for(lat, lon)).get_versioned()
+
+    async def refresh_active(self):
+        """Refresh every active cell concurrently. Returns the number refreshed."""
+        results = await asyncio.gather(*(cache.refresh() for cache in self._active_caches()),
+                                       return_exceptions=True)
+        return sum(not isinstance(result, Exception) for result in results)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh_active()
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Central Delhi, the location every caller used before
+DEFAULT_LAT = "28.7041"
+DEFAULT_LON = "77.1025"
+
+LIVE_BASE_URL = "https://api.openweathermap.org"
+REPLAY_BASE_URL = "http://127.0.0.1:8765"
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "openweather")
+
+
+class UpstreamError(Exception):
+    """Raised when OpenWeather cannot be reached or returns an error payload."""
+
+
+# Upstream statuses worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_observation(p_j, w_j):
+    """Observation dict from the air_pollution and weather payloads."""
+    if "list" not in p_j:
+        raise UpstreamError(f"API Error: {p_j.get('message', 'Unknown error')}")
+    if "main" not in w_j or "wind" not in w_j:
+        raise UpstreamError(f"API Error: {w_j.get('message', 'Unknown error')}")
+
+    c = p_j["list"][0]["components"]
+    m = w_j["main"]
+    wd = w_j["wind"]
+
+    return {
+        "PM25": c["pm2_5"],
+        "PM10": c["pm10"],
+        "NO2": c["no2"],
+        "SO2": c["so2"],
+        "CO": c["co"],
+        "O3": c["o3"],
+        "temp": m["temp"],
+        "humidity": m["humidity"],
+        "pressure": m["pressure"],
+        "wind_speed": wd["speed"]
+    }
+
+
+class _ClientSettings:
+    """
+    Settings shared by the blocking and the asyncio clients.
+
+    Modes (OPENWEATHER_MODE):
+        live   - call OpenWeather (default)
+        record - call OpenWeather and save each successful response under
+                 record_dir as <endpoint>.json
+        replay - call the local stub server (stub_server.py) serving record_dir
+
+    Recordings are single-location: there is one file per endpoint and the
+    last successful fetch wins, so record with one location (e.g. final.py
+    or a single /predict), not while the API refreshes many grid cells.
+    """
+
+    def __init__(self, api_key=None, base_url=None, mode=None, record_dir=None,
+                 timeout=None, retries=None, pool_size=None):
+        self.mode = mode or os.getenv("OPENWEATHER_MODE", "live")
+        if self.mode not in ("live", "record", "replay"):
+            raise ValueError(f"Unknown OPENWEATHER_MODE: {self.mode}")
+
+        default_url = REPLAY_BASE_URL if self.mode == "replay" else LIVE_BASE_URL
+        self.base_url = (base_url or os.getenv("OPENWEATHER_BASE_URL") or default_url).rstrip("/")
+        self.api_key = api_key or os.getenv("OPENWEATHER_API_KEY")
+        if not self.api_key and self.mode == "replay":
+            self.api_key = "replay"
+        self.record_dir = record_dir or os.getenv("OPENWEATHER_RECORD_DIR", FIXTURE_DIR)
+
+        self.read_timeout = float(timeout or os.getenv("OPENWEATHER_TIMEOUT", "5"))
+        self.connect_timeout = min(3.05, self.read_timeout)
+        self.retries = int(retries if retries is not None else os.getenv("OPENWEATHER_RETRIES", "2"))
+        # Two connections per location refreshed concurrently
+        self.pool_size = int(pool_size or os.getenv("OPENWEATHER_POOL_SIZE", "32"))
+
+    def _record(self, endpoint, status, payload):
+        # Error payloads are never saved over a good recording
+        if self.mode != "record" or status != 200:
+            return
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, f"{endpoint}.json")
+        # Written aside and renamed, so concurrent fetches never interleave in one file
+        staging = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(staging, "w") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(staging, path)
+
+
+class OpenWeatherClient(_ClientSettings):
+    """
+    Pooled OpenWeather client shared by the API, CLI and desktop apps.
+
+    Keeps connections alive in a requests.Session, fetches the air pollution
+    and weather endpoints concurrently, and bounds every call with a timeout
+    and a small number of retries.
+    """
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self.timeout = (self.connect_timeout, self.read_timeout)
+        retries = self.retries
+        pool_size = self.pool_size
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=0.2,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="openweather")
+
+    def _get_json(self, endpoint, params):
+        url = f"{self.base_url}/data/2.5/{endpoint}"
+        params = dict(params, appid=self.api_key)
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise UpstreamError(f"Upstream request to {endpoint} failed: {e}") from e
+
+        self._record(endpoint, response.status_code, payload)
+        return payload
+
+    def fetch_observation(self, lat=DEFAULT_LAT, lon=DEFAULT_LON):
+        """Fetch current pollutants and weather for one location."""
+        if not self.api_key:
+            raise UpstreamError("OPENWEATHER_API_KEY not set in environment variables")
+
+        location = {"lat": lat, "lon": lon}
+        pollution = self._executor.submit(self._get_json, "air_pollution", location)
+        weather = self._executor.submit(self._get_json, "weather", dict(location, units="metric"))
+        return parse_observation(pollution.result(), weather.result())
+
+    def fetch_forecast(self, lat=DEFAULT_LAT, lon=DEFAULT_LON):
+        """
+        Fetch the 5-day / 3-hour weather forecast for one location.
+
+        Returns {"timezone": UTC offset in seconds, "entries": [...]} with one
+        entry per 3-hour slot: dt (unix time), temp, humidity, wind_speed and
+        rain_mm (rain over the slot, 0 when none is forecast).
+        """
+        if not self.api_key:
+            raise UpstreamError("OPENWEATHER_API_KEY not set in environment variables")
+
+        f_j = self._get_json("forecast", {"lat": lat, "lon": lon, "units": "metric"})
+        if "list" not in f_j:
+            raise UpstreamError(f"API Error: {f_j.get('message', 'Unknown error')}")
+
+        return {
+            "timezone": f_j.get("city", {}).get("timezone", 0),
+            "entries": [
+                {
+                    "dt": e["dt"],
+                    "temp": e["main"]["temp"],
+                    "humidity": e["main"]["humidity"],
+                    "wind_speed": e["wind"]["speed"],
+                    "rain_mm": e.get("rain", {}).get("3h", 0.0)
+                }
+                for e in f_j["list"]
+            ]
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class AsyncOpenWeatherClient(_ClientSettings):
+    """
+    asyncio counterpart of OpenWeatherClient for the ASGI app (asgi.py).
+
+    One httpx.AsyncClient keeps up to pool_size connections alive; both
+    endpoints are awaited concurrently, so a slow upstream holds no thread.
+    Same timeouts, retries and modes as the blocking client.
+    """
+
+    def __init__(self, **settings):
+        import httpx
+
+        super().__init__(**settings)
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        )
+
+    async def _get_json(self, endpoint, params):
+        url = f"{self.base_url}/data/2.5/{endpoint}"
+        params = dict(params, appid=self.api_key)
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = await self.client.get(url, params=params)
+                if response.status_code in RETRY_STATUSES and not last:
+                    raise self._httpx.HTTPStatusError("retryable status", request=response.request,
+                                                      response=response)
+                payload = response.json()
+                break
+            except (self._httpx.HTTPError, ValueError) as e:
+                if last or isinstance(e, ValueError):
+                    raise UpstreamError(f"Upstream request to {endpoint} failed: {e}") from e
+                # Same schedule as urllib3's Retry(backoff_factor=0.2)
+                await asyncio.sleep(0.2 * 2 ** attempt if attempt else 0)
+
+        self._record(endpoint, response.status_code, payload)
+        return payload
+
+    async def fetch_observation(self, lat=DEFAULT_LAT, lon=DEFAULT_LON):
+        """Fetch current pollutants and weather for one location."""
+        if not self.api_key:
+            raise UpstreamError("OPENWEATHER_API_KEY not set in environment variables")
+
+        location = {"lat": lat, "lon": lon}
+        p_j, w_j = await asyncio.gather(
+            self._get_json("air_pollution", location),
+            self._get_json("weather", dict(location, units="metric"))
+        )
+        return parse_observation(p_j, w_j)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client, created on first use so env vars are loaded first."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = OpenWeatherClient()
+        return _default_client
+
+
+def get_weather_and_pollution(lat=DEFAULT_LAT, lon=DEFAULT_LON):
+    return get_client().fetch_observation(lat, lon)
+
+
+def get_forecast(lat=DEFAULT_LAT, lon=DEFAULT_LON):
+    return get_client().fetch_forecast(lat, lon)
+
+
+def load_recorded_observation(record_dir=None):
+    """The observation in responses saved by OPENWEATHER_MODE=record, without any server."""
+    record_dir = record_dir or os.getenv("OPENWEATHER_RECORD_DIR", FIXTURE_DIR)
+    payloads = []
+    for endpoint in ("air_pollution", "weather"):
+        with open(os.path.join(record_dir, f"{endpoint}.json")) as f:
+            payloads.append(json.load(f))
+    return parse_observation(*payloads)
@@ -1,92 +1,199 @@
-import pandas as pd
+from bisect import bisect_left, bisect_right
+from itertools import product
+
+import numpy as np
+
+# Decision tables. Rules are data: each request looks its template up by
+# band instead of walking if/elif chains and appending strings.
+
+# AQI bands (standard EPA scale): a band covers AQIs up to and including its limit
+AQI_LIMITS = np.array([50, 100, 150, 200, 300])
+AQI_BANDS = [
+    # (category, advice, protective measures apply)
+    ("Good", "Air quality is good. Normal activities OK.", False),
+    ("Moderate", "Unusually sensitive people should reduce prolonged outdoor exertion.", False),
+    ("Unhealthy for Sensitive Groups", "Sensitive groups should reduce outdoor exertion.", False),
+    ("Unhealthy", "Everyone should reduce prolonged outdoor exertion.", True),
+    ("Very Unhealthy", "Everyone should avoid prolonged outdoor exertion.", True),
+    ("Hazardous", "STAY INDOORS! Health warning of emergency conditions.", True),
+]
+PROTECTIVE_ADVICE = [
+    "Wear N95 or KN95 mask if you must go outside.",
+    "Keep windows closed, use air purifier indoors.",
+]
+
+# Age bands: a band starts at its limit (children are under 12)
+AGE_LIMITS = np.array([12, 18, 60])
+AGE_BANDS = [
+    # (group, advice)
+    ("children", "CHILDREN: Avoid outdoor activities, stay in well-ventilated indoor spaces."),
+    ("teens", "TEENS: No outdoor sports or heavy exercise."),
+    ("adults", None),
+    ("seniors", "SENIORS: Stay indoors, use air purifier if available."),
+]
+
+
+def _compile_recommendations():
+    """Advice lines and legacy text around the AQI value, per (AQI band, age band)."""
+    advice, text = {}, {}
+    for b, (category, aqi_advice, protective) in enumerate(AQI_BANDS):
+        for a, (_, age_advice) in enumerate(AGE_BANDS):
+            lines = [aqi_advice]
+            if age_advice is not None:
+                lines.append(age_advice)
+            if protective:
+                lines.extend(PROTECTIVE_ADVICE)
+            # Tuples: one object is shared by every response with this template
+            advice[b, a] = tuple(lines)
+            text[b, a] = (f"\nAQI Category: {category} (AQI: ", ")\n\n" + "\n".join(lines))
+    return advice, text
+
+
+RECOMMENDATION_ADVICE, RECOMMENDATION_TEXT = _compile_recommendations()
+
+
+def aqi_bands(aqi):
+    """Index into AQI_BANDS for each AQI in an array."""
+    return np.searchsorted(AQI_LIMITS, aqi, side="left")
+
+
+def age_bands(age):
+    """Index into AGE_BANDS for each age in an array."""
+    return np.searchsorted(AGE_LIMITS, age, side="right")
+
+
+def _bands(age, aqi):
+    # One user: bisect on the plain lists is much cheaper than numpy on scalars
+    return bisect_left(_AQI_LIMITS, aqi), bisect_right(_AGE_LIMITS, age)
+
+
+_AQI_LIMITS = AQI_LIMITS.tolist()
+_AGE_LIMITS = AGE_LIMITS.tolist()
+
+
+def aqi_category(aqi):
+    """Category of one AQI, as in the advice of recommendation()."""
+    return AQI_BANDS[bisect_left(_AQI_LIMITS, aqi)][0]
+
 
 def recommend_for_high_pollution(age, aqi):
     """
     Takes user age and predicted AQI, returns health recommendations.
     This is what final.py and gui.py actually call!
     """
-    advice = []
-
-    # Determine AQI category (standard EPA scale)
-    if aqi <= 50:
-        category = "Good"
-        advice.append("Air quality is good. Normal activities OK.")
-    elif aqi <= 100:
-        category = "Moderate"
-        advice.append("Unusually sensitive people should reduce prolonged outdoor exertion.")
-    elif aqi <= 150:
-        category = "Unhealthy for Sensitive Groups"
-        advice.append("Sensitive groups should reduce outdoor exertion.")
-    elif aqi <= 200:
-        category = "Unhealthy"
-        advice.append("Everyone should reduce prolonged outdoor exertion.")
-    elif aqi <= 300:
-        category = "Very Unhealthy"
-        advice.append("Everyone should avoid prolonged outdoor exertion.")
-    else:
-        category = "Hazardous"
-        advice.append("STAY INDOORS! Health warning of emergency conditions.")
-
-    # Age-specific recommendations
-    if age < 12:
-        advice.append("CHILDREN: Avoid outdoor activities, stay in well-ventilated indoor spaces.")
-    elif age >= 60:
-        advice.append("SENIORS: Stay indoors, use air purifier if available.")
-    elif 12 <= age < 18:
-        advice.append("TEENS: No outdoor sports or heavy exercise.")
-
-    # Additional advice for bad air
-    if aqi > 150:
-        advice.append("Wear N95 or KN95 mask if you must go outside.")
-        advice.append("Keep windows closed, use air purifier indoors.")
-
-    return f"\nAQI Category: {category} (AQI: {int(aqi)})\n\n" + "\n".join(advice)
+    prefix, suffix = RECOMMENDATION_TEXT[_bands(age, aqi)]
+    return prefix + str(int(aqi)) + suffix
+
+
+def recommend_batch(ages, aqi):
+    """
+    Recommendations for many users in one pass.
+
+    `ages` is a sequence; `aqi` is one AQI for everyone or one per user.
+    Returns (structured, texts): for each user a dict with category, aqi,
+    age_group and advice lines, and the same advice as the legacy text of
+    recommend_for_high_pollution.
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    aqi = np.broadcast_to(np.asarray(aqi, dtype=np.float64), ages.shape)
+    templates = aqi_bands(aqi) * len(AGE_BANDS) + age_bands(ages)
+    # Users with the same template and AQI share one dict and one string
+    keys, inverse = np.unique(aqi.astype(np.int64) * len(RECOMMENDATION_TEXT) + templates,
+                              return_inverse=True)
+
+    built = []
+    for key in keys.tolist():
+        value, template = divmod(key, len(RECOMMENDATION_TEXT))
+        b, a = divmod(template, len(AGE_BANDS))
+        prefix, suffix = RECOMMENDATION_TEXT[b, a]
+        built.append((_structured(b, a, value), prefix + str(value) + suffix))
+    entries = [built[i] for i in inverse.tolist()]
+    return [entry[0] for entry in entries], [entry[1] for entry in entries]
+
+
+def _structured(b, a, value):
+    return {
+        'category': AQI_BANDS[b][0],
+        'aqi': value,
+        'age_group': AGE_BANDS[a][0],
+        'advice': RECOMMENDATION_ADVICE[b, a]
+    }
+
+
+def recommendation(age, aqi):
+    """Structured recommendation for one user (see recommend_batch)."""
+    return _structured(*_bands(age, aqi), int(aqi))
+
+
+# Concern threshold: scores above it are High
+CONCERN_THRESHOLD = 5
+
 
 def classify_concern_level(score):
     """
     Converts the 0-10 concern score into a binary High/Low classification.
-    Adjust the threshold (e.g., 5) as needed.
+    Adjust CONCERN_THRESHOLD as needed.
     """
-    if score > 5:
-        return 'High'
-    else:
-        return 'Low'
+    return 'High' if score > CONCERN_THRESHOLD else 'Low'
+
+
+def concern_levels(scores):
+    """classify_concern_level over an array of scores."""
+    return np.where(np.asarray(scores) > CONCERN_THRESHOLD, 'High', 'Low')
+
+
+def _compile_concern_advice():
+    """Advice lines per (concern level, privacy mode, respiratory, parent, senior)."""
+    table = {}
+    for privacy, respiratory, parent, senior in product((False, True), repeat=4):
+        lines = ["🚨 STATUS: HIGH CONCERN LEVEL",
+                 "General Actions:",
+                 "- The perceived pollution risk is high. Assume poor air quality.",
+                 "- Wear a mask (N95) if heading out."]
+        if privacy:
+            lines.append("(Specific health recommendations hidden - Privacy Mode ON)")
+        else:
+            if respiratory:
+                lines.append("‼️ HEALTH: You have respiratory issues. High concern levels imply you should stay indoors.")
+            if parent:
+                lines.append("👨‍👩‍👧 FAMILY: Prevent children from playing outside until concern levels drop.")
+            if senior:
+                lines.append("👴 SENIOR: High concern warrants strict indoor stay for older adults.")
+        table['High', privacy, respiratory, parent, senior] = tuple(lines)
+
+        lines = ["✅ STATUS: LOW CONCERN LEVEL",
+                 "- Perceived pollution risk is low.",
+                 "- Standard outdoor activities are likely safe."]
+        if not privacy and respiratory:
+            lines.append("NOTE: Even with low concern, keep your inhaler nearby just in case.")
+        table['Low', privacy, respiratory, parent, senior] = tuple(lines)
+    return table
+
+
+CONCERN_ADVICE = _compile_concern_advice()
+
+
+def _concern_key(concern_level, user_data, privacy_mode):
+    age = str(user_data.get('Age_group'))
+    return (concern_level, bool(privacy_mode), user_data.get('Respiratory_difficulties') == 'Yes',
+            user_data.get('Parent') == 'Yes', '55' in age or '65' in age)
+
 
 def generate_advice_by_concern(concern_score, user_data, privacy_mode=False):
     """
     Triggers advice based on the Concern Level (High/Low) instead of raw AQI.
     """
     concern_level = classify_concern_level(concern_score)
-    
-    advice = []
-    advice.append(f"--- Report for Concern Score: {concern_score}/10 ({concern_level.upper()}) ---")
-
-    if concern_level == 'High':
-        advice.append("🚨 STATUS: HIGH CONCERN LEVEL")
-        advice.append("General Actions:")
-        advice.append("- The perceived pollution risk is high. Assume poor air quality.")
-        advice.append("- Wear a mask (N95) if heading out.")
-        
-        if not privacy_mode:
-            if user_data.get('Respiratory_difficulties') == 'Yes':
-                advice.append("‼️ HEALTH: You have respiratory issues. High concern levels imply you should stay indoors.")
-            
-            if user_data.get('Parent') == 'Yes':
-                advice.append("👨‍👩‍👧 FAMILY: Prevent children from playing outside until concern levels drop.")
-                
-            
-            age = str(user_data.get('Age_group'))
-            if '55' in age or '65' in age:
-                advice.append("👴 SENIOR: High concern warrants strict indoor stay for older adults.")
-        else:
-            advice.append("(Specific health recommendations hidden - Privacy Mode ON)")
+    lines = CONCERN_ADVICE[_concern_key(concern_level, user_data, privacy_mode)]
+    header = f"--- Report for Concern Score: {concern_score}/10 ({concern_level.upper()}) ---"
+    return header + "\n" + "\n".join(lines)
 
-    else: # Low Concern
-        advice.append("✅ STATUS: LOW CONCERN LEVEL")
-        advice.append("- Perceived pollution risk is low.")
-        advice.append("- Standard outdoor activities are likely safe.")
-        
-        if not privacy_mode and user_data.get('Respiratory_difficulties') == 'Yes':
-            advice.append("NOTE: Even with low concern, keep your inhaler nearby just in case.")
 
-    return "\n".join(advice)
\ No newline at end of file
+def concern_advice(concern_score, user_data, privacy_mode=False):
+    """Structured form of generate_advice_by_concern."""
+    concern_level = classify_concern_level(concern_score)
+    return {
+        'concern_score': concern_score,
+        'concern_level': concern_level,
+        'advice': CONCERN_ADVICE[_concern_key(concern_level, user_data, privacy_mode)]
+    }
@@ -0,0 +1,88 @@
+"""
+Serialized /predict responses, reused while the observation is unchanged.
+
+For one observation the /predict body depends only on the grid cell and
+the profile (age, gender_enc, parent_enc), so the response bytes are kept
+per (cell, profile) together with the observation version they were built
+from (ObservationCache.get_versioned). Once the cell's observation is
+refreshed its version moves on, the entry no longer matches and is rebuilt
+on the next request. Versions come from one process-wide counter, so a
+cell the grid evicted and fetched again gets a newer version too. At most
+`max_entries` responses are kept (LRU).
+
+Each response carries an ETag, a hash of its body. A client that sends it
+back in If-None-Match while nothing changed gets 304 Not Modified with no
+body.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def etag_for(body):
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value lists `etag` (weak or strong) or is *."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class ResponseCache:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (version, body, etag)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.not_modified = 0
+
+    def get(self, key, version):
+        """(body, etag) cached for key under this observation version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry is not None and entry[0] < version:
+                # Built from an older observation
+                del self._entries[key]
+                self.invalidated += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, version, body):
+        """Store a serialized response; returns (body, etag)."""
+        etag = etag_for(body)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > version:
+                # A request on a newer observation got here first
+                return body, etag
+            self._entries[key] = (version, body, etag)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidated': self.invalidated,
+                'not_modified': self.not_modified
+            }
@@ -0,0 +1,78 @@
+"""
+Local stand-in for OpenWeather that serves recorded responses.
+
+Record responses with OPENWEATHER_MODE=record, then run:
+
+    python stub_server.py --dir fixtures/openweather --port 8765
+
+and point the apps at it with OPENWEATHER_MODE=replay. A fixed --latency can
+be added to every response to mimic the real upstream when benchmarking.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from openweather_client import FIXTURE_DIR
+
+
+def make_handler(fixture_dir, latency=0.0):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; without this, delayed
+        # ACKs add ~40 ms to every keep-alive response
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            endpoint = os.path.basename(urlparse(self.path).path)
+            path = os.path.join(fixture_dir, f"{endpoint}.json")
+            if latency:
+                time.sleep(latency)
+
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    body = f.read()
+                status = 200
+            else:
+                body = json.dumps({"cod": 404, "message": f"No recording for {endpoint}"}).encode()
+                status = 404
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections from load tests that open
+    # many at once, adding 1-3 s SYN retransmits to their latency
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start_stub_server(fixture_dir=FIXTURE_DIR, port=0, latency=0.0):
+    """Start the stub in a daemon thread. Returns (server, base_url)."""
+    server = StubServer(("127.0.0.1", port), make_handler(fixture_dir, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded OpenWeather responses")
+    parser.add_argument("--dir", default=FIXTURE_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", args.port), make_handler(args.dir, args.latency))
+    print(f"Serving {args.dir} at http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend is flat modules run from backend/ (python api.py, gunicorn api:app)
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from compact_forest import CHUNK_ROWS, CompactForest, export_forest
+from features import FEATURES
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pollutant_model_features.csv")
+
+
+@pytest.fixture(scope="module")
+def trained():
+    df = pd.read_csv(DATA)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    model = RandomForestRegressor(n_estimators=20, random_state=0).fit(X[:300], df['AQI'].to_numpy()[:300])
+    # Training rows and unseen ones, more than one predict chunk
+    return model, X[:CHUNK_ROWS * 2 + 7]
+
+
+@pytest.mark.parametrize("mmap_mode", [None, "r"])
+def test_predictions_identical(trained, tmp_path, mmap_mode):
+    model, X = trained
+    export_forest(model, str(tmp_path / "forest"))
+    forest = CompactForest.load(str(tmp_path / "forest"), mmap_mode=mmap_mode)
+
+    assert np.array_equal(forest.predict(X), model.predict(X))
+    for row in (X[:1], X[300:301]):
+        assert np.array_equal(forest.predict(row), model.predict(row))
@@ -0,0 +1,8 @@
+from recommend import aqi_category, recommendation
+
+
+def test_aqi_category_matches_advice_at_band_limits():
+    for aqi in [0, 50, 50.4, 100, 100.4, 150.9, 200, 300, 300.2, 500]:
+        assert aqi_category(aqi) == recommendation(35, aqi)['category']
+    # Rounded for display, 100.4 would look Moderate
+    assert aqi_category(100.4) == "Unhealthy for Sensitive Groups"
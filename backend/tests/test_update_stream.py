@@ -0,0 +1,83 @@
+import pytest
+
+from benchmarks.bench_batch import fixture_observation
+
+QUERY = "/stream?lat=28.61&lon=77.21"
+
+
+@pytest.fixture
+def api(monkeypatch):
+    import api
+    observation = fixture_observation()
+    monkeypatch.setattr(api.observation_cache, "fetch", lambda lat, lon: observation)
+    monkeypatch.setattr(api.update_stream, "build", lambda observation, lat, lon: {'aqi': 150})
+    assert api.update_stream.stats()['clients'] == 0
+    return api
+
+
+def test_head_takes_no_slot(api):
+    client = api.app.test_client()
+    for _ in range(3):
+        response = client.head(QUERY)
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+    assert api.update_stream.stats()['clients'] == 0
+
+
+def test_unread_get_frees_its_slot_on_close(api):
+    client = api.app.test_client()
+    response = client.get(QUERY, buffered=False)
+    assert response.status_code == 200
+    assert api.update_stream.stats()['clients'] == 1
+    response.close()
+    assert api.update_stream.stats()['clients'] == 0
+
+
+def test_read_get_frees_its_slot_once(api):
+    client = api.app.test_client()
+    response = client.get(QUERY, buffered=False)
+    body = response.response
+    assert next(body).startswith(b"retry:")
+    assert b"event: aqi" in next(body)
+    response.close()
+    stats = api.update_stream.stats()
+    assert stats['clients'] == 0
+    assert stats['frames_sent'] >= 1
+
+
+def test_asgi_head_takes_no_slot():
+    pytest.importorskip("httpx")
+    starlette = pytest.importorskip("starlette.testclient")
+    import asgi
+    with starlette.TestClient(asgi.app) as client:
+        for _ in range(3):
+            assert client.head(QUERY).status_code == 200
+    assert asgi.update_stream.stats()['clients'] == 0
+
+
+def test_asgi_disconnect_before_first_frame_frees_its_slot(monkeypatch):
+    pytest.importorskip("starlette")
+    import asyncio
+    import asgi
+    observation = fixture_observation()
+
+    async def fetch(lat, lon):
+        return observation
+
+    monkeypatch.setattr(asgi.observation_cache, "fetch", fetch)
+    monkeypatch.setattr(asgi.update_stream, "build", lambda observation, lat, lon: {'aqi': 150})
+
+    async def disconnected():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        await asyncio.sleep(0)
+
+    async def run():
+        subscription = await asgi.update_stream.subscribe(28.61, 77.21)
+        assert asgi.update_stream.stats()['clients'] == 1
+        response = asgi.EventStreamResponse(subscription, headers={})
+        await response({'type': 'http', 'method': 'GET', 'headers': []}, disconnected, send)
+
+    asyncio.run(run())
+    assert asgi.update_stream.stats()['clients'] == 0
@@ -0,0 +1,236 @@
+"""
+One training entry point for the AQI / AQHI models.
+
+Loads pollutant_model_features.csv once, computes each train/test split
+once, builds trees on all cores, trains the requested variants
+concurrently, and writes per-stage timings and metrics to a JSON report.
+
+    python train_aqi.py                                  # aqi + aqhi (main.py)
+    python train_aqi.py --variants aqi_weather,aqhi_weather   # main2.py
+    python train_aqi.py --variants all --report training_report.json
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from features import FEATURES
+from features import WEATHER_FEATURES as NO_POLLUTANT_FEATURES
+
+DATA_PATH = "pollutant_model_features.csv"
+HISTORY_DIR = "history"
+REPORT_PATH = "training_report.json"
+
+TARGETS = ['AQI', 'AQHI']
+WEATHER_FEATURES = ['temp', 'humidity', 'windspeedmean', 'month', 'is_festive']
+
+# name -> target, feature set, estimator, test split, artifact, serving copy
+VARIANTS = {
+    # main.py
+    'aqi': dict(target='AQI', features='all', model='forest', test_size=0.3, save='aqi_model.pkl',
+                compact='aqi_model_compact'),
+    'aqhi': dict(target='AQHI', features='all', model='forest', test_size=0.3, save=None),
+    # main2.py: weather and calendar only; aqi_weather serves /forecast
+    'aqi_weather': dict(target='AQI', features='no_pollutants', model='forest', test_size=0.3,
+                        save='aqi_weather_model.pkl', compact='aqi_weather_compact'),
+    'aqhi_weather': dict(target='AQHI', features='no_pollutants', model='forest', test_size=0.3, save=None),
+    # linear_regression.py and visual.py
+    'linear': dict(target='AQI', features=WEATHER_FEATURES, model='linear', test_size=0.2, save=None),
+    'forest_small': dict(target='AQI', features=WEATHER_FEATURES, model='forest_small', test_size=0.2, save=None),
+}
+DEFAULT_VARIANTS = ['aqi', 'aqhi']
+
+
+def adjusted_r2(r2, n, k):
+    return 1 - ((1 - r2) * (n - 1)) / (n - k - 1)
+
+
+@contextmanager
+def timed(stages, name):
+    start = time.perf_counter()
+    yield
+    stages[name] = round(time.perf_counter() - start, 4)
+
+
+def load_features(path=DATA_PATH):
+    # The columnar store (python history_store.py convert) holds the same rows
+    # plus the daily appends, and loads without parsing text
+    if path == DATA_PATH and os.path.isdir(os.path.join(HISTORY_DIR, "features")):
+        from history_store import HistoryStore
+        return HistoryStore(HISTORY_DIR).read("features")
+    return pd.read_csv(path)
+
+
+def feature_columns(df, features):
+    # The column sets serving builds (features.py), in the same order
+    if features == 'all':
+        return list(FEATURES)
+    if features == 'no_pollutants':
+        return list(NO_POLLUTANT_FEATURES)
+    return list(features)
+
+
+def make_estimator(kind, n_jobs):
+    if kind == 'forest':
+        return RandomForestRegressor(n_estimators=1000, random_state=42, n_jobs=n_jobs)
+    if kind == 'forest_small':
+        return RandomForestRegressor(random_state=42, n_jobs=n_jobs)
+    if kind == 'linear':
+        return LinearRegression()
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def split_indices(n_rows, test_size):
+    """Row indices of the train/test split the old scripts used (random_state=42)."""
+    return train_test_split(np.arange(n_rows), test_size=test_size, random_state=42)
+
+
+def train_variant(name, df, splits, n_jobs):
+    spec = VARIANTS[name]
+    columns = feature_columns(df, spec['features'])
+    train_idx, test_idx = splits[spec['test_size']]
+    X = df[columns]
+    y = df[spec['target']]
+    x_train, x_test = X.iloc[train_idx], X.iloc[test_idx]
+    y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+
+    # Appended live rows have no AQHI (see history_store.append_daily)
+    labelled = y_train.notna().to_numpy()
+    if not labelled.all():
+        x_train, y_train = x_train[labelled], y_train[labelled]
+    labelled = y_test.notna().to_numpy()
+    if not labelled.all():
+        x_test, y_test = x_test[labelled], y_test[labelled]
+
+    stages = {}
+    model = make_estimator(spec['model'], n_jobs)
+    with timed(stages, 'fit'):
+        model.fit(x_train, y_train)
+    # Rows of the (append-only) history this model was trained from, so
+    # update_models.py holds out only rows added later
+    model.n_training_rows_ = len(df)
+    with timed(stages, 'predict'):
+        y_pred = model.predict(x_test)
+
+    r2 = r2_score(y_test, y_pred)
+    result = {
+        'target': spec['target'],
+        'model': spec['model'],
+        'features': columns,
+        'n_train': len(y_train),
+        'n_test': len(y_test),
+        'r2': r2,
+        'adjusted_r2': adjusted_r2(r2, len(y_test), len(columns)),
+        'mae': mean_absolute_error(y_test, y_pred),
+        'seconds': stages
+    }
+    return model, result, (y_test, y_pred)
+
+
+def save_model(name, model, stages):
+    spec = VARIANTS[name]
+    if not spec['save']:
+        return
+    with timed(stages, f'save_{name}'):
+        # Swapped in whole, so a serving process never reads a partial file
+        staging = f"{spec['save']}.tmp-{os.getpid()}"
+        with open(staging, 'wb') as f:
+            pickle.dump(model, f)
+        os.replace(staging, spec['save'])
+        if spec.get('compact'):
+            # Array-backed copy used for serving (see compact_forest.py); it is
+            # staged and swapped in as a directory, never rewritten in place
+            from compact_forest import export_forest
+            export_forest(model, spec['compact'])
+
+
+def train(variants=None, data_path=DATA_PATH, n_jobs=-1, parallel=None, save=True):
+    """
+    Train the given variants on one load of the data.
+
+    Returns (models, report, predictions) keyed by variant name;
+    predictions holds (y_test, y_pred) for plotting.
+    """
+    variants = list(variants or DEFAULT_VARIANTS)
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        raise ValueError(f"Unknown variants: {', '.join(unknown)}. Known: {', '.join(VARIANTS)}")
+
+    stages = {}
+    start = time.perf_counter()
+    with timed(stages, 'load'):
+        df = load_features(data_path)
+
+    # The old scripts split the same rows with the same seed once per target;
+    # one split per test size gives identical train/test sets
+    with timed(stages, 'split'):
+        splits = {size: split_indices(len(df), size) for size in {VARIANTS[v]['test_size'] for v in variants}}
+
+    # Forests build their trees on all cores; variants also run side by side
+    # since sklearn releases the GIL while building trees
+    with timed(stages, 'train'):
+        with ThreadPoolExecutor(max_workers=parallel or len(variants)) as pool:
+            futures = {v: pool.submit(train_variant, v, df, splits, n_jobs) for v in variants}
+            outcomes = {v: f.result() for v, f in futures.items()}
+
+    models = {v: outcome[0] for v, outcome in outcomes.items()}
+    if save:
+        for v in variants:
+            save_model(v, models[v], stages)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'data': {'path': data_path, 'rows': len(df), 'columns': len(df.columns)},
+        'n_jobs': n_jobs,
+        'stages': stages,
+        'total_seconds': round(time.perf_counter() - start, 4),
+        'variants': {v: outcome[1] for v, outcome in outcomes.items()}
+    }
+    predictions = {v: outcome[2] for v, outcome in outcomes.items()}
+    return models, report, predictions
+
+
+def print_report(report):
+    for name, result in report['variants'].items():
+        print(f"{name} ({result['model']}, {result['target']}, {len(result['features'])} features): "
+              f"R²={result['r2']:.4f}, adjusted R²={result['adjusted_r2']:.4f}, MAE={result['mae']:.2f}, "
+              f"fit {result['seconds']['fit']:.2f}s")
+    stages = ", ".join(f"{k} {v:.2f}s" for k, v in report['stages'].items())
+    print(f"\nStages: {stages}")
+    print(f"Total: {report['total_seconds']:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train AQI/AQHI model variants")
+    parser.add_argument("--variants", default=",".join(DEFAULT_VARIANTS),
+                        help=f"comma-separated, or 'all' ({', '.join(VARIANTS)})")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--jobs", type=int, default=-1, help="cores per forest (-1 = all)")
+    parser.add_argument("--parallel", type=int, default=None, help="variants trained at once (default: all)")
+    parser.add_argument("--no-save", action="store_true", help="skip writing model artifacts")
+    args = parser.parse_args(argv)
+
+    variants = list(VARIANTS) if args.variants == 'all' else [v.strip() for v in args.variants.split(',')]
+    models, report, _ = train(variants, args.data, args.jobs, args.parallel, save=not args.no_save)
+
+    print_report(report)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+    return models, report
+
+
+if __name__ == "__main__":
+    main()
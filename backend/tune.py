@@ -0,0 +1,268 @@
+"""
+Budgeted hyperparameter search for the AQI forest and the health-risk models.
+
+Samples random configurations and narrows them down with successive halving:
+every rung trains all surviving candidates on a small budget, keeps the best
+1/eta, and multiplies the budget by eta. The AQI forest's budget is the share
+of training rows; the health models' budget is the number of CV folds, and
+each XGBoost fit stops early once validation ROC-AUC stops improving. Splits
+are computed once and trials of a rung run in parallel.
+
+The finalists and the current hardcoded settings are then timed on the
+serving path (one-row prediction) and the cheapest model whose validation
+score is within --tolerance of the current settings is recommended.
+
+    python tune.py --family aqi --trials 27
+    python tune.py --family health --tolerance 0.005
+    python tune.py --family all --report tuning_report.json
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from compact_forest import export_forest
+from health_risk_predictor import FEATURE_COLS, HEALTH_PARAMS, TARGET_COLS, compute_splits, make_classifier
+from train_aqi import feature_columns, load_features, split_indices
+
+REPORT_PATH = "tuning_report.json"
+
+# main.py's forest
+AQI_BASELINE = dict(n_estimators=1000, max_depth=None, min_samples_leaf=1, max_features=1.0)
+AQI_SPACE = {
+    'n_estimators': [25, 50, 100, 200, 400, 1000],
+    'max_depth': [None, 8, 12, 16, 24],
+    'min_samples_leaf': [1, 2, 4, 8],
+    'max_features': [1.0, 0.7, 0.5, 'sqrt'],
+}
+
+HEALTH_SPACE = {
+    'max_depth': [2, 3, 4, 6],
+    'learning_rate': [0.03, 0.1, 0.3],
+    'min_child_weight': [1, 3, 5],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+}
+# Upper bound for early-stopped fits; the stopping round sets n_estimators
+MAX_BOOST_ROUNDS = 400
+EARLY_STOPPING_ROUNDS = 20
+
+LATENCY_REPEATS = 200
+
+
+def sample_candidates(space, n, seed=42):
+    """Up to n distinct random configurations from a grid of choices."""
+    rng = np.random.default_rng(seed)
+    total = math.prod(len(choices) for choices in space.values())
+    seen, candidates = set(), []
+    while len(candidates) < min(n, total):
+        params = {name: choices[rng.integers(len(choices))] for name, choices in space.items()}
+        key = tuple(params.items())
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def rung_budgets(full, rungs, eta, minimum=1):
+    """Budgets of each rung, ending with the full budget."""
+    return [max(minimum, math.ceil(full * eta ** -(rungs - 1 - i))) for i in range(rungs)]
+
+
+def successive_halving(candidates, evaluate, budgets, eta, jobs):
+    """
+    Evaluate candidates on growing budgets, keeping the best 1/eta each rung.
+
+    evaluate(params, budget) returns a dict with at least 'score' (higher is
+    better). Returns every trial and the final rung's results.
+    """
+    trials = []
+    survivors = candidates
+    for rung, budget in enumerate(budgets):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(lambda params: evaluate(params, budget), survivors))
+        for params, result in zip(survivors, results):
+            trials.append(dict(result, rung=rung, budget=budget, params=params))
+        print(f"  rung {rung}: {len(survivors)} candidates at budget {budget}, "
+              f"best {max(r['score'] for r in results):.4f} ({time.perf_counter() - start:.1f}s)")
+
+        ranked = sorted(zip(survivors, results), key=lambda pair: -pair[1]['score'])
+        if rung == len(budgets) - 1:
+            return trials, [dict(result, params=params) for params, result in ranked]
+        survivors = [params for params, _ in ranked[:max(1, len(ranked) // eta)]]
+
+
+def median_latency_ms(predict, row):
+    predict(row)
+    times = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def select(finalists, baseline, tolerance):
+    """Cheapest finalist whose validation score is within tolerance of the baseline."""
+    floor = baseline['score'] - tolerance
+    eligible = [f for f in finalists + [baseline] if f['score'] >= floor]
+    return min(eligible, key=lambda f: f['latency_ms'])
+
+
+def tune_aqi(trials=27, eta=3, rungs=3, tolerance=0.01, jobs=None):
+    df = load_features()
+    columns = feature_columns(df, 'all')
+    X = df[columns].to_numpy()
+    y = df['AQI'].to_numpy()
+
+    # Same test rows as train_aqi; candidates are scored on a validation
+    # split of the training rows so the test set stays untouched
+    train_idx, test_idx = split_indices(len(df), 0.3)
+    fit_idx, val_idx = train_test_split(train_idx, test_size=0.2, random_state=42)
+    budgets = rung_budgets(len(fit_idx), rungs, eta, minimum=50)
+
+    def evaluate(params, n_rows, idx=fit_idx, eval_idx=val_idx):
+        model = RandomForestRegressor(random_state=42, n_jobs=1, **params)
+        start = time.perf_counter()
+        model.fit(X[idx[:n_rows]], y[idx[:n_rows]])
+        fit_seconds = time.perf_counter() - start
+        return {'score': r2_score(y[eval_idx], model.predict(X[eval_idx])),
+                'fit_seconds': round(fit_seconds, 3), 'model': model}
+
+    print(f"AQI forest: {trials} candidates, rungs {budgets} training rows")
+    history, finalists = successive_halving(sample_candidates(AQI_SPACE, trials), evaluate, budgets, eta, jobs)
+    baseline = dict(evaluate(AQI_BASELINE, len(fit_idx)), params=AQI_BASELINE)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, result in enumerate(finalists + [baseline]):
+            forest = export_forest(result.pop('model'), os.path.join(tmp, str(i)))
+            result['latency_ms'] = median_latency_ms(forest.predict, X[test_idx[0]])
+            result['nodes'] = forest.meta['n_nodes']
+            final = evaluate(result['params'], len(train_idx), train_idx, test_idx)
+            result['test_score'] = final['score']
+    for trial in history:
+        trial.pop('model', None)
+
+    return report_family('R²', history, finalists, baseline, select(finalists, baseline, tolerance))
+
+
+def tune_health(trials=27, eta=3, rungs=3, tolerance=0.005, jobs=None):
+    df = pd.read_csv("health_risk_training.csv")
+    X = df[FEATURE_COLS]
+    splits = compute_splits(df)
+    budgets = rung_budgets(5, rungs, eta)
+
+    def fit_fold(params, target, train_idx, test_idx, early_stopping):
+        y = df[target]
+        if early_stopping:
+            # Stop on rows held out of the training fold, not on the scored fold
+            fit_idx, stop_idx = train_test_split(train_idx, test_size=0.15, random_state=42,
+                                                 stratify=y.iloc[train_idx])
+            model = make_classifier(**dict(params, n_estimators=MAX_BOOST_ROUNDS),
+                                    early_stopping_rounds=EARLY_STOPPING_ROUNDS, eval_metric='auc')
+            model.fit(X.iloc[fit_idx], y.iloc[fit_idx],
+                      eval_set=[(X.iloc[stop_idx], y.iloc[stop_idx])], verbose=False)
+            n_trees = model.best_iteration + 1
+        else:
+            model = make_classifier(**params)
+            model.fit(X.iloc[train_idx], y.iloc[train_idx])
+            n_trees = params['n_estimators']
+        score = roc_auc_score(y.iloc[test_idx], model.predict_proba(X.iloc[test_idx])[:, 1])
+        return score, n_trees
+
+    def evaluate(params, n_folds, early_stopping=True):
+        start = time.perf_counter()
+        scores, n_trees = [], []
+        for target in TARGET_COLS:
+            for train_idx, test_idx in splits[target]['folds'][:n_folds]:
+                score, trees = fit_fold(params, target, train_idx, test_idx, early_stopping)
+                scores.append(score)
+                n_trees.append(trees)
+        return {'score': float(np.mean(scores)), 'n_estimators': int(round(np.mean(n_trees))),
+                'fit_seconds': round(time.perf_counter() - start, 3)}
+
+    print(f"Health models: {trials} candidates, rungs {budgets} CV folds")
+    history, finalists = successive_halving(sample_candidates(HEALTH_SPACE, trials), evaluate, budgets, eta, jobs)
+    baseline = dict(evaluate(HEALTH_PARAMS, 5, early_stopping=False), params=HEALTH_PARAMS)
+
+    # Refit every finalist with its early-stopped tree count on the saved
+    # models' holdout split, then time one row through all four models
+    row = X.iloc[[0]].to_numpy(dtype=np.float64)
+    for result in finalists + [baseline]:
+        params = dict(result['params'], n_estimators=result['n_estimators'])
+        result['params'] = params
+        models, scores = [], []
+        for target in TARGET_COLS:
+            train_idx, test_idx = splits[target]['holdout']
+            model = make_classifier(**params)
+            model.fit(X.iloc[train_idx], df[target].iloc[train_idx])
+            scores.append(roc_auc_score(df[target].iloc[test_idx], model.predict_proba(X.iloc[test_idx])[:, 1]))
+            models.append(model)
+        result['test_score'] = float(np.mean(scores))
+        result['latency_ms'] = median_latency_ms(lambda r: [m.predict_proba(r) for m in models], row)
+        result['nodes'] = sum(len(m.get_booster().trees_to_dataframe()) for m in models)
+
+    return report_family('ROC-AUC', history, finalists, baseline, select(finalists, baseline, tolerance))
+
+
+def report_family(metric, history, finalists, baseline, chosen):
+    print(f"\n{'':2}{'val ' + metric:>12} {'test ' + metric:>13} {'latency ms':>11} {'nodes':>8}  params")
+    for result in sorted(finalists + [baseline], key=lambda r: r['latency_ms']):
+        mark = '*' if result is chosen else ('=' if result is baseline else ' ')
+        print(f"{mark:2}{result['score']:>12.4f} {result['test_score']:>13.4f} "
+              f"{result['latency_ms']:>11.3f} {result['nodes']:>8}  {result['params']}")
+    if chosen is baseline:
+        print("* recommended, = current settings; no cheaper finalist meets the tolerance\n")
+    else:
+        print(f"* recommended, = current settings; {baseline['latency_ms'] / chosen['latency_ms']:.1f}x faster "
+              f"at {chosen['score'] - baseline['score']:+.4f} validation {metric}\n")
+    return {
+        'metric': metric,
+        'baseline': baseline,
+        'recommended': chosen,
+        'finalists': finalists,
+        'trials': history
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Budgeted hyperparameter search")
+    parser.add_argument("--family", choices=["aqi", "health", "all"], default="all")
+    parser.add_argument("--trials", type=int, default=27, help="candidates sampled per family")
+    parser.add_argument("--eta", type=int, default=3, help="keep 1/eta of the candidates per rung")
+    parser.add_argument("--rungs", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="allowed drop in validation score (default: 0.01 R², 0.005 ROC-AUC)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="trials run at once")
+    parser.add_argument("--report", default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    report = {'timestamp': datetime.now().isoformat(timespec='seconds')}
+    start = time.perf_counter()
+    if args.family in ("aqi", "all"):
+        report['aqi'] = tune_aqi(args.trials, args.eta, args.rungs,
+                                 0.01 if args.tolerance is None else args.tolerance, args.jobs)
+    if args.family in ("health", "all"):
+        report['health'] = tune_health(args.trials, args.eta, args.rungs,
+                                       0.005 if args.tolerance is None else args.tolerance, args.jobs)
+    report['total_seconds'] = round(time.perf_counter() - start, 2)
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Search took {report['total_seconds']:.1f}s; report written to {args.report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Incremental refresh of the AQI forest and the health-risk models.
+
+Instead of refitting 1000 trees from scratch (python main.py), the AQI
+forest gets `--trees` new trees grown with warm_start on the last
+`--window-days` of history plus a replayed sample of older rows, and each
+XGBoost symptom model keeps boosting for `--rounds` rounds on new survey
+rows. A random holdout of the new data is kept out of training (for the
+forest, only rows appended since it was last trained, which it has never
+seen); an update is only saved if it scores at least as well there as the
+current model.
+Every run is logged to model_updates.json. When a model registry exists
+(models/, see model_registry.py), saved models are also published there as
+a new active version, which running API workers pick up without a restart.
+
+    python update_models.py                                  # AQI forest, last 90 days
+    python update_models.py --trees 100 --max-trees 1500     # cap the forest size
+    python update_models.py --health-data new_responses.csv --rounds 20
+    python update_models.py --dry-run                        # check only, save nothing
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from health_risk_predictor import FEATURE_COLS, TARGET_COLS, build_lookup_table, check_lookup_parity, make_classifier
+from model_registry import MANIFEST, REGISTRY_DIR, publish
+
+AQI_MODEL_PATH = "aqi_model.pkl"
+COMPACT_PATH = "aqi_model_compact"
+HEALTH_MODEL_PATH = "health_risk_model.pkl"
+LOG_PATH = "model_updates.json"
+HISTORY_DIR = "history"
+
+
+def history_features(window_days, history_dir=HISTORY_DIR):
+    """
+    Labelled feature rows (with timestamp and history position `row`), split
+    into (older, recent) where recent covers the last window_days of history.
+    """
+    if os.path.isdir(os.path.join(history_dir, "features")):
+        from history_store import HistoryStore
+        df = HistoryStore(history_dir).read("features", with_timestamp=True)
+    else:
+        # Not converted yet: the CSV rows line up with Original_Dataset.csv dates
+        df = pd.read_csv("pollutant_model_features.csv")
+        dates = pd.read_csv("Original_Dataset.csv", usecols=["date"])["date"]
+        df.insert(0, "timestamp", pd.to_datetime(dates, format="%d-%m-%Y"))
+    # Position in the (append-only) history, compared with the row count a
+    # model was trained on to tell which rows it has never seen
+    df["row"] = np.arange(len(df))
+    df = df[df["AQI"].notna()]
+    is_recent = df["timestamp"] > df["timestamp"].max() - timedelta(days=window_days)
+    return df[~is_recent].reset_index(drop=True), df[is_recent].reset_index(drop=True)
+
+
+def grow_forest(model, X, y, trees, max_trees=None):
+    """
+    Copy of a fitted RandomForestRegressor with `trees` more trees fit on X, y.
+
+    Existing trees are untouched. With max_trees, the oldest trees are
+    dropped so the forest keeps at most that many.
+    """
+    updated = copy.deepcopy(model)
+    updated.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees)
+    updated.fit(X, y)
+    updated.set_params(warm_start=False)
+    if max_trees is not None and len(updated.estimators_) > max_trees:
+        updated.estimators_ = updated.estimators_[-max_trees:]
+        updated.n_estimators = max_trees
+    return updated
+
+
+def continue_boosting(model, X, y, rounds):
+    """Copy of a fitted XGBClassifier with `rounds` more boosting rounds on X, y."""
+    updated = make_classifier(n_estimators=rounds)
+    updated.fit(X, y, xgb_model=model.get_booster())
+    return updated
+
+
+def save_forest(model, path=AQI_MODEL_PATH, compact_path=COMPACT_PATH):
+    """Write the pickle and the compact serving copy, each swapped in whole."""
+    from compact_forest import export_forest
+
+    staging = f"{path}.tmp-{os.getpid()}"
+    with open(staging, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(staging, path)
+
+    # export_forest stages the arrays and swaps the directory in itself
+    export_forest(model, compact_path)
+
+
+def update_aqi(trees, window_days, holdout, replay=1.0, max_trees=None, tolerance=0.0, save=True, trained_rows=None):
+    with open(AQI_MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+
+    older, recent = history_features(window_days)
+    labelled = pd.concat([older, recent])
+    history_rows = int(labelled["row"].max()) + 1 if len(labelled) else 0
+    # Recorded by train_aqi.py and by earlier updates; --trained-rows for older pickles
+    trained_rows = getattr(model, "n_training_rows_", trained_rows)
+    if trained_rows is None:
+        return {'status': 'skipped',
+                'reason': f'{AQI_MODEL_PATH} does not record its training rows; retrain it with python main.py '
+                          'or pass --trained-rows'}
+
+    # The holdout is drawn only from rows appended since the model was last
+    # trained: the current forest has fit (most of) every older row, so scoring
+    # it there would flatter it against the update
+    unseen = labelled[labelled["row"] >= trained_rows]
+    if len(unseen) < 10:
+        return {'status': 'skipped', 'reason': f'only {len(unseen)} labelled rows added since the model was trained'}
+    if len(recent) < 10:
+        return {'status': 'skipped', 'reason': f'only {len(recent)} labelled rows in the last {window_days} days'}
+
+    columns = list(model.feature_names_in_)
+    _, check_idx = train_test_split(np.arange(len(unseen)), test_size=holdout, random_state=42)
+    check = unseen.iloc[check_idx]
+    held_out = set(check["row"])
+    fit_rows = recent[~recent["row"].isin(held_out)]
+    older = older[~older["row"].isin(held_out)]
+
+    # The new trees also see a sample of older rows (replay x the recent
+    # rows), so they cover the whole AQI range rather than only the last
+    # few weeks
+    sample = older.sample(min(len(older), int(replay * len(fit_rows))), random_state=42)
+    X_fit = pd.concat([fit_rows[columns], sample[columns]])
+    y_fit = pd.concat([fit_rows["AQI"], sample["AQI"]])
+
+    start = time.perf_counter()
+    updated = grow_forest(model, X_fit, y_fit, trees, max_trees)
+    fit_seconds = time.perf_counter() - start
+
+    # Every row now in the history has been fit or used for this check
+    updated.n_training_rows_ = history_rows
+
+    X_check, y_check = check[columns], check["AQI"]
+    before = mean_absolute_error(y_check, model.predict(X_check))
+    after = mean_absolute_error(y_check, updated.predict(X_check))
+    result = {
+        'rows': len(recent),
+        'new_rows': len(unseen),
+        'replayed_rows': len(sample),
+        'window': [str(recent["timestamp"].min().date()), str(recent["timestamp"].max().date())],
+        'trees': [len(model.estimators_), len(updated.estimators_)],
+        'holdout_rows': len(check_idx),
+        'mae': [round(before, 3), round(after, 3)],
+        'r2': [round(r2_score(y_check, model.predict(X_check)), 4), round(r2_score(y_check, updated.predict(X_check)), 4)],
+        'fit_seconds': round(fit_seconds, 2)
+    }
+
+    # Lower MAE is better; allow `tolerance` relative slack
+    if after > before * (1 + tolerance):
+        result['status'] = 'rejected'
+    elif save:
+        save_forest(updated)
+        result['status'] = 'saved'
+    else:
+        result['status'] = 'accepted (dry run)'
+    return result
+
+
+def update_health(data_path, rounds, holdout, tolerance=0.0, save=True):
+    with open(HEALTH_MODEL_PATH, "rb") as f:
+        package = pickle.load(f)
+
+    new = pd.read_csv(data_path)
+    missing = [c for c in FEATURE_COLS + TARGET_COLS if c not in new.columns]
+    if missing:
+        raise ValueError(f"{data_path} is missing columns: {', '.join(missing)}")
+
+    results, models = {}, dict(package['models'])
+    for target in TARGET_COLS:
+        symptom = target.replace('_binary', '')
+        y = new[target]
+        if y.nunique() < 2:
+            results[symptom] = {'status': 'skipped', 'reason': 'new rows contain a single class'}
+            continue
+        fit_idx, check_idx = train_test_split(np.arange(len(new)), test_size=holdout, random_state=42, stratify=y)
+        X = new[FEATURE_COLS]
+        if y.iloc[check_idx].nunique() < 2:
+            results[symptom] = {'status': 'skipped', 'reason': 'holdout contains a single class'}
+            continue
+
+        model = package['models'][symptom]
+        updated = continue_boosting(model, X.iloc[fit_idx], y.iloc[fit_idx], rounds)
+        before = roc_auc_score(y.iloc[check_idx], model.predict_proba(X.iloc[check_idx])[:, 1])
+        after = roc_auc_score(y.iloc[check_idx], updated.predict_proba(X.iloc[check_idx])[:, 1])
+        result = {'roc_auc': [round(before, 4), round(after, 4)],
+                  'rounds': [model.get_booster().num_boosted_rounds(), updated.get_booster().num_boosted_rounds()]}
+        # Higher ROC-AUC is better; each symptom is accepted or rejected on its own
+        if after < before - tolerance:
+            result['status'] = 'rejected'
+        else:
+            result['status'] = 'accepted'
+            models[symptom] = updated
+        results[symptom] = result
+
+    accepted = [s for s, r in results.items() if r['status'] == 'accepted']
+    if accepted and save:
+        updated_package = dict(package, models=models, lookup_table=build_lookup_table(models))
+        max_diff = check_lookup_parity(updated_package)
+        if max_diff > 1e-6:
+            raise RuntimeError(f"Lookup table differs from the updated models (max diff {max_diff:.3g})")
+        staging = f"{HEALTH_MODEL_PATH}.tmp-{os.getpid()}"
+        with open(staging, "wb") as f:
+            pickle.dump(updated_package, f)
+        os.replace(staging, HEALTH_MODEL_PATH)
+    return {'rows': len(new), 'saved': accepted if save else [], 'symptoms': results}
+
+
+def append_log(entry, path=LOG_PATH):
+    log = []
+    if os.path.exists(path):
+        with open(path) as f:
+            log = json.load(f)
+    log.append(entry)
+    with open(path, "w") as f:
+        json.dump(log, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally update the AQI and health-risk models")
+    parser.add_argument("--trees", type=int, default=100, help="trees added to the AQI forest")
+    parser.add_argument("--window-days", type=int, default=90, help="recent history the new trees learn from")
+    parser.add_argument("--replay", type=float, default=1.0,
+                        help="older rows mixed into the new trees' data, per recent row")
+    parser.add_argument("--max-trees", type=int, default=None, help="drop the oldest trees beyond this many")
+    parser.add_argument("--trained-rows", type=int, default=None,
+                        help="history rows the AQI forest was trained on, for pickles that do not record it")
+    parser.add_argument("--skip-aqi", action="store_true")
+    parser.add_argument("--health-data", default=None,
+                        help="CSV of new survey rows (health_risk_training.csv columns)")
+    parser.add_argument("--rounds", type=int, default=20, help="boosting rounds added per symptom model")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of new rows used for the check")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="accepted loss: relative MAE for AQI, absolute ROC-AUC for health")
+    parser.add_argument("--dry-run", action="store_true", help="run the checks without saving")
+    args = parser.parse_args(argv)
+
+    entry = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'dry_run': args.dry_run}
+    start = time.perf_counter()
+
+    if not args.skip_aqi:
+        entry['aqi'] = result = update_aqi(args.trees, args.window_days, args.holdout, args.replay, args.max_trees,
+                                           args.tolerance, save=not args.dry_run, trained_rows=args.trained_rows)
+        if 'mae' in result:
+            print(f"AQI forest: {result['trees'][0]} -> {result['trees'][1]} trees on {result['rows']} rows "
+                  f"({result['window'][0]} .. {result['window'][1]}) in {result['fit_seconds']:.1f}s; "
+                  f"MAE on {result['holdout_rows']} held-out new rows {result['mae'][0]:.2f} -> {result['mae'][1]:.2f}: "
+                  f"{result['status']}")
+        else:
+            print(f"AQI forest: {result['status']} ({result['reason']})")
+
+    if args.health_data:
+        entry['health'] = result = update_health(args.health_data, args.rounds, args.holdout,
+                                                 args.tolerance, save=not args.dry_run)
+        for symptom, r in result['symptoms'].items():
+            if 'roc_auc' in r:
+                print(f"{symptom}: {r['rounds'][0]} -> {r['rounds'][1]} rounds; "
+                      f"holdout ROC-AUC {r['roc_auc'][0]:.3f} -> {r['roc_auc'][1]:.3f}: {r['status']}")
+            else:
+                print(f"{symptom}: {r['status']} ({r['reason']})")
+        if result['saved']:
+            print(f"Saved {HEALTH_MODEL_PATH} with updated {', '.join(result['saved'])}")
+
+    saved = entry.get('aqi', {}).get('status') == 'saved' or entry.get('health', {}).get('saved')
+    if saved and os.path.exists(os.path.join(REGISTRY_DIR, MANIFEST)):
+        entry['model_version'] = publish(note="update_models.py")
+        print(f"Published model version {entry['model_version']} to {REGISTRY_DIR}/")
+
+    entry['seconds'] = round(time.perf_counter() - start, 2)
+    append_log(entry)
+    print(f"Done in {entry['seconds']:.1f}s; logged to {LOG_PATH}")
+    return entry
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Server-pushed AQI updates (GET /stream), as Server-Sent Events.
+
+Clients subscribe to the grid cell of their location. A publisher thread
+checks each subscribed cell's observation every `poll_interval` seconds;
+when the cell's ObservationCache has a new version, the update (predicted
+AQI plus observation) is built once and serialized once into an SSE frame,
+and every subscriber of the cell is woken to write those same bytes. The
+cost of a refresh does not depend on the number of connected clients.
+
+Subscribers that see no new update within `keepalive` seconds get an SSE
+comment, so proxies keep the connection open and dead clients are noticed.
+A stream ends after `max_seconds`; EventSource reconnects by itself (after
+the `retry` hint) and is sent the current update first.
+
+subscribe() takes one of `max_clients` slots. The events() generator frees
+it when it finishes, but a response body that is never iterated (a HEAD
+request, a client gone before the first byte) never runs the generator, so
+the server also calls leave() when it closes the response; it is idempotent.
+"""
+import asyncio
+import json
+import threading
+import time
+
+
+class StreamFull(Exception):
+    """Raised by subscribe() when this process already serves max_clients streams."""
+
+
+def sse_frame(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, sort_keys=True, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+class _Topic:
+    """Latest update of one grid cell and the clients waiting for the next."""
+
+    def __init__(self, cell):
+        self.lat, self.lon = cell
+        self.condition = threading.Condition()
+        self.version = None
+        self.frame = None
+        self.subscribers = 0
+
+
+class Subscription:
+    """One client's slot on a topic, from subscribe() until leave()."""
+
+    def __init__(self, topic):
+        self.topic = topic
+        self.active = True
+
+
+class UpdateStream:
+    """
+    `build(observation, lat, lon)` returns the update dict for a cell; it
+    runs once per observation version, on the publisher thread or on the
+    first subscriber of a cell.
+    """
+
+    def __init__(self, observation_cache, build, poll_interval=5, keepalive=15, max_seconds=300,
+                 max_clients=100, retry_ms=5000):
+        self.observation_cache = observation_cache
+        self.build = build
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.max_seconds = max_seconds
+        self.max_clients = max_clients
+        self.retry_ms = retry_ms
+
+        self._lock = threading.Lock()
+        self._topics = {}   # cell -> _Topic with subscribers
+        self._clients = 0
+        self._publisher = None
+
+        self.builds = 0
+        self.frames_sent = 0
+
+    def _new_topic(self, cell):
+        return _Topic(cell)
+
+    def _start_publisher(self):
+        publisher = threading.Thread(target=self._publish_loop, name="update-stream", daemon=True)
+        publisher.start()
+        return publisher
+
+    def _join(self, lat, lon):
+        cell = self.observation_cache.cell_for(lat, lon)
+        with self._lock:
+            if self._clients >= self.max_clients:
+                raise StreamFull(f"Too many update streams (max {self.max_clients} per worker)")
+            topic = self._topics.get(cell)
+            if topic is None:
+                topic = self._topics[cell] = self._new_topic(cell)
+            topic.subscribers += 1
+            self._clients += 1
+            # Started by the first subscriber, so it runs in the serving
+            # process and never in a preloading gunicorn master
+            if self._publisher is None:
+                self._publisher = self._start_publisher()
+        return Subscription(topic)
+
+    def leave(self, subscription):
+        """Free the subscription's slot; later calls do nothing."""
+        with self._lock:
+            if not subscription.active:
+                return
+            subscription.active = False
+            topic = subscription.topic
+            topic.subscribers -= 1
+            self._clients -= 1
+            if not topic.subscribers and self._topics.get((topic.lat, topic.lon)) is topic:
+                del self._topics[(topic.lat, topic.lon)]
+
+    def _subscribed_topics(self):
+        with self._lock:
+            return list(self._topics.values())
+
+    def _store(self, topic, observation, version):
+        # Caller holds topic.condition
+        if topic.version is not None and version <= topic.version:
+            return False
+        topic.frame = sse_frame("aqi", self.build(observation, topic.lat, topic.lon), version)
+        topic.version = version
+        # Topics are built on the publisher and on request threads
+        with self._lock:
+            self.builds += 1
+        return True
+
+    def publish(self, topic):
+        """Build the cell's update if its observation changed, and wake its subscribers."""
+        observation, version = self.observation_cache.get_versioned(topic.lat, topic.lon)
+        with topic.condition:
+            if self._store(topic, observation, version):
+                topic.condition.notify_all()
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            for topic in self._subscribed_topics():
+                try:
+                    self.publish(topic)
+                except Exception:
+                    # Upstream down: subscribers keep the last update, the next round retries
+                    pass
+
+    def subscribe(self, lat, lon):
+        """
+        Join the stream of a location's cell, with its current update built.
+        Returns a Subscription to pass to events() and leave(). Raises
+        StreamFull, or the upstream error when there is no update yet.
+        """
+        subscription = self._join(lat, lon)
+        try:
+            if subscription.topic.frame is None:
+                self.publish(subscription.topic)
+        except Exception:
+            self.leave(subscription)
+            raise
+        return subscription
+
+    def events(self, subscription):
+        """SSE bytes for one subscriber: the current update, then each new one."""
+        topic = subscription.topic
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            deadline = time.monotonic() + self.max_seconds
+            version = None
+            while time.monotonic() < deadline:
+                with topic.condition:
+                    if topic.version == version:
+                        topic.condition.wait(min(self.keepalive, max(0.0, deadline - time.monotonic())))
+                    frame, latest = topic.frame, topic.version
+                if latest != version:
+                    version = latest
+                    with self._lock:
+                        self.frames_sent += 1
+                    yield frame
+                else:
+                    yield KEEPALIVE_FRAME
+        finally:
+            self.leave(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': self._clients,
+                'max_clients': self.max_clients,
+                'cells': len(self._topics),
+                'builds': self.builds,
+                'frames_sent': self.frames_sent
+            }
+
+
+class _AsyncTopic(_Topic):
+    def __init__(self, cell):
+        super().__init__(cell)
+        self.condition = asyncio.Condition()
+
+
+class AsyncUpdateStream(UpdateStream):
+    """
+    UpdateStream on an asyncio event loop (asgi.py), over an
+    AsyncGridObservationCache. The publisher is a task on the loop and
+    subscribers await an asyncio.Condition, so an idle stream costs no
+    thread. `build` is a plain function, run on the loop.
+    """
+
+    def _new_topic(self, cell):
+        return _AsyncTopic(cell)
+
+    def _start_publisher(self):
+        return asyncio.ensure_future(self._publish_loop())
+
+    async def publish(self, topic):
+        observation, version = await self.observation_cache.get_versioned(topic.lat, topic.lon)
+        async with topic.condition:
+            if self._store(topic, observation, version):
+                topic.condition.notify_all()
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for topic in self._subscribed_topics():
+                try:
+                    await self.publish(topic)
+                except Exception:
+                    pass
+
+    async def subscribe(self, lat, lon):
+        subscription = self._join(lat, lon)
+        try:
+            if subscription.topic.frame is None:
+                await self.publish(subscription.topic)
+        except Exception:
+            self.leave(subscription)
+            raise
+        return subscription
+
+    async def events(self, subscription):
+        topic = subscription.topic
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            deadline = time.monotonic() + self.max_seconds
+            version = None
+            while time.monotonic() < deadline:
+                async with topic.condition:
+                    if topic.version == version:
+                        try:
+                            await asyncio.wait_for(topic.condition.wait(),
+                                                   min(self.keepalive, max(0.0, deadline - time.monotonic())))
+                        except asyncio.TimeoutError:
+                            pass
+                    frame, latest = topic.frame, topic.version
+                if latest != version:
+                    version = latest
+                    with self._lock:
+                        self.frames_sent += 1
+                    yield frame
+                else:
+                    yield KEEPALIVE_FRAME
+        finally:
+            self.leave(subscription)
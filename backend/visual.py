@@ -1,32 +1,17 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score, mean_squared_error
 import matplotlib.pyplot as plt
 import numpy as np
-
-df = pd.read_csv('pollutant_model_features.csv')
-
-X = df[['temp', 'humidity', 'windspeedmean', 'month', 'is_festive']]
-y = df['AQI']
-
-x_train, x_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-rf = RandomForestRegressor(random_state=42)
-rf.fit(x_train, y_train)
-rf_pred = rf.predict(x_test)
-
-lr = LinearRegression()
-lr.fit(x_train, y_train)
-lr_pred = lr.predict(x_test)
-
-n = len(y_test)
-p = X.shape[1]
-r2_rf = r2_score(y_test, rf_pred)
-r2_lr = r2_score(y_test, lr_pred)
-adj_r2_rf = 1 - (1 - r2_rf) * (n - 1) / (n - p - 1)
-adj_r2_lr = 1 - (1 - r2_lr) * (n - 1) / (n - p - 1)
+from sklearn.metrics import mean_squared_error
+from train_aqi import train
+
+# Both models come from the shared training pipeline (one data load, one split)
+_, report, predictions = train(['forest_small', 'linear'], save=False)
+y_test, rf_pred = predictions['forest_small']
+_, lr_pred = predictions['linear']
+
+r2_rf = report['variants']['forest_small']['r2']
+r2_lr = report['variants']['linear']['r2']
+adj_r2_rf = report['variants']['forest_small']['adjusted_r2']
+adj_r2_lr = report['variants']['linear']['adjusted_r2']
 
 plt.figure(figsize=(8,6))
 plt.scatter(y_test, rf_pred, color='green', alpha=0.5, label='Random Forest')
@@ -86,6 +86,34 @@ function typewriterNumber(element, number, duration = 1500) {
     requestAnimationFrame(update);
 }
 
+// Last /predict response, reused when the server answers 304 Not Modified
+let lastPrediction = null;
+// Data on screen: the last prediction with any live updates applied
+let shownPrediction = null;
+// Live updates from GET /stream, opened after the first prediction
+let updates = null;
+
+async function fetchPrediction(body) {
+    const apiUrl = window.APP_CONFIG?.API_URL || 'http://localhost:5000';
+    const headers = { 'Content-Type': 'application/json' };
+    if (lastPrediction && lastPrediction.body === body) {
+        headers['If-None-Match'] = lastPrediction.etag;
+    }
+    const response = await fetch(`${apiUrl}/predict`, { method: 'POST', headers, body });
+
+    if (response.status === 304) {
+        return lastPrediction.data;
+    }
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'Failed to fetch');
+    }
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    lastPrediction = etag ? { body, etag, data } : null;
+    return data;
+}
+
 async function predictAQI() {
     const age = document.getElementById('age-input').value;
     const genderEnc = document.getElementById('gender-input').value;
@@ -108,25 +136,16 @@ async function predictAQI() {
     document.getElementById('results').classList.add('hidden');
 
     try {
-        const apiUrl = window.APP_CONFIG?.API_URL || 'http://localhost:5000';
-        const response = await fetch(`${apiUrl}/predict`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                age: parseInt(age),
-                gender_enc: parseInt(genderEnc),
-                parent_enc: parseInt(parentEnc)
-            })
+        const body = JSON.stringify({
+            age: parseInt(age),
+            gender_enc: parseInt(genderEnc),
+            parent_enc: parseInt(parentEnc)
         });
+        const data = await fetchPrediction(body);
 
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'Failed to fetch');
-        }
-
-        const data = await response.json();
         document.getElementById('loading').classList.add('hidden');
         displayResults(data);
+        if (!updates) subscribeUpdates();
 
     } catch (error) {
         document.getElementById('loading').classList.add('hidden');
@@ -134,12 +153,31 @@ async function predictAQI() {
     }
 }
 
-function displayResults(data) {
+function displayResults(data, scroll = true) {
+    shownPrediction = data;
     const results = document.getElementById('results');
     results.classList.remove('hidden');
 
+    displayConditions(data, true);
+    displayHealthRisks(data.health_risks);
+    displayAdvice(data);
+
+    // Scroll to results
+    if (scroll) {
+        setTimeout(() => {
+            results.scrollIntoView({ behavior: 'smooth', block: 'start' });
+        }, 300);
+    }
+}
+
+// AQI, pollutants and weather: everything a /stream update carries
+function displayConditions(data, animate) {
     const aqiEl = document.getElementById('aqi-value');
-    typewriterNumber(aqiEl, data.aqi, 2000);
+    if (animate) {
+        typewriterNumber(aqiEl, data.aqi, 2000);
+    } else {
+        aqiEl.textContent = data.aqi;
+    }
 
     const aqiInfo = getAQIInfo(data.aqi);
     document.getElementById('aqi-category').textContent = aqiInfo.category;
@@ -174,21 +212,60 @@ function displayResults(data) {
     document.getElementById('pressure').textContent = data.weather.pressure;
     document.getElementById('wind-speed').textContent = data.weather.wind_speed;
 
-    displayHealthRisks(data.health_risks);
-
-    document.getElementById('recommendations-text').textContent = data.recommendations;
-
     const now = new Date();
     document.getElementById('report-time').textContent = now.toLocaleTimeString('en-US', {
         hour: '2-digit',
         minute: '2-digit',
         hour12: true
     });
+}
 
-    // Scroll to results
-    setTimeout(() => {
-        results.scrollIntoView({ behavior: 'smooth', block: 'start' });
-    }, 300);
+function displayAdvice(data) {
+    // Structured advice when the backend sends it; older backends only send the text
+    document.getElementById('recommendations-text').textContent = data.advice
+        ? `AQI Category: ${data.advice.category} (AQI: ${data.advice.aqi})\n\n${data.advice.advice.join('\n')}`
+        : data.recommendations;
+}
+
+function subscribeUpdates() {
+    if (!window.EventSource) return;
+    const apiUrl = window.APP_CONFIG?.API_URL || 'http://localhost:5000';
+    updates = new EventSource(`${apiUrl}/stream`);
+    updates.addEventListener('aqi', (event) => applyUpdate(JSON.parse(event.data)));
+    updates.onerror = () => {
+        // EventSource reconnects by itself unless the server refused (e.g. 503 when full)
+        if (updates.readyState === EventSource.CLOSED) {
+            updates = null;
+            setTimeout(subscribeUpdates, 30000);
+        }
+    };
+}
+
+async function applyUpdate(update) {
+    if (!shownPrediction) return;
+
+    // The server derives the category from the unrounded AQI; banding the
+    // rounded update.aqi here could disagree at a limit. The health model's
+    // AQI categories (100/200/300) fall on the advice limits, so within a
+    // category health risks and advice lines stay the same.
+    if (update.advice?.category !== shownPrediction.advice?.category && lastPrediction) {
+        // New category: health risks and advice change too. /predict answers
+        // from its response cache, built once per observation for this profile.
+        try {
+            displayResults(await fetchPrediction(lastPrediction.body), false);
+        } catch (error) {
+            // Keep the last report; the next update tries again
+        }
+        return;
+    }
+
+    shownPrediction = {
+        ...shownPrediction,
+        ...update,
+        advice: shownPrediction.advice && { ...shownPrediction.advice, aqi: update.aqi }
+    };
+    displayConditions(shownPrediction, false);
+    displayAdvice(shownPrediction);
 }
 
 // Display health risks as newspaper articles